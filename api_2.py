@@ -1,52 +1,128 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from datetime import date
+from typing import List
+
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine, MetaData, Table, select
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import SQLAlchemyError
 from pydantic import BaseModel
-from typing import List
 
-app = FastAPI()
+from db_config import DATABASE_URL, RECOMMENDATION_TABLE_NAME
+from recommendation_cache import CHECK_INTERVAL, DEFAULT_TTL, MAX_CACHE_BYTES, RecommendationCache
+
+# Connection pool
+POOL_SIZE = 10  # Connections kept open between requests
+MAX_OVERFLOW = 10  # Extra connections opened under bursts, closed when returned
+POOL_TIMEOUT = 5  # Seconds a request waits for a free connection before failing
+POOL_RECYCLE = 1800  # Replace connections older than this, before the server or a proxy drops them
+# Handlers run in the threadpool, one pooled connection each; more threads would only queue on the pool
+THREADPOOL_SIZE = POOL_SIZE + MAX_OVERFLOW
+MAX_LIMIT = 1000  # Largest page a client may request
 
-# Database configuration
-DB_CONFIG = {
-    'user': 'admin',
-    'password': 'admin',
-    'host': 'localhost',
-    'port': '5400',
-    'database': 'bfi_test',
-    'recommendation_table': 'pricerecommendation'
-}
+# Recommendation cache
+CACHE_ENABLED = True  # Serve reads from memory; reloaded when model.py publishes a new run
+CACHE_CHECK_INTERVAL = CHECK_INTERVAL  # Seconds between run-version checks
+CACHE_TTL = DEFAULT_TTL  # Reload after this many seconds even without a new run (None = only on a new run)
+CACHE_MAX_MB = MAX_CACHE_BYTES / 2 ** 20  # Larger recommendation sets are served from the database
 
-DATABASE_URL = f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+logger = logging.getLogger(__name__)
 
-# SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
-metadata = MetaData()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async def poll_cache(cache):
+    """Check the run version every CACHE_CHECK_INTERVAL seconds and reload the cache when it changed."""
+    while True:
+        await asyncio.sleep(CACHE_CHECK_INTERVAL)
+        try:
+            await run_in_threadpool(cache.refresh)
+        except SQLAlchemyError as e:
+            # Keep serving the current snapshot; the next check retries
+            logger.warning(f"Recommendation cache refresh failed: {e}")
 
-# Example table model
+@asynccontextmanager
+async def lifespan(app):
+    """Create the pooled engine and reflect the recommendation table once, at startup, then fill the cache."""
+    engine = create_engine(DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                           pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE, pool_pre_ping=True)
+    app.state.engine = engine
+    app.state.recommendation_table = Table(RECOMMENDATION_TABLE_NAME, MetaData(), autoload_with=engine)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    app.state.cache = None
+    poller = None
+    if CACHE_ENABLED:
+        app.state.cache = RecommendationCache(engine, RECOMMENDATION_TABLE_NAME, CACHE_TTL,
+                                              int(CACHE_MAX_MB * 2 ** 20))
+        try:
+            await run_in_threadpool(app.state.cache.refresh)
+        except SQLAlchemyError as e:
+            logger.warning(f"Recommendation cache not loaded, serving from the database: {e}")
+        poller = asyncio.create_task(poll_cache(app.state.cache))
+    yield
+    if poller is not None:
+        poller.cancel()
+        with suppress(asyncio.CancelledError):
+            await poller
+    engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+# Columns written by model.save_recommendations_to_db
 class PriceRecommendation(BaseModel):
-    id: int
-    product_name: str
-    recommended_price: float
-    # Add other fields as necessary
-
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    productmasterid: str
+    category: str
+    price: float
+    date: date
+
+def query_recommendations(request, skip, limit, category=None, productmasterid=None):
+    """Read recommendations from the database; the path taken when the cache misses."""
+    recommendation_table = request.app.state.recommendation_table
+    # Ordered by the primary key, so pages are stable and served from its index
+    query = select(recommendation_table).order_by(recommendation_table.c.productmasterid).offset(skip).limit(limit)
+    if category is not None:
+        query = query.where(recommendation_table.c.category == category)
+    if productmasterid is not None:
+        query = query.where(recommendation_table.c.productmasterid == productmasterid)
+    with request.app.state.engine.connect() as connection:
+        return connection.execute(query).mappings().all()
+
+async def cached_or_query(request, method, args, **query):
+    """Serve from the cache when it holds the recommendations, else query in the threadpool off the event loop."""
+    cache = request.app.state.cache
+    result = cache.lookup(method, *args) if cache is not None else None
+    if result is None:
+        result = await run_in_threadpool(query_recommendations, request, **query)
+    return result
 
 @app.get("/recommendations/", response_model=List[PriceRecommendation])
-async def read_recommendations(skip: int = 0, limit: int = 10, db: SessionLocal = Depends(get_db)):
-    recommendation_table = Table(DB_CONFIG['recommendation_table'], metadata, autoload_with=engine)
-    query = select([recommendation_table]).offset(skip).limit(limit)
-    result = db.execute(query).fetchall()
+async def read_recommendations(request: Request, skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=MAX_LIMIT)):
+    result = await cached_or_query(request, 'page', (skip, limit), skip=skip, limit=limit)
     if not result:
         raise HTTPException(status_code=404, detail="Recommendations not found")
-    recommendations = [dict(row) for row in result]
-    return recommendations
+    return result
+
+@app.get("/recommendations/product/{productmasterid}", response_model=PriceRecommendation)
+async def read_product_recommendation(request: Request, productmasterid: str):
+    result = await cached_or_query(request, 'product', (productmasterid,), skip=0, limit=1,
+                                   productmasterid=productmasterid)
+    if not result:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return result[0]
+
+@app.get("/recommendations/{category}", response_model=List[PriceRecommendation])
+async def read_category_recommendations(request: Request, category: str, skip: int = Query(0, ge=0),
+                                        limit: int = Query(10, ge=1, le=MAX_LIMIT)):
+    result = await cached_or_query(request, 'category_page', (category, skip, limit),
+                                   skip=skip, limit=limit, category=category)
+    if not result:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return result
+
+@app.get("/cache/stats")
+async def read_cache_stats(request: Request):
+    cache = request.app.state.cache
+    return {'enabled': False} if cache is None else {'enabled': True, **cache.stats()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,104 @@
+"""Background writer so database and file writes never block the scraping thread.
+
+Producers hand batches to `add()`, which puts them on a bounded queue (blocking
+when it is full, so a slow database applies back-pressure instead of letting
+memory grow). One thread drains the queue into the wrapped write function.
+`close()` drains everything that was queued, so nothing is lost on a clean
+exit or when the scraper fails and unwinds through its `finally` block.
+"""
+import logging
+import queue
+import threading
+import time
+
+DEFAULT_MAX_QUEUE = 100  # Batches waiting to be written before producers block
+DEFAULT_TICK_INTERVAL = 1.0  # Seconds between idle ticks
+
+logger = logging.getLogger(__name__)
+_STOP = object()
+
+
+class BackgroundWriter:
+    """Run `write(rows)` on a background thread fed by a bounded queue.
+
+    `tick()` (optional) is called whenever the queue has been idle for
+    `tick_interval` seconds, e.g. to let a loader flush rows that have been
+    waiting too long.
+    """
+
+    def __init__(self, write, max_queue=DEFAULT_MAX_QUEUE, tick=None, tick_interval=DEFAULT_TICK_INTERVAL,
+                 name='background-writer'):
+        self.write = write
+        self.tick = tick
+        self.tick_interval = tick_interval
+        self.name = name
+        self.batches_written = 0
+        self.rows_written = 0
+        self.failed_batches = 0
+        self.write_time = 0.0
+        self.max_write_time = 0.0
+        self.blocked_time = 0.0
+        self.max_queue_depth = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def add(self, rows):
+        """Queue a copy of `rows` for writing; blocks while the queue is full."""
+        start = time.perf_counter()
+        self._queue.put(list(rows))
+        self.blocked_time += time.perf_counter() - start
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def _run(self):
+        while True:
+            try:
+                rows = self._queue.get(timeout=self.tick_interval)
+            except queue.Empty:
+                self._tick()
+                continue
+            if rows is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                self.write(rows)
+                self.batches_written += 1
+                self.rows_written += len(rows)
+            except Exception as e:
+                self.failed_batches += 1
+                logger.error(f"{self.name}: error writing batch of {len(rows)} rows: {e}")
+            elapsed = time.perf_counter() - start
+            self.write_time += elapsed
+            self.max_write_time = max(self.max_write_time, elapsed)
+
+    def _tick(self):
+        if self.tick is None:
+            return
+        try:
+            self.tick()
+        except Exception as e:
+            logger.error(f"{self.name}: error in idle tick: {e}")
+
+    def close(self):
+        """Write everything still queued, then stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+            self.log_summary()
+
+    def log_summary(self):
+        mean = self.write_time / self.batches_written if self.batches_written else 0.0
+        logger.info(f"{self.name}: wrote {self.rows_written} rows in {self.batches_written} batches "
+                    f"({self.failed_batches} failed), write latency mean {mean * 1000:.1f}ms / "
+                    f"max {self.max_write_time * 1000:.1f}ms, max queue depth {self.max_queue_depth}, "
+                    f"producers blocked {self.blocked_time:.2f}s")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,181 @@
+"""API throughput under concurrent load: per-request reflection + blocking async handler vs api_2.py.
+
+Fills a throwaway schema (dropped afterwards) with synthetic recommendations,
+then serves /recommendations/ from a uvicorn process, first with the previous
+handler (reflects the table on every request and runs the query on the event
+loop; only its select([table]) call is updated to run on SQLAlchemy 2), then
+with api_2.py. An aiohttp client keeps --concurrency requests in flight for
+random pages and reports requests/s and latency percentiles.
+
+    python benchmarks/bench_api.py --rows 100000 --requests 3000 --legacy-requests 300 --concurrency 1 16 64
+"""
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import random
+import socket
+import time
+from urllib.parse import quote
+
+import aiohttp
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from bench_recommendation_upsert import make_recommendations
+from common import load_script
+from pg_loader import postgres_url
+
+SCHEMA = 'bench_api'
+TABLE_NAME = 'pricerecommendation'
+
+
+def schema_url(url):
+    separator = '&' if '?' in url else '?'
+    return f"{url}{separator}options={quote(f'-csearch_path={SCHEMA}')}"
+
+
+def legacy_app(database_url):
+    # api_2.py's previous handler, with select([table]) changed to select(table)
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import MetaData, Table, select
+    from sqlalchemy.orm import sessionmaker
+
+    app = FastAPI()
+    engine = create_engine(database_url)
+    metadata = MetaData()
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/recommendations/")
+    async def read_recommendations(skip: int = 0, limit: int = 10, db=Depends(get_db)):
+        recommendation_table = Table(TABLE_NAME, metadata, autoload_with=engine, extend_existing=True)
+        query = select(recommendation_table).offset(skip).limit(limit)
+        return [row._asdict() for row in db.execute(query).fetchall()]
+
+    return app
+
+
+def serve(name, database_url, port, settings=None):
+    """Run one app under uvicorn; `settings` overrides api_2.py's module constants (e.g. CACHE_ENABLED)."""
+    import uvicorn
+    if name.startswith('api_2.py'):
+        api = load_script('api_2.py')
+        api.DATABASE_URL = database_url
+        for setting, value in (settings or {}).items():
+            setattr(api, setting, value)
+        app = api.app
+    else:
+        app = legacy_app(database_url)
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='critical')
+
+
+async def wait_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{base_url}/recommendations/?limit=1") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"server at {base_url} did not start")
+            await asyncio.sleep(0.2)
+
+
+def page_paths(rows, limit):
+    """Random /recommendations/ pages."""
+    return lambda: f"/recommendations/?skip={random.randrange(max(1, rows - limit))}&limit={limit}"
+
+
+async def load(base_url, requests, concurrency, make_path, timeout):
+    """Keep `concurrency` requests for make_path() in flight; returns (req/s, [p50, p99] ms, errors)."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def client(session):
+        nonlocal errors
+        for _ in remaining:
+            path = make_path()
+            start = time.perf_counter()
+            try:
+                async with session.get(f"{base_url}{path}") as response:
+                    await response.read()
+                    errors += response.status != 200
+            except asyncio.TimeoutError:
+                # A stalled request counts as an error at the timeout's latency
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(latencies, [50, 99]) * 1000, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=3_000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--legacy-requests', type=int, default=300,
+                        help="requests per level for the previous handler, which stalls on pool timeouts under load")
+    parser.add_argument('--timeout', type=float, default=10, help="seconds before a request counts as failed")
+    parser.add_argument('--limit', type=int, default=10, help="page size requested")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    args = parser.parse_args()
+
+    model_script = load_script('model.py')
+    admin = create_engine(args.url)
+    with admin.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    database_url = schema_url(args.url)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            model_script.save_recommendations_to_db(create_engine(database_url), make_recommendations(args.rows), TABLE_NAME)
+        base_url = f"http://127.0.0.1:{args.port}"
+        for name in ('per-request reflection', 'api_2.py'):
+            with socket.socket() as probe:
+                # Fails if a server from an earlier run still holds the port; its numbers would be reported instead
+                probe.bind(('127.0.0.1', args.port))
+            # The recommendation cache is measured by bench_recommendation_cache.py; here every request queries
+            server = multiprocessing.get_context('spawn').Process(target=serve, args=(name, database_url, args.port,
+                                                                                      {'CACHE_ENABLED': False}))
+            server.start()
+            try:
+                asyncio.run(wait_ready(base_url))
+                requests = args.requests if name == 'api_2.py' else args.legacy_requests
+                for concurrency in args.concurrency:
+                    rps, (p50, p99), errors = asyncio.run(
+                        load(base_url, requests, concurrency, page_paths(args.rows, args.limit), args.timeout))
+                    print(f"{name:>22}, {concurrency:>3} concurrent: {rps:8,.0f} req/s, "
+                          f"p50 {p50:7.1f} ms, p99 {p99:7.1f} ms, {errors} errors", flush=True)
+            finally:
+                # Stalled requests can keep uvicorn's graceful shutdown waiting; don't wait for them
+                server.terminate()
+                server.join(5)
+                if server.is_alive():
+                    server.kill()
+                    server.join()
+    finally:
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
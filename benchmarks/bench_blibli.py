@@ -0,0 +1,86 @@
+"""Blibli cards/s: per-field WebDriver calls (and a second page load) vs one page source parse.
+
+Serves the saved search pages from benchmarks/fixtures/blibli with a local HTTP
+server. The browser runs need Chrome; the parse-only line does not.
+
+    python benchmarks/bench_blibli.py --repeat 5 --delay 0.2
+    python benchmarks/bench_blibli.py --skip-browser
+"""
+import argparse
+import glob
+import os
+
+from selenium.webdriver.common.by import By
+
+from common import timed
+from fixture_server import FIXTURES_DIR, start_fixture_server
+from page_loader import BLIBLI_LISTING_SELECTOR, load_page
+from product_parser import parse_blibli_listing
+
+SEARCH_PATH = "/cari/unilever%20indonesia%20official?seller=Official%20Store&category=53400"
+
+
+# blibli.py's previous extraction, kept here as the "before" reference
+def legacy_scrape_page(driver, url, wait_time):
+    load_page(driver, url, BLIBLI_LISTING_SELECTOR, wait_time)  # fetch_html
+    load_page(driver, url, BLIBLI_LISTING_SELECTOR, wait_time)  # parse_html loaded the page again
+    product_list = []
+    for product in driver.find_elements(By.CLASS_NAME, 'product__card'):
+        try:
+            product_list.append({
+                'Name': product.find_element(By.CLASS_NAME, 'blu-product__name').text.strip(),
+                'Price_After': product.find_element(By.CLASS_NAME, 'blu-product__price-after').text.strip(),
+                'Price_Before': product.find_element(By.CLASS_NAME, 'blu-product__price-before').text.strip() if product.find_elements(By.CLASS_NAME, 'blu-product__price-before') else None,
+                'Discount': product.find_element(By.CLASS_NAME, 'blu-product__price-discount').text.strip() if product.find_elements(By.CLASS_NAME, 'blu-product__price-discount') else None,
+                'Rating': product.find_element(By.CLASS_NAME, 'blu-product__rating-wrapper').find_element(By.TAG_NAME, 'span').text.strip(),
+                'Sold_Count': product.find_element(By.CLASS_NAME, 'blu-product__sold').text.strip().replace('Terjual', '').strip(),
+                'Store_Location': product.find_element(By.CLASS_NAME, 'blu-product__location-text').find_elements(By.TAG_NAME, 'span')[1].text.strip(),
+            })
+        except Exception:
+            continue
+    return product_list
+
+
+def snapshot_scrape_page(driver, url, wait_time):
+    return parse_blibli_listing(load_page(driver, url, BLIBLI_LISTING_SELECTOR, wait_time))
+
+
+def run_browser(scrape_page, urls, wait_time):
+    from bench_detail_pool import headless_driver
+    driver = headless_driver()
+    try:
+        return [card for url in urls for card in scrape_page(driver, url, wait_time)]
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="times each search page is scraped")
+    parser.add_argument('--delay', type=float, default=0.2, help="artificial server latency per request (s)")
+    parser.add_argument('--wait', type=float, default=10.0, help="readiness timeout (s)")
+    parser.add_argument('--skip-browser', action='store_true')
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'blibli', 'cari', '*.html'))):
+        with open(path, encoding='utf-8') as file:
+            pages.append(file.read())
+    cards, elapsed = timed(lambda: [card for _ in range(args.repeat) for html in pages
+                                    for card in parse_blibli_listing(html)])
+    print(f"{'parse only':>14}: {len(cards)} cards in {elapsed:.2f}s ({len(cards) / elapsed:,.0f} cards/s)")
+    if args.skip_browser:
+        return
+
+    server, site_url = start_fixture_server('blibli', delay=args.delay)
+    urls = [f"{site_url}{SEARCH_PATH}&page={page}" for _ in range(args.repeat) for page in range(1, len(pages) + 1)]
+    try:
+        for name, scrape_page in (('find_element', legacy_scrape_page), ('page source', snapshot_scrape_page)):
+            cards, elapsed = timed(run_browser, scrape_page, urls, args.wait)
+            print(f"{name:>14}: {len(cards)} cards in {elapsed:.2f}s ({len(cards) / elapsed:.1f} cards/s)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Cleaning pipeline: pandas round trip vs server-side CREATE TABLE AS + COPY TO, time and peak memory.
+
+Builds a synthetic ref table of the requested sizes with generate_series. Needs
+a PostgreSQL database (the docker-compose one by default); the benchmark
+tables are dropped afterwards. Each run happens in a fresh process so its peak
+RSS is its own.
+
+    python benchmarks/bench_cleaning.py --sizes 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import text
+
+from common import REPO_DIR, load_script, timed
+from pg_loader import get_engine, postgres_url
+
+REF_TABLE = 'bench_klikindomaret_ref'
+CLEANED_TABLE = 'bench_product'
+
+
+def make_ref_table(engine, rows, products=None, start_row=0, table_name=REF_TABLE, create=True, product_offset=0):
+    """Fill a ref-shaped table with `rows` synthetic scrapes of `products` products, one second apart.
+
+    Row g scrapes product `product_offset + g % products` at 2024-01-01 + g seconds.
+    """
+    products = products or max(1, rows // 10)
+    with engine.begin() as connection:
+        if create:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+            connection.execute(text(f"""
+                CREATE TABLE {table_name} (
+                    id SERIAL PRIMARY KEY, name VARCHAR NOT NULL, price VARCHAR NOT NULL,
+                    originalprice VARCHAR NOT NULL, discountpercentage VARCHAR NOT NULL, detail VARCHAR,
+                    platform VARCHAR NOT NULL, productmasterid VARCHAR, category VARCHAR,
+                    createdate TIMESTAMP NOT NULL)"""))
+        connection.execute(text(f"""
+            INSERT INTO {table_name} (name, price, originalprice, discountpercentage, detail, platform,
+                                      productmasterid, category, createdate)
+            SELECT 'Product ' || (g % :products),
+                   'Rp ' || (g % 90 + 10) || '.' || lpad(((g * 7) % 1000)::text, 3, '0'),
+                   'Rp ' || (g % 90 + 12) || '.000',
+                   ((g % 5) * 5) || '%',
+                   'Description of product ' || (g % :products),
+                   'klikindomaret',
+                   (:offset + g % :products)::text,
+                   'Category ' || (g % 20),
+                   TIMESTAMP '2024-01-01' + g * INTERVAL '1 second'
+            FROM generate_series(:first, :last) AS g"""),
+            {'products': products, 'offset': product_offset, 'first': start_row, 'last': start_row + rows - 1})
+        connection.execute(text(f"ANALYZE {table_name}"))
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_pandas(url, csv_file):
+    cleansing = load_script('cleansing_klikindomart.py')
+    engine = get_engine(url)
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw_data = cleansing.load_data(engine, REF_TABLE)
+        raw_data.head()
+        cleaning_sql = cleansing.read_sql_file(os.path.join(REPO_DIR, 'cleaning_query.sql'), REF_TABLE)
+        cleaned_data = cleansing.clean_data(engine, cleaning_sql)
+        cleansing.save_cleaned_data(engine, cleaned_data, CLEANED_TABLE)
+        cleansing.save_data_to_csv(cleaned_data, csv_file)
+    return peak_rss_mb()
+
+
+def run_server_side(url, csv_file):
+    cleansing = load_script('cleansing_klikindomart.py')
+    engine = get_engine(url)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleansing.load_sample(engine, REF_TABLE)
+        cleaning_sql = cleansing.read_sql_file(os.path.join(REPO_DIR, 'cleaning_query.sql'), REF_TABLE)
+        cleansing.build_cleaned_table(engine, cleaning_sql, CLEANED_TABLE)
+        cleansing.export_table_to_csv(engine, CLEANED_TABLE, csv_file)
+    return peak_rss_mb()
+
+
+def in_fresh_process(func, *args):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(func, *args).result()
+
+
+def count_rows(engine, table_name):
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    args = parser.parse_args()
+
+    engine = get_engine(args.url)
+    csv_file = os.path.join(tempfile.mkdtemp(), 'cleaned.csv')
+    try:
+        for size in args.sizes:
+            make_ref_table(engine, size)
+            for name, run in (('pandas', run_pandas), ('server', run_server_side)):
+                peak, elapsed = timed(in_fresh_process, run, args.url, csv_file)
+                rows = count_rows(engine, CLEANED_TABLE)
+                print(f"{size:>8} ref rows {name:>7}: {elapsed:6.2f}s, peak RSS {peak:7.1f} MB, "
+                      f"{rows} products, csv {os.path.getsize(csv_file) / 1e6:.1f} MB")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {REF_TABLE}"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {CLEANED_TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Staging-table load throughput: per-batch DataFrame.to_sql vs CopyLoader (COPY FROM STDIN).
+
+Needs a PostgreSQL database (the docker-compose one by default); the benchmark
+table is dropped afterwards.
+
+    python benchmarks/bench_copy_loader.py --sizes 1000 10000 100000
+"""
+import argparse
+
+import pandas as pd
+from sqlalchemy import text
+
+from bench_file_sink import make_row
+from common import timed
+from pg_loader import CopyLoader, get_engine, postgres_url
+
+TABLE_NAME = 'bench_loader_stg'
+COLUMNS = ['name', 'link', 'plu', 'discount', 'original_price', 'discounted_price',
+           'description', 'store_info', 'category', 'createdate']
+
+
+def reset_table(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE_NAME}"))
+        connection.execute(text(f"CREATE TABLE {TABLE_NAME} ("
+                                + ', '.join(f"{c} TIMESTAMP" if c == 'createdate' else f"{c} VARCHAR" for c in COLUMNS)
+                                + ")"))
+
+
+def load_to_sql(engine, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        pd.DataFrame(rows[start:start + batch_size]).to_sql(TABLE_NAME, engine, if_exists='append', index=False)
+
+
+def load_copy(engine, rows, batch_size, load_batch_size):
+    with CopyLoader(engine, TABLE_NAME, COLUMNS, batch_size=load_batch_size) as loader:
+        for start in range(0, len(rows), batch_size):
+            loader.add(rows[start:start + batch_size])
+
+
+def count_rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT COUNT(*) FROM {TABLE_NAME}")).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--batch', type=int, default=5, help="rows handed over per scraper batch")
+    parser.add_argument('--load-batch', type=int, default=500, help="rows per COPY")
+    args = parser.parse_args()
+
+    engine = get_engine(args.url)
+    try:
+        for size in args.sizes:
+            rows = [make_row(i) for i in range(size)]
+            for name, load in (('to_sql', lambda: load_to_sql(engine, rows, args.batch)),
+                               ('copy', lambda: load_copy(engine, rows, args.batch, args.load_batch))):
+                reset_table(engine)
+                _, elapsed = timed(load)
+                assert count_rows(engine) == size
+                print(f"{size:>7} rows {name:>7}: {elapsed:7.2f}s ({size / elapsed:,.0f} rows/s)")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABLE_NAME}"))
+
+
+if __name__ == "__main__":
+    main()
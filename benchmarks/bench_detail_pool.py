@@ -0,0 +1,70 @@
+"""Serial vs worker-pool detail scraping for klikindomaret, fully offline.
+
+Serves the saved listing/detail pages from benchmarks/fixtures with a local
+HTTP server, scrapes them through the scraper engine with one headless Chrome
+(serial) or a pool of them, and writes the staging rows to a throwaway SQLite
+database instead of PostgreSQL.
+
+    python benchmarks/bench_detail_pool.py --workers 4 --delay 0.5
+"""
+import argparse
+import os
+import tempfile
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from sqlalchemy import create_engine, text
+
+from common import LISTING_PATH, timed
+from fixture_server import start_fixture_server
+from driver_pool import DriverPool
+from pg_loader import CopyLoader
+from scraper_engine import ScrapeEngine
+from scraper_platforms import KlikindomaretPlatform
+
+
+def headless_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    return webdriver.Chrome(options=chrome_options)
+
+
+def count_rows(engine, table_name):
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--delay', type=float, default=0.0, help="artificial server latency per request (s)")
+    parser.add_argument('--wait', type=float, default=0.5, help="WAIT_TIME used by the scraper (s)")
+    args = parser.parse_args()
+
+    server, site_url = start_fixture_server('klikindomaret', delay=args.delay)
+    platform = KlikindomaretPlatform(f"{site_url}{LISTING_PATH}", site_url=site_url)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, workers in (('serial', 1), ('pool', args.workers)):
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, mode)}.db")
+            platform.create_table(engine)
+            loader = CopyLoader(engine, platform.table_name, platform.columns)
+            with DriverPool(headless_driver, workers) as pool:
+                scraper = ScrapeEngine(platform, loader, workers=workers, detail_engine='browser',
+                                       max_pages=args.pages, wait_time=args.wait, driver_pool=pool)
+                try:
+                    products, elapsed = timed(scraper.run)
+                finally:
+                    loader.close()
+            rows = count_rows(engine, platform.table_name)
+            print(f"{mode:>6}: {len(products)} listed, {rows} rows staged in {elapsed:.2f}s "
+                  f"({rows / elapsed:.2f} products/s)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
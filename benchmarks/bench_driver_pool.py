@@ -0,0 +1,96 @@
+"""Browser pool: startup with per-browser driver lookup vs cached driver + prewarm, and page loads with/without resource blocking and recycling.
+
+Serves the saved klikindomaret pages from benchmarks/fixtures with a local HTTP
+server and loads them through a DriverPool of headless Chrome. Needs Chrome;
+the first startup row needs network access for webdriver-manager.
+
+    python benchmarks/bench_driver_pool.py --browsers 4 --pages 200 --recycle-after 50
+"""
+import argparse
+import urllib.request
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service as ChromeService
+
+from common import LISTING_PATH, timed
+from fixture_server import start_fixture_server
+from driver_pool import DriverPool, browser_rss_mb, lighten_options, start_driver
+from page_loader import KLIKINDOMARET_DETAIL_SELECTOR, load_page
+from product_parser import parse_listing
+
+
+def headless_options(light):
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return lighten_options(options) if light else options
+
+
+def lookup_driver():
+    # What setup_driver did before: resolve the driver on every start
+    from webdriver_manager.chrome import ChromeDriverManager
+    service = ChromeService(executable_path=ChromeDriverManager().install())
+    return webdriver.Chrome(service=service, options=headless_options(False))
+
+
+def cached_driver(light=False):
+    return start_driver(lambda path: webdriver.Chrome(service=ChromeService(executable_path=path),
+                                                      options=headless_options(light)), light)
+
+
+def bench_startup(browsers):
+    for name, factory, prewarm in (('lookup, serial', lookup_driver, False), ('cached, prewarm', cached_driver, True)):
+        with DriverPool(factory, browsers) as pool:
+            if prewarm:
+                _, elapsed = timed(pool.prewarm)
+            else:
+                _, elapsed = timed(lambda: [pool.release(driver) for driver in [pool.acquire() for _ in range(browsers)]])
+        print(f"{name:>16}: {browsers} browsers ready in {elapsed:.2f}s")
+
+
+def bench_pages(links, browsers, recycle_after, wait):
+    cases = (('full pages', False, 0), ('blocked', True, 0), ('blocked+recycle', True, recycle_after))
+    for name, light, recycle in cases:
+        peak_rss = 0.0
+        with DriverPool(lambda: cached_driver(light), browsers, max_pages=recycle, max_rss_mb=0) as pool:
+            pool.prewarm()
+
+            def load_all():
+                nonlocal peak_rss
+                for link in links:
+                    with pool.lease() as driver:
+                        load_page(driver, link, KLIKINDOMARET_DETAIL_SELECTOR, wait)
+                        peak_rss = max(peak_rss, browser_rss_mb(driver) or 0.0)
+
+            _, elapsed = timed(load_all)
+            s = pool.stats.summary()
+        print(f"{name:>16}: {len(links)} pages in {elapsed:.2f}s ({len(links) / elapsed:.1f} pages/s), "
+              f"peak browser RSS {peak_rss:.0f} MB, {s['recycled_pages']} recycled")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--browsers', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=200, help="product pages loaded per case")
+    parser.add_argument('--recycle-after', type=int, default=50)
+    parser.add_argument('--wait', type=float, default=5.0, help="readiness timeout (s)")
+    parser.add_argument('--skip-startup', action='store_true', help="skip the webdriver-manager lookup comparison")
+    args = parser.parse_args()
+
+    if not args.skip_startup:
+        bench_startup(args.browsers)
+
+    server, site_url = start_fixture_server('klikindomaret')
+    try:
+        html = urllib.request.urlopen(f"{site_url}{LISTING_PATH}&page=1").read().decode()
+        base_links = [product['link'] for product in parse_listing(html, site_url)]
+        links = [f"{base_links[i % len(base_links)]}?r={i}" for i in range(args.pages)]
+        bench_pages(links, args.browsers, args.recycle_after, args.wait)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
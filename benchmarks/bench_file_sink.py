@@ -0,0 +1,86 @@
+"""Per-batch write cost as the output grows: old read-concat-rewrite CSV vs append-only sinks.
+
+    python benchmarks/bench_file_sink.py --rows 20000 --batch 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from common import timed
+from file_sink import CsvSink, ParquetSink
+
+COLUMNS = ['name', 'link', 'plu', 'discount', 'original_price', 'discounted_price',
+           'description', 'store_info', 'category']
+
+
+def make_row(i):
+    return {
+        'name': f"Produk Unilever {i}",
+        'link': f"https://www.klikindomaret.com/product/produk-{i}",
+        'plu': str(20000000 + i),
+        'discount': '10%' if i % 3 == 0 else '',
+        'original_price': f"Rp {15000 + i % 5000:,}".replace(',', '.'),
+        'discounted_price': f"Rp {13500 + i % 5000:,}".replace(',', '.'),
+        'description': "Produk resmi Unilever Indonesia. Simpan di tempat kering dan sejuk.",
+        'store_info': 'Dijual oleh Indomaret',
+        'category': ['Shampoo', 'Deterjen', 'Pasta Gigi', 'Teh'][i % 4],
+        'createdate': datetime.now(),
+    }
+
+
+class RewriteCsv:
+    """The old tokopedia.save_to_csv behaviour."""
+
+    def __init__(self, path, columns):
+        self.path = path
+
+    def write_batch(self, rows):
+        df = pd.DataFrame(rows)
+        if not os.path.exists(self.path):
+            df.to_csv(self.path, index=False)
+        else:
+            existing_df = pd.read_csv(self.path)
+            pd.concat([existing_df, df], ignore_index=True).to_csv(self.path, index=False)
+
+    def close(self):
+        pass
+
+
+def run(sink_cls, path, rows, batch_size):
+    sink = sink_cls(path, COLUMNS)
+    costs = []
+    for start in range(0, rows, batch_size):
+        batch = [make_row(i) for i in range(start, min(start + batch_size, rows))]
+        t0 = time.perf_counter()
+        sink.write_batch(batch)
+        costs.append(time.perf_counter() - t0)
+    _, close_cost = timed(sink.close)
+    return costs, close_cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=5)
+    parser.add_argument('--rewrite-rows', type=int, default=3000,
+                        help="rows for the old rewrite path (it is quadratic, keep it smaller)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, sink_cls, ext, rows in (('rewrite csv', RewriteCsv, 'csv', args.rewrite_rows),
+                                          ('append csv', CsvSink, 'csv', args.rows),
+                                          ('parquet', ParquetSink, 'parquet', args.rows)):
+            costs, close_cost = run(sink_cls, os.path.join(tmp, f"{name.replace(' ', '_')}.{ext}"), rows, args.batch)
+            tenth = max(1, len(costs) // 10)
+            first = sum(costs[:tenth]) / tenth * 1000
+            last = sum(costs[-tenth:]) / tenth * 1000
+            print(f"{name:>12}: {rows} rows, {len(costs)} batches, total {sum(costs) + close_cost:.2f}s, "
+                  f"per batch first 10% {first:.3f}ms, last 10% {last:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
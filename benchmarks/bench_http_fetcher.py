@@ -0,0 +1,66 @@
+"""Detail-page throughput (pages/s): browser engine vs plain-HTTP engine on a local mock server.
+
+    python benchmarks/bench_http_fetcher.py --repeat 20 --delay 0.1
+    python benchmarks/bench_http_fetcher.py --skip-browser   # no Chrome needed
+"""
+import argparse
+import urllib.request
+
+from common import LISTING_PATH, timed
+from fixture_server import start_fixture_server
+from http_fetcher import HttpFetcher
+from page_loader import KLIKINDOMARET_DETAIL_SELECTOR, load_page
+from product_parser import parse_detail, parse_detail_if_complete, parse_listing
+
+
+def detail_links(site_url, pages=2):
+    links = []
+    for page in range(1, pages + 1):
+        html = urllib.request.urlopen(f"{site_url}{LISTING_PATH}&page={page}").read().decode()
+        links += [p['link'] for p in parse_listing(html, site_url)]
+    return links
+
+
+def run_browser(links, wait_time=5):
+    from bench_detail_pool import headless_driver
+    driver = headless_driver()
+    try:
+        return [parse_detail(load_page(driver, link, KLIKINDOMARET_DETAIL_SELECTOR, wait_time)) for link in links]
+    finally:
+        driver.quit()
+
+
+def run_http(links, concurrency, rate):
+    with HttpFetcher(concurrency, rate) as fetcher:
+        pages = fetcher.fetch_many(links)
+    rows = [parse_detail_if_complete(pages[link] or '') for link in links]
+    assert all(rows), "fixture pages should never need the browser"
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help="times each detail page is fetched")
+    parser.add_argument('--delay', type=float, default=0.1, help="artificial server latency per request (s)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=0, help="per-host requests/s for the HTTP engine (0 = unlimited)")
+    parser.add_argument('--skip-browser', action='store_true')
+    args = parser.parse_args()
+
+    server, site_url = start_fixture_server('klikindomaret', delay=args.delay)
+    # A distinct query string per repeat so every fetch is a real request
+    base_links = detail_links(site_url)
+    links = [f"{link}?r={i}" for i in range(args.repeat) for link in base_links]
+
+    engines = [('http', lambda: run_http(links, args.concurrency, args.rate))]
+    if not args.skip_browser:
+        engines.insert(0, ('browser', lambda: run_browser(links)))
+    for name, run in engines:
+        rows, elapsed = timed(run)
+        print(f"{name:>8}: {len(rows)} pages in {elapsed:.2f}s ({len(rows) / elapsed:.1f} pages/s)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
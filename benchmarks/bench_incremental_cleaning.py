@@ -0,0 +1,83 @@
+"""Incremental product merge vs full cleaning rebuild as new ref rows arrive on a large history.
+
+Builds a synthetic ref table (1M rows by default), runs the first (full) build,
+then appends deltas of increasing size. Each delta is merged incrementally and
+also rebuilt from scratch, and both product tables are checked to be identical.
+Needs a PostgreSQL database (the docker-compose one by default); the benchmark
+tables are dropped afterwards.
+
+    python benchmarks/bench_incremental_cleaning.py --history 1000000 --deltas 1000 10000 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+
+from sqlalchemy import text
+
+from bench_cleaning import CLEANED_TABLE, REF_TABLE, count_rows, make_ref_table
+from common import REPO_DIR, load_script, timed
+from pg_loader import get_engine, postgres_url
+
+FULL_TABLE = f'{CLEANED_TABLE}_full'
+JOB_NAME = 'bench_incremental_cleaning'
+
+
+def differing_rows(engine):
+    columns = "id, name, price, originalprice, discountpercentage, detail, platform, productmasterid, category, createdate"
+    with engine.connect() as connection:
+        return connection.execute(text(f"""
+            SELECT COUNT(*) FROM (
+                (SELECT {columns} FROM {CLEANED_TABLE} EXCEPT SELECT {columns} FROM {FULL_TABLE})
+                UNION ALL
+                (SELECT {columns} FROM {FULL_TABLE} EXCEPT SELECT {columns} FROM {CLEANED_TABLE})
+            ) AS diff""")).scalar()
+
+
+def drop_tables(engine):
+    with engine.begin() as connection:
+        for table_name in (REF_TABLE, CLEANED_TABLE, FULL_TABLE):
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        if connection.execute(text("SELECT to_regclass('etl_watermark')")).scalar():
+            connection.execute(text("DELETE FROM etl_watermark WHERE job_name = :job"), {'job': JOB_NAME})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    parser.add_argument('--history', type=int, default=1000000, help="ref rows before the first delta")
+    parser.add_argument('--deltas', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    # The pipeline reads its SQL files relative to the repo root
+    os.chdir(REPO_DIR)
+    cleansing = load_script('cleansing_klikindomart.py')
+    engine = get_engine(args.url)
+    full_sql = cleansing.read_sql_file('cleaning_query.sql', REF_TABLE)
+    products = args.history // 10
+    drop_tables(engine)
+    try:
+        make_ref_table(engine, args.history, products)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, elapsed = timed(cleansing.merge_new_products, engine, REF_TABLE, CLEANED_TABLE, JOB_NAME)
+        print(f"first run (full build): {args.history} ref rows in {elapsed:.2f}s")
+
+        total = args.history
+        for delta in args.deltas:
+            # Half of the delta's products are new, half were seen before
+            make_ref_table(engine, delta, products=delta, start_row=total, create=False,
+                           product_offset=products - delta // 2)
+            total += delta
+            with contextlib.redirect_stdout(io.StringIO()):
+                merged, incremental = timed(cleansing.merge_new_products, engine, REF_TABLE, CLEANED_TABLE, JOB_NAME)
+                _, full = timed(cleansing.build_cleaned_table, engine, full_sql, FULL_TABLE)
+            assert differing_rows(engine) == 0, "incremental result differs from the full rebuild"
+            print(f"delta {delta:>7} rows on {total:>8} history: incremental {incremental:6.2f}s "
+                  f"({merged} products merged), full rebuild {full:6.2f}s ({full / incremental:.0f}x), "
+                  f"{count_rows(engine, CLEANED_TABLE)} products, identical")
+    finally:
+        drop_tables(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Price recommendation scoring: per-row iterrows + predict vs one predict per category vs the stacked coefficient table.
+
+Trains model.py's per-category models on a synthetic product table and scores
+it three ways; no database needed. The per-row loop's prints go to /dev/null.
+
+    python benchmarks/bench_model_scoring.py --rows 10000 100000 --categories 50
+"""
+import argparse
+import contextlib
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from common import load_script, timed
+
+
+def make_products(rows, categories, seed=42):
+    """Synthetic product table with model.py's columns and a linear price per category."""
+    rng = np.random.default_rng(seed)
+    category = rng.integers(0, categories, rows)
+    originalprice = rng.uniform(1_000, 200_000, rows).round()
+    slope = rng.uniform(0.6, 1.0, categories)[category]
+    return pd.DataFrame({
+        'productmasterid': [f"P{i:08d}" for i in range(rows)],
+        'category': [f"Category {c}" for c in category],
+        'originalprice': originalprice,
+        'price': (originalprice * slope + rng.normal(0, 500, rows)).round(),
+    })
+
+
+def recommend_price(originalprice, model):
+    # model.py's previous per-product helper
+    return model.predict(pd.DataFrame([[originalprice]], columns=['originalprice']))[0]
+
+
+def score_category(data, category, model, date=None):
+    """Recommend prices for every product of one category with a single predict call."""
+    return pd.DataFrame({
+        'productmasterid': data['productmasterid'].to_numpy(),
+        'category': category,
+        'price': model.predict(data[['originalprice']]),
+        'date': date or datetime.now().date(),
+    })
+
+
+def legacy_scoring(data_by_category, models):
+    # model.main()'s previous loop
+    recommendations = []
+    for category, data in data_by_category.items():
+        if category not in models:
+            continue
+        model = models[category]
+        for index, row in data.iterrows():
+            recommended_price = recommend_price(row['originalprice'], model)
+            recommendations.append({
+                'productmasterid': row['productmasterid'],
+                'category': category,
+                'price': recommended_price,
+                'date': datetime.now().date()
+            })
+            print(f"ProductMasterID: {row['productmasterid']}, Category: {category}, Recommended Price: {recommended_price}, Date: {datetime.now().date()}")
+    return pd.DataFrame(recommendations)
+
+
+def per_category_scoring(data_by_category, models):
+    return pd.concat([score_category(data, category, models[category])
+                      for category, data in data_by_category.items() if category in models], ignore_index=True)
+
+
+def check_same(expected, actual):
+    key = ['productmasterid']
+    expected = expected.sort_values(key).reset_index(drop=True)
+    actual = actual.sort_values(key).reset_index(drop=True)
+    assert expected['productmasterid'].tolist() == actual['productmasterid'].tolist()
+    assert np.allclose(expected['price'].astype(float), actual['price'].astype(float), rtol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--skip-legacy-above', type=int, default=50_000, help="skip the per-row loop above this size")
+    args = parser.parse_args()
+
+    model_script = load_script('model.py')
+    for rows in args.rows:
+        products = make_products(rows, args.categories)
+        data_by_category = model_script.prepare_data_by_category(products)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            models = model_script.train_models(data_by_category)
+
+        results = {}
+        runs = [('per category', lambda: per_category_scoring(data_by_category, models)),
+                ('stacked', lambda: model_script.build_recommendations(products, models))]
+        if rows <= args.skip_legacy_above:
+            runs.insert(0, ('iterrows', lambda: legacy_scoring(data_by_category, models)))
+        for name, run in runs:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                results[name], elapsed = timed(run)
+            print(f"{rows:>9} rows {name:>12}: {elapsed:8.3f}s ({rows / elapsed:12,.0f} rows/s)")
+        reference = results.get('iterrows', results['per category'])
+        for frame in results.values():
+            check_same(reference, frame)
+
+
+if __name__ == "__main__":
+    main()
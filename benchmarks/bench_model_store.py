@@ -0,0 +1,69 @@
+"""Category model training with the model store: cold, warm, and with a share of categories changed.
+
+Runs model.train_models on a synthetic product table against a throwaway
+store, reporting hit rate, training time and time saved per run, and checks
+the reused models match a fresh fit. No database needed.
+
+    python benchmarks/bench_model_store.py --rows 1000000 --categories 2000 --changed 0.1
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+
+import numpy as np
+
+from bench_model_scoring import make_products
+from bench_model_training import fitted
+from common import load_script, timed
+from model_store import ModelStore
+
+
+def change_categories(products, share, seed=7):
+    """Shift the prices of a random share of categories, as a day of new scraped prices would."""
+    rng = np.random.default_rng(seed)
+    categories = products['category'].unique()
+    changed = rng.choice(categories, int(len(categories) * share), replace=False)
+    products = products.copy()
+    mask = products['category'].isin(changed)
+    products.loc[mask, 'price'] = products.loc[mask, 'price'] * 1.01
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=2_000)
+    parser.add_argument('--changed', type=float, default=0.1, help="share of categories whose prices change")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--max-mb', type=float, default=256, help="store size limit")
+    args = parser.parse_args()
+
+    model_script = load_script('model.py')
+    products = make_products(args.rows, args.categories)
+    updated = change_categories(products, args.changed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = (('no store', products, False), ('cold store', products, True), ('warm store', products, True),
+                (f"{args.changed:.0%} changed", updated, True))
+        for name, data, use_store in runs:
+            data_by_category = model_script.prepare_data_by_category(data)
+            store = ModelStore(tmp, int(args.max_mb * 2 ** 20)) if use_store else None
+            try:
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    models, elapsed = timed(model_script.train_models, data_by_category, args.workers, store)
+                    fresh = model_script.train_models(data_by_category, args.workers)
+                assert fitted(models) == fitted(fresh), "reused models differ from a fresh fit"
+                line = f"{name:>12}: {len(models)} models in {elapsed:6.2f}s"
+                if store is not None:
+                    s = store.stats()
+                    line += (f", hit rate {s['hit_rate']:5.1%}, {s['saved_seconds']:.2f}s of fitting saved, "
+                             f"{s['evicted']} evicted, {s['bytes'] / 1e6:.1f} MB stored")
+                print(line)
+            finally:
+                if store is not None:
+                    store.close()
+
+
+if __name__ == "__main__":
+    main()
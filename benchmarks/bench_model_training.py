@@ -0,0 +1,58 @@
+"""Per-category training: boolean-mask partitioning + serial fits vs groupby partitioning + a process pool.
+
+Runs model.py's partitioning and training on a synthetic product table and
+checks every worker count yields the same coefficients and intercepts as the
+serial path. No database needed.
+
+    python benchmarks/bench_model_training.py --rows 1000000 --categories 2000 --workers 1 2 4 8
+"""
+import argparse
+import contextlib
+import os
+
+from bench_model_scoring import make_products
+from common import load_script, timed
+
+
+def mask_partition(data):
+    # model.prepare_data_by_category's previous implementation
+    categories = data['category'].unique()
+    return {category: data[data['category'] == category] for category in categories}
+
+
+def fitted(models):
+    return {category: (model.coef_.tolist(), float(model.intercept_)) for category, model in models.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=2_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--skip-mask', action='store_true', help="skip the boolean-mask partition (slow at many categories)")
+    args = parser.parse_args()
+
+    model_script = load_script('model.py')
+    products = make_products(args.rows, args.categories)
+
+    partitions = {}
+    runs = [('groupby', model_script.prepare_data_by_category)]
+    if not args.skip_mask:
+        runs.insert(0, ('boolean mask', mask_partition))
+    for name, partition in runs:
+        partitions[name], elapsed = timed(partition, products)
+        print(f"{name:>14} partition: {len(partitions[name])} categories in {elapsed:.2f}s")
+
+    reference = None
+    for workers in args.workers:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            models, elapsed = timed(model_script.train_models, partitions['groupby'], workers)
+        result = fitted(models)
+        reference = reference or result
+        assert result == reference, f"{workers} workers gave different models than the serial path"
+        print(f"{workers:>3} workers: {len(models)} models in {elapsed:.2f}s "
+              f"({len(models) / elapsed:,.0f} categories/s), identical to serial")
+
+
+if __name__ == "__main__":
+    main()
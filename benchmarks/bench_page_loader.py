@@ -0,0 +1,55 @@
+"""Per-page latency: fixed sleep vs readiness-based loading on local fixture pages.
+
+    python benchmarks/bench_page_loader.py --sleep 5 --delay 0.2
+"""
+import argparse
+import time
+
+from bench_detail_pool import headless_driver
+from common import LISTING_PATH
+from fixture_server import start_fixture_server
+from page_loader import (PageLoadStats, load_page, KLIKINDOMARET_DETAIL_SELECTOR,
+                         KLIKINDOMARET_LISTING_SELECTOR)
+from product_parser import parse_listing
+
+
+def fixed_sleep_load(driver, url, sleep, stats):
+    start = time.perf_counter()
+    driver.get(url)
+    time.sleep(sleep)
+    page_source = driver.page_source
+    stats.record(url, time.perf_counter() - start, True)
+    return page_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sleep', type=float, default=5.0, help="fixed wait used by the old loader (s)")
+    parser.add_argument('--timeout', type=float, default=10.0, help="readiness timeout (s)")
+    parser.add_argument('--delay', type=float, default=0.2, help="artificial server latency per request (s)")
+    args = parser.parse_args()
+
+    server, site_url = start_fixture_server('klikindomaret', delay=args.delay)
+    driver = headless_driver()
+    try:
+        listing_html = load_page(driver, f"{site_url}{LISTING_PATH}&page=1", KLIKINDOMARET_LISTING_SELECTOR, args.timeout)
+        links = [p['link'] for p in parse_listing(listing_html, site_url)]
+        pages = [(f"{site_url}{LISTING_PATH}&page=1", KLIKINDOMARET_LISTING_SELECTOR)]
+        pages += [(link, KLIKINDOMARET_DETAIL_SELECTOR) for link in links]
+
+        sleep_stats, ready_stats = PageLoadStats(), PageLoadStats()
+        for url, selector in pages:
+            fixed_sleep_load(driver, url, args.sleep, sleep_stats)
+            load_page(driver, url, selector, args.timeout, ready_stats)
+    finally:
+        driver.quit()
+        server.shutdown()
+
+    for label, stats in (('fixed sleep', sleep_stats), ('readiness', ready_stats)):
+        s = stats.summary()
+        print(f"{label:>12}: {s['pages']} pages, total {s['total']:.2f}s, p50 {s['p50']:.3f}s, "
+              f"p95 {s['p95']:.3f}s, max {s['max']:.3f}s, timeouts {s['timeouts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Parsing micro-benchmark on the saved pages: html.parser + per-field find vs product_parser.
+
+Also asserts that both produce identical output.
+
+    python benchmarks/bench_parser.py --repeat 200
+"""
+import argparse
+import glob
+import os
+
+from bs4 import BeautifulSoup
+
+from common import timed
+from fixture_server import FIXTURES_DIR
+import product_parser
+
+SITE_URL = "https://www.klikindomaret.com"
+
+
+# The scrapers' original parsing code, kept here as the reference implementation
+def get_text(product, tag, class_name):
+    tag = product.find(tag, class_=class_name)
+    return tag.text.strip() if tag else ''
+
+
+def get_price_text(product, tag, class_name):
+    tag = product.find(tag, class_=class_name)
+    return f"Rp {tag.text.strip().split('Rp')[-1].strip()}" if tag else ''
+
+
+def legacy_parse_listing(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    product_details = []
+    for product in soup.find_all('div', class_='each-item'):
+        link_tag = product.find_parent('a', href=True)
+        attr_tag = product.find('div', class_='wrp-media')
+        product_details.append({
+            'name': get_text(product, 'div', 'title'),
+            'link': f"{SITE_URL}{link_tag['href']}" if link_tag else '',
+            'plu': attr_tag['data-plu'] if attr_tag and 'data-plu' in attr_tag.attrs else '',
+            'card_price': get_price_text(product, 'span', 'price-value'),
+        })
+    return product_details
+
+
+def legacy_parse_detail(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    breadcrumbs = soup.find('div', class_='breadcrumb')
+    return {
+        'discount': get_text(soup, 'span', 'discount'),
+        'original_price': get_price_text(soup, 'span', 'strikeout disc-price'),
+        'discounted_price': get_text(soup, 'span', 'normal price-final'),
+        'description': soup.find('span', id='desc-product').text.strip() if soup.find('span', id='desc-product') else '',
+        'store_info': get_text(soup, 'span', 'typesend-title'),
+        'category': breadcrumbs.find_all('a')[-1].text.strip() if breadcrumbs else '',
+    }
+
+
+def new_parse_listing(html):
+    rows = product_parser.parse_listing(html, SITE_URL)
+    for row in rows:
+        del row['createdate']
+    return rows
+
+
+def read_pages(pattern):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'klikindomaret', pattern))):
+        with open(path, encoding='utf-8') as file:
+            pages.append(file.read())
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    for kind, pages, legacy, new in (('listing', read_pages('page/*.html'), legacy_parse_listing, new_parse_listing),
+                                     ('detail', read_pages('product/*.html'), legacy_parse_detail,
+                                      product_parser.parse_detail)):
+        for html in pages:
+            assert legacy(html) == new(html), f"{kind} output differs"
+        workload = pages * args.repeat
+        _, legacy_time = timed(lambda: [legacy(html) for html in workload])
+        _, new_time = timed(lambda: [new(html) for html in workload])
+        print(f"{kind:>8}: {len(workload)} pages, html.parser {len(workload) / legacy_time:,.0f} pages/s, "
+              f"lxml+strainer {len(workload) / new_time:,.0f} pages/s ({legacy_time / new_time:.1f}x), output identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Price normalization throughput: row-wise Series.apply vs the vectorized price_normalizer.
+
+Also asserts that both produce identical values.
+
+    python benchmarks/bench_price_normalizer.py --rows 1000000
+"""
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+from common import timed
+from price_normalizer import SUFFIX_MULTIPLIERS, to_number
+
+SAMPLES = ['Rp28.400', 'Rp 31.200', 'Rp29.700', '4%', '15%', '4,8', '2,8 rb', '1,2 jt', '10 rb Terjual',
+           '1.234.567', '1.234,5', '4.8', '-4%', '10rb+ terjual', '250+', 'Rp. 5.000', 5000, 4.5, '', None, 'Habis']
+NUMBER = re.compile(r'^([0-9][0-9.,]*)(' + '|'.join(SUFFIX_MULTIPLIERS) + r')?$')
+GROUPED = re.compile(r'^[0-9]{1,3}(\.[0-9]{3})+$')
+
+
+def parse_one(value):
+    # Straightforward per-value reference implementation
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return np.nan
+    text = re.sub(r'terjual|%|\s', '', value.lower()).strip('-+')
+    text = re.sub(r'^rp\.?', '', text).strip('-+')
+    match = NUMBER.match(text)
+    if not match:
+        return np.nan
+    number, suffix = match.groups()
+    if ',' in number or GROUPED.match(number):
+        number = number.replace('.', '')
+    number = number.replace(',', '.')
+    try:
+        return float(number) * SUFFIX_MULTIPLIERS.get(suffix, 1.0)
+    except ValueError:
+        return np.nan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = {
+        'scraped mix': pd.Series(rng.choice(np.array(SAMPLES, dtype=object), args.rows)),
+        # Worst case for the normalizer, which parses each distinct string once
+        'all distinct': pd.Series([f"Rp{i // 1000}.{i % 1000:03d}" for i in range(args.rows)]),
+    }
+    for label, values in columns.items():
+        expected, apply_time = timed(values.apply, parse_one)
+        result, vector_time = timed(to_number, values)
+        pd.testing.assert_series_equal(result, expected.astype('float64'))
+        print(f"{label:>12}, {args.rows} values: apply {args.rows / apply_time / 1e6:.2f}M values/s, "
+              f"vectorized {args.rows / vector_time / 1e6:.2f}M values/s ({apply_time / vector_time:.0f}x), identical")
+
+
+if __name__ == "__main__":
+    main()
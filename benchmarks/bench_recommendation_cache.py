@@ -0,0 +1,141 @@
+"""api_2.py with and without the in-process recommendation cache, plus invalidation on a new model run.
+
+Fills a throwaway schema (dropped afterwards) with synthetic recommendations
+through model.save_recommendations_to_db, then serves a mix of page, category
+and product reads from api_2.py with the cache off and on. Both must return
+the same bodies for a sample of requests. With the cache on, a second run of
+save_recommendations_to_db changes every price, and the benchmark measures how
+long the API takes to serve the new prices. It ends with the cache's hit/miss
+counters.
+
+    python benchmarks/bench_recommendation_cache.py --rows 100000 --requests 3000 --concurrency 1 16 64
+"""
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import random
+import time
+
+import aiohttp
+from sqlalchemy import create_engine, text
+
+from bench_api import SCHEMA, TABLE_NAME, load, schema_url, serve, wait_ready
+from bench_recommendation_upsert import make_recommendations
+from common import load_script
+from pg_loader import postgres_url
+
+
+def mixed_paths(recommendations, limit):
+    """Random page, category and product reads, in equal shares."""
+    rows = len(recommendations)
+    ids = recommendations['productmasterid'].to_numpy()
+    categories = recommendations['category'].unique()
+
+    def make_path():
+        kind = random.randrange(3)
+        if kind == 0:
+            return f"/recommendations/?skip={random.randrange(max(1, rows - limit))}&limit={limit}"
+        if kind == 1:
+            return f"/recommendations/{random.choice(categories)}?skip={random.randrange(100)}&limit={limit}"
+        return f"/recommendations/product/{random.choice(ids)}"
+    return make_path
+
+
+async def fetch_all(base_url, paths):
+    async with aiohttp.ClientSession() as session:
+        bodies = []
+        for path in paths:
+            async with session.get(f"{base_url}{path}") as response:
+                bodies.append(await response.json())
+        return bodies
+
+
+async def wait_for_price(base_url, productmasterid, price, timeout):
+    """Seconds until the API serves `price` for the product."""
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() - start < timeout:
+            async with session.get(f"{base_url}/recommendations/product/{productmasterid}") as response:
+                if abs((await response.json())['price'] - price) < 1e-6:
+                    return time.perf_counter() - start
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"new price not served after {timeout}s")
+
+
+def save(model_script, database_url, recommendations):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        model_script.save_recommendations_to_db(create_engine(database_url), recommendations, TABLE_NAME)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=3_000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--limit', type=int, default=10, help="page size requested")
+    parser.add_argument('--check-interval', type=float, default=1.0, help="the cache's version check interval")
+    parser.add_argument('--samples', type=int, default=200, help="requests compared between cache and database")
+    parser.add_argument('--timeout', type=float, default=10, help="seconds before a request counts as failed")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    args = parser.parse_args()
+
+    model_script = load_script('model.py')
+    admin = create_engine(args.url)
+    with admin.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    database_url = schema_url(args.url)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        recommendations = make_recommendations(args.rows)
+        save(model_script, database_url, recommendations)
+        make_path = mixed_paths(recommendations, args.limit)
+        random.seed(0)
+        samples = [make_path() for _ in range(args.samples)]
+        sample_bodies = None
+        runs = [('database', {'CACHE_ENABLED': False}),
+                ('cache', {'CACHE_ENABLED': True, 'CACHE_CHECK_INTERVAL': args.check_interval})]
+        for name, settings in runs:
+            server = multiprocessing.get_context('spawn').Process(
+                target=serve, args=(f"api_2.py ({name})", database_url, args.port, settings))
+            server.start()
+            try:
+                asyncio.run(wait_ready(base_url))
+                bodies = asyncio.run(fetch_all(base_url, samples))
+                sample_bodies = sample_bodies or bodies
+                assert bodies == sample_bodies, "cached responses differ from the database's"
+                for concurrency in args.concurrency:
+                    rps, (p50, p99), errors = asyncio.run(
+                        load(base_url, args.requests, concurrency, make_path, args.timeout))
+                    print(f"{name:>9}, {concurrency:>3} concurrent: {rps:8,.0f} req/s, "
+                          f"p50 {p50:7.1f} ms, p99 {p99:7.1f} ms, {errors} errors", flush=True)
+                if settings['CACHE_ENABLED']:
+                    # A new model run: every price changes and the run version is bumped with them
+                    updated = recommendations.assign(price=recommendations['price'] * 2)
+                    product = updated.iloc[len(updated) // 2]
+                    start = time.perf_counter()
+                    save(model_script, database_url, updated)
+                    saved = time.perf_counter() - start
+                    delay = asyncio.run(wait_for_price(base_url, product['productmasterid'], product['price'], 60))
+                    print(f"new run saved in {saved:.2f}s, served {delay:.2f}s later "
+                          f"(version check every {args.check_interval:g}s)")
+                    stats = asyncio.run(fetch_all(base_url, ['/cache/stats']))[0]
+                    print(f"cache: version {stats['version']}, {stats['rows']} rows, {stats['bytes'] / 2 ** 20:.1f} MiB, "
+                          f"{stats['hits']} hits, {stats['misses']} misses, {stats['refreshes']} loads")
+            finally:
+                server.terminate()
+                server.join(5)
+                if server.is_alive():
+                    server.kill()
+                    server.join()
+    finally:
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
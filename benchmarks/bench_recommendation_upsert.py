@@ -0,0 +1,101 @@
+"""Saving price recommendations: one INSERT per row vs COPY into a temp table + INSERT ... ON CONFLICT.
+
+Writes synthetic recommendations into a throwaway table in the given database
+(dropped afterwards). The upsert runs twice per size: into an empty table,
+then again over the same keys, which the per-row path cannot do (duplicate
+key). The per-row path's prints go to /dev/null.
+
+    python benchmarks/bench_recommendation_upsert.py --rows 10000 100000 1000000
+"""
+import argparse
+import contextlib
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Column, Date, Float, MetaData, String, Table, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from common import load_script, timed
+from pg_loader import get_engine, postgres_url
+
+TABLE_NAME = 'bench_pricerecommendation'
+
+
+def make_recommendations(rows, categories=50, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'productmasterid': [f"P{i:08d}" for i in range(rows)],
+        'category': [f"Category {c}" for c in rng.integers(0, categories, rows)],
+        'price': rng.uniform(1_000, 200_000, rows),
+        'date': date.today(),
+    })
+
+
+# model.py's previous save_recommendations_to_db, kept here as the "before" reference
+def legacy_save(engine, recommendations, table_name):
+    metadata = MetaData()
+    recommendations_table = Table(table_name, metadata,
+                                  Column('productmasterid', String, primary_key=True),
+                                  Column('category', String),
+                                  Column('price', Float),
+                                  Column('date', Date))
+    metadata.create_all(engine)
+    try:
+        with engine.begin() as connection:
+            for recommendation in recommendations:
+                ins = recommendations_table.insert().values(
+                    productmasterid=recommendation['productmasterid'],
+                    category=recommendation['category'],
+                    price=float(recommendation['price']),
+                    date=recommendation['date']
+                )
+                print(f"Inserting: {recommendation}")
+                connection.execute(ins)
+        print(f"Recommendations saved to table '{table_name}'.")
+    except SQLAlchemyError as e:
+        print(f"Error saving recommendations to the database: {e}")
+
+
+def drop_table(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLE_NAME}"))
+
+
+def count_rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT COUNT(*) FROM {TABLE_NAME}")).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--skip-legacy-above', type=int, default=100_000, help="skip the per-row path above this size")
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    args = parser.parse_args()
+
+    model_script = load_script('model.py')
+    engine = get_engine(args.url)
+    try:
+        for rows in args.rows:
+            recommendations = make_recommendations(rows)
+            runs = []
+            if rows <= args.skip_legacy_above:
+                records = recommendations.to_dict('records')
+                runs.append(('per-row insert', True, lambda: legacy_save(engine, records, TABLE_NAME)))
+            save = lambda: model_script.save_recommendations_to_db(engine, recommendations, TABLE_NAME)
+            runs += [('upsert (new)', True, save), ('upsert (rerun)', False, save)]
+            for name, fresh, run in runs:
+                if fresh:
+                    drop_table(engine)
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    _, elapsed = timed(run)
+                assert count_rows(engine) == rows
+                print(f"{rows:>9} rows {name:>15}: {elapsed:8.2f}s ({rows / elapsed:10,.0f} rows/s)")
+    finally:
+        drop_table(engine)
+
+
+if __name__ == "__main__":
+    main()
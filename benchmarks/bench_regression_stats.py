@@ -0,0 +1,173 @@
+"""Category regression from incrementally maintained sums vs a full sklearn refit.
+
+Loads a synthetic product table into a throwaway schema (dropped afterwards),
+builds the regression sums once, then adds a batch of new products, changes
+the prices of some existing ones (moving their createdate back, as the
+incremental cleansing merge can), deletes some and clears the category of
+others, as scrape + cleansing runs would. A final verify step compares the
+whole table with the ledger and must find nothing left to apply, and a swap
+step replaces the table as cleansing's full rebuild does, which the triggers
+cannot follow, so update_stats has to diff it in full.
+After each step the coefficients, intercepts and holdout MSEs solved from the
+sums are checked against LinearRegression/evaluate_model fitted on the same
+split, and the update + solve time is compared with refitting every category.
+
+    python benchmarks/bench_regression_stats.py --rows 1000000 --categories 2000 --new 0.01 --changed 0.001 --removed 0.001
+"""
+import argparse
+import contextlib
+import io
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from bench_model_scoring import make_products
+from common import load_script, timed
+from pg_loader import postgres_url
+import regression_stats
+
+SCHEMA = 'bench_regression'
+COLUMNS = ['productmasterid', 'category', 'originalprice', 'price', 'createdate']
+
+
+def copy_products(engine, products, replace=False):
+    """COPY products into the bench product table; with replace, rows with the same productmasterid are updated."""
+    buffer = io.StringIO()
+    products[COLUMNS].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            if not replace:
+                cursor.copy_expert(f"COPY product ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:
+                cursor.execute("CREATE TEMP TABLE product_load (LIKE product) ON COMMIT DROP")
+                cursor.copy_expert(f"COPY product_load ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+                cursor.execute("UPDATE product p SET price = l.price, originalprice = l.originalprice, "
+                               "createdate = l.createdate FROM product_load l WHERE p.productmasterid = l.productmasterid")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def remove_products(engine, deleted, uncategorized):
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM product WHERE productmasterid = ANY(:ids)"), {'ids': deleted})
+        connection.execute(text("UPDATE product SET category = NULL WHERE productmasterid = ANY(:ids)"),
+                           {'ids': uncategorized})
+
+
+def sklearn_reference(model_script, products):
+    """Fit and evaluate every category with model.py's train_model/evaluate_model on the regression_stats split."""
+    holdout = products['productmasterid'].map(regression_stats.is_holdout).to_numpy()
+    reference = {}
+    for category, data in products.groupby('category', sort=False):
+        mask = holdout[data.index]
+        train, test = data[~mask], data[mask]
+        # regression_stats solves categories with two or more training rows and varying x
+        if len(train) <= 1 or train['originalprice'].nunique() <= 1:
+            continue
+        model = model_script.train_model(train[['originalprice']], train['price'])
+        mse = model_script.evaluate_model(model, test[['originalprice']], test['price']) if len(test) else None
+        reference[category] = (float(model.coef_[0]), float(model.intercept_), mse)
+    return reference
+
+
+def check_same(solved, reference, rtol):
+    assert len(solved) == len(reference), f"{len(solved)} categories solved, {len(reference)} fitted"
+    worst = 0.0
+    for category, coef, intercept, _, mse in solved:
+        ref_coef, ref_intercept, ref_mse = reference[category]
+        # Intercepts are compared on the price scale, so a near-zero intercept does not blow up the ratio
+        scale = max(abs(ref_intercept), 1.0, abs(ref_coef) * 100_000)
+        errors = [abs(coef - ref_coef) / max(abs(ref_coef), 1e-12), abs(intercept - ref_intercept) / scale]
+        if ref_mse is not None:
+            errors.append(abs(mse - ref_mse) / max(ref_mse, 1e-12))
+        worst = max(worst, *errors)
+    assert worst <= rtol, f"largest relative difference {worst:.2e} exceeds {rtol:.0e}"
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=2_000)
+    parser.add_argument('--new', type=float, default=0.01, help="new products per update, as a share of --rows")
+    parser.add_argument('--changed', type=float, default=0.001, help="existing products repriced per update")
+    parser.add_argument('--removed', type=float, default=0.001,
+                        help="existing products deleted, and as many uncategorized, per update")
+    parser.add_argument('--rtol', type=float, default=1e-6)
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    args = parser.parse_args()
+
+    model_script = load_script('model.py')
+    admin = create_engine(args.url)
+    with admin.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    engine = create_engine(args.url, connect_args={'options': f"-csearch_path={SCHEMA}"})
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE product (productmasterid VARCHAR PRIMARY KEY, category VARCHAR, "
+                                    "originalprice FLOAT, price FLOAT, createdate TIMESTAMP)"))
+        now = datetime.now() - timedelta(days=1)
+        products = make_products(args.rows, args.categories)
+        products['createdate'] = now
+        copy_products(engine, products)
+
+        rng = np.random.default_rng(1)
+        steps = ['initial build', 'update', 'update', 'no change', 'verify', 'swap']
+        for step, name in enumerate(steps):
+            if name == 'update':
+                now += timedelta(hours=1)
+                new = make_products(int(args.rows * args.new), args.categories, seed=100 + step)
+                new['productmasterid'] = [f"N{step}-{i:08d}" for i in range(len(new))]
+                new['createdate'] = now
+                changed = products.iloc[rng.choice(len(products), int(len(products) * args.changed), replace=False)].copy()
+                changed['price'] = (changed['price'] * 1.05).round()
+                # An earlier sighting makes the cleansing merge move createdate back
+                changed['createdate'] = now - timedelta(days=30)
+                copy_products(engine, new)
+                copy_products(engine, changed, replace=True)
+                products.loc[changed.index, ['price', 'createdate']] = changed[['price', 'createdate']]
+                removed = rng.choice(len(products), 2 * int(len(products) * args.removed), replace=False)
+                deleted, uncategorized = removed[::2], removed[1::2]
+                remove_products(engine, products['productmasterid'].iloc[deleted].tolist(),
+                                products['productmasterid'].iloc[uncategorized].tolist())
+                products.loc[products.index[uncategorized], 'category'] = None
+                products = products.drop(products.index[deleted])
+                products = pd.concat([products, new], ignore_index=True)
+            elif name == 'swap':
+                # Same rows in a new table, without the triggers; one product moves to another category
+                with engine.begin() as connection:
+                    connection.execute(text("CREATE TABLE product_shadow AS TABLE product"))
+                    connection.execute(text("DROP TABLE product"))
+                    connection.execute(text("ALTER TABLE product_shadow RENAME TO product"))
+                    connection.execute(text("UPDATE product SET category = 'Category 0' WHERE productmasterid = :id"),
+                                       {'id': products['productmasterid'].iloc[0]})
+                products.loc[products.index[0], 'category'] = 'Category 0'
+            applied, update_seconds = regression_stats.update_stats(engine, 'product', incremental=step > 0,
+                                                                    verify=name == 'verify')
+            if name == 'verify':
+                assert applied == 0, f"the triggers missed {applied} rows"
+
+            solved, solve_seconds = timed(regression_stats.coefficients, engine)
+
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                _, refit_seconds = timed(model_script.train_models, model_script.prepare_data_by_category(products), 1)
+            worst = check_same(solved, sklearn_reference(model_script, products), args.rtol)
+            print(f"{name:>13}: {applied:>9} rows applied in {update_seconds:6.2f}s, {len(solved)} categories solved "
+                  f"in {solve_seconds:.3f}s | full sklearn refit of {len(products)} rows {refit_seconds:6.2f}s | "
+                  f"max relative difference {worst:.1e}")
+    finally:
+        engine.dispose()
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Loading training data: SELECT * into a DataFrame vs the column-projected, chunked, compact-dtype loader.
+
+Fills a throwaway schema (dropped afterwards) with a synthetic product table
+of the cleansing output's shape, long name/detail text included, and loads it
+with model.py's previous SELECT * loader and model.load_training_data, the
+latter also with a category filter. Each loader runs in a fresh process so its peak RSS
+is its own; both must yield the same training rows.
+
+    python benchmarks/bench_training_loader.py --rows 1000000 --categories 2000 --filter 0.1
+"""
+import argparse
+import multiprocessing
+import resource
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from common import load_script, timed
+from pg_loader import postgres_url
+
+SCHEMA = 'bench_training_loader'
+
+
+def schema_engine(url):
+    return create_engine(url, connect_args={'options': f"-csearch_path={SCHEMA}"})
+
+
+def fill_table(url, rows, categories):
+    with schema_engine(url).begin() as connection:
+        connection.execute(text("""
+            CREATE TABLE product (
+                id INT, name VARCHAR, price FLOAT, originalprice FLOAT, discountpercentage VARCHAR,
+                detail TEXT, platform VARCHAR, productmasterid VARCHAR UNIQUE, category VARCHAR, createdate TIMESTAMP)"""))
+        # 1% of rows without a category, like products the cleansing could not classify
+        connection.execute(text("""
+            INSERT INTO product
+            SELECT i, 'Product ' || i || ' ' || repeat('variant ', 6), round(op * (0.6 + (i % 40) / 100.0)), op,
+                   (i % 40) || '%', repeat(md5(i::text), 16), 'klikindomaret', 'P' || lpad(i::text, 9, '0'),
+                   CASE WHEN i % 100 = 0 THEN NULL ELSE 'Category ' || (i::bigint * 7919 % :categories) END,
+                   now() - (i % 1000) * interval '1 minute'
+            FROM (SELECT i, round(1000 + random() * 199000) AS op FROM generate_series(1, :rows) i) s
+            """), {'rows': rows, 'categories': categories})
+        connection.execute(text("ANALYZE product"))
+
+
+def load_cleaned_data(engine, table_name):
+    # model.py's previous loader
+    query = f"SELECT * FROM {table_name}"
+    return pd.read_sql(query, engine)
+
+
+def run_loader(url, name, categories):
+    """Child process: load once and report time, peak RSS growth and the result's footprint."""
+    model_script = load_script('model.py')
+    engine = schema_engine(url)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if name == 'SELECT *':
+        data, elapsed = timed(load_cleaned_data, engine, 'product')
+        data = data[data['category'].notna()]
+    else:
+        data, elapsed = timed(model_script.load_training_data, engine, 'product', categories)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    checksum = (len(data), round(float(data['price'].astype('float64').sum())),
+                round(float(data['originalprice'].astype('float64').sum())))
+    return elapsed, (peak - baseline) / 1024, data.memory_usage(deep=True).sum() / 2 ** 20, checksum
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=2_000)
+    parser.add_argument('--filter', type=float, default=0.1, help="share of categories for the filtered load")
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'))
+    args = parser.parse_args()
+
+    admin = create_engine(args.url)
+    with admin.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        _, elapsed = timed(fill_table, args.url, args.rows, args.categories)
+        print(f"Filled {args.rows} rows in {elapsed:.1f}s")
+        subset = [f"Category {c}" for c in range(int(args.categories * args.filter))]
+        runs = [('SELECT *', None), ('projected + chunked', None), (f"{args.filter:.0%} of categories", subset)]
+        results = {}
+        for name, categories in runs:
+            # A fresh spawned process per loader, so one loader's peak does not hide the next one's
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                elapsed, peak_mb, frame_mb, checksum = executor.submit(run_loader, args.url, name, categories).result()
+            results[name] = checksum
+            print(f"{name:>20}: {checksum[0]:>9} rows in {elapsed:6.2f}s, peak RSS +{peak_mb:7.1f} MiB, "
+                  f"DataFrame {frame_mb:7.1f} MiB")
+        assert results['SELECT *'] == results['projected + chunked'], "the loaders returned different training rows"
+    finally:
+        with admin.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
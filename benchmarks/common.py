@@ -0,0 +1,30 @@
+"""Helpers shared by the benchmark scripts."""
+import importlib.util
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+LISTING_PATH = "/page/unilever-officialstore?categoryID=&productbrandid=&sortcol=&pagesize=50&startprice=&endprice=&attributes=&ShowItem="
+
+
+def load_script(file_name):
+    """Import one of the repo's top-level scripts (their file names contain dashes)."""
+    module_name = os.path.splitext(file_name)[0].replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(func, *args, **kwargs):
+    """Run func and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
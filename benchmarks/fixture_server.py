@@ -0,0 +1,57 @@
+"""Local HTTP server that serves saved pages so the scrapers can run offline."""
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Map site URLs onto saved pages.
+
+    `/page/<name>?...&page=N` is served from `page/<name>-N.html` and any other
+    path from `<path>.html`, so saved pages can be addressed with the same URLs
+    the scrapers build for the live site.
+    """
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+
+    def translate_path(self, path):
+        parts = urlsplit(path)
+        page = parse_qs(parts.query).get('page')
+        local = super().translate_path(parts.path)
+        if page and os.path.exists(f"{local}-{page[0]}.html"):
+            return f"{local}-{page[0]}.html"
+        if not os.path.exists(local) and os.path.exists(f"{local}.html"):
+            return f"{local}.html"
+        return local
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(site='klikindomaret', delay=0.0, port=0):
+    """Start a background server for one fixture site and return (server, base_url)."""
+    handler = type('SiteFixtureHandler', (FixtureHandler,), {'delay': delay})
+    directory = os.path.join(FIXTURES_DIR, site)
+    server = ThreadingHTTPServer(('127.0.0.1', port),
+                                 lambda *args, **kwargs: handler(*args, directory=directory, **kwargs))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    server, base_url = start_fixture_server()
+    print(f"Serving fixtures at {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
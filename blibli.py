@@ -1,82 +1,68 @@
-import time
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
+import logging
 import pandas as pd
 from datetime import datetime
-from webdriver_manager.chrome import ChromeDriverManager
+from pg_loader import CopyLoader, get_engine, postgres_url
+from price_normalizer import normalize_columns
+from product_parser import BLIBLI_SITE_URL
+from scraper_engine import ScrapeEngine, ScrapeStats
+from scraper_platforms import BlibliPlatform
 
-# URL provided by the user
-url = "https://www.blibli.com/cari/unilever%20indonesia%20official?seller=Official%20Store&category=53400"
+# Configuration variables
+SITE_URL = BLIBLI_SITE_URL
+BASE_URL = f"{SITE_URL}/cari/unilever%20indonesia%20official?seller=Official%20Store&category=53400"
+MAX_PAGES = 5  # Search result pages to scrape; stops earlier when a page brings no new products
+WAIT_TIME = 10  # Max seconds to wait for the product cards (and any Cloudflare check) to load
+SAVE_CSV = True  # Also write the cards to blibli_products_<timestamp>.csv
+LOAD_BATCH_SIZE = 500  # Rows per COPY into the staging table
+NUMERIC_COLUMNS = ['Price_After', 'Price_Before', 'Discount', 'Rating', 'Sold_Count']  # "Rp28.400", "4%", "4,8", "2,8 rb"
+CSV_COLUMNS = {'name': 'Name', 'price_after': 'Price_After', 'price_before': 'Price_Before', 'discount': 'Discount',
+               'rating': 'Rating', 'sold_count': 'Sold_Count', 'store_location': 'Store_Location'}
 
-# Initialize undetected ChromeDriver with webdriver-manager
-options = uc.ChromeOptions()
-# options.add_argument('--headless=new')  # Correct way to set headless mode
-options.add_argument("--disable-gpu")
-options.add_argument("--no-sandbox")
-# options.add_argument("--window-size=1920x1080")
+# PostgreSQL configuration
+POSTGRES_HOST = 'localhost'
+POSTGRES_PORT = '5400'
+POSTGRES_DB = 'e2e_ml'
+POSTGRES_USER = 'admin'
+POSTGRES_PASSWORD = 'admin'
+TABLE_NAME = 'blibli_stg'
+STG_COLUMNS = ['name', 'link', 'sku', 'price_after', 'price_before', 'discount', 'rating', 'sold_count',
+               'store_location', 'createdate']
 
-# Use webdriver-manager to get the correct ChromeDriver
-driver = uc.Chrome(driver_executable_path=ChromeDriverManager().install(), options=options)
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger()
 
-# Function to fetch the HTML content of the page
-def fetch_html(url):
-    driver.get(url)
-    time.sleep(10)  # Wait for the page to fully load and bypass any Cloudflare verification
-    return driver.page_source
-
-# Function to parse the HTML and extract product details
-def parse_html(html):
-    driver.get(url)
-    time.sleep(10)
-    
-    products = driver.find_elements(By.CLASS_NAME, 'product__card')
-    product_list = []
-    
-    for product in products:
-        try:
-            name = product.find_element(By.CLASS_NAME, 'blu-product__name').text.strip()
-            price_after = product.find_element(By.CLASS_NAME, 'blu-product__price-after').text.strip()
-            price_before = product.find_element(By.CLASS_NAME, 'blu-product__price-before').text.strip() if product.find_elements(By.CLASS_NAME, 'blu-product__price-before') else None
-            discount = product.find_element(By.CLASS_NAME, 'blu-product__price-discount').text.strip() if product.find_elements(By.CLASS_NAME, 'blu-product__price-discount') else None
-            rating = product.find_element(By.CLASS_NAME, 'blu-product__rating-wrapper').find_element(By.TAG_NAME, 'span').text.strip()
-            sold_count = product.find_element(By.CLASS_NAME, 'blu-product__sold').text.strip().replace('Terjual', '').strip()
-            store_location = product.find_element(By.CLASS_NAME, 'blu-product__location-text').find_elements(By.TAG_NAME, 'span')[1].text.strip()
-            
-            product_list.append({
-                'Name': name,
-                'Price_After': price_after,
-                'Price_Before': price_before,
-                'Discount': discount,
-                'Rating': rating,
-                'Sold_Count': sold_count,
-                'Store_Location': store_location
-            })
-        except Exception as e:
-            print(f"Error parsing product: {e}")
-            continue
-    
-    return product_list
+def scrape_products(platform, loader, max_pages=MAX_PAGES, wait_time=WAIT_TIME, stats=None):
+    # Every card of a page comes out of a single parse of its page source; the
+    # engine stops at the first page that brings no new products
+    scraper = ScrapeEngine(platform, loader, max_pages=max_pages, wait_time=wait_time, batch_size=LOAD_BATCH_SIZE,
+                           stats=stats)
+    return scraper.run()
 
 # Function to save product details to a CSV file
 def save_to_csv(product_list):
-    df = pd.DataFrame(product_list)
+    df = pd.DataFrame(product_list, columns=list(CSV_COLUMNS)).rename(columns=CSV_COLUMNS)
+    df = normalize_columns(df, NUMERIC_COLUMNS)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f'blibli_products_{timestamp}.csv'
     df.to_csv(filename, index=False)
-    print(f"Data saved to {filename}")
+    logger.info(f"Data saved to {filename}")
 
 # Main function to execute the script
 def main():
-    html = fetch_html(url)
-    if html:
-        product_list = parse_html(html)
-        if product_list:
+    platform = BlibliPlatform(BASE_URL, TABLE_NAME, STG_COLUMNS, site_url=SITE_URL)
+    engine = get_engine(postgres_url(POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB))
+    platform.create_table(engine)
+    stats = ScrapeStats()
+    loader = CopyLoader(engine, TABLE_NAME, STG_COLUMNS, LOAD_BATCH_SIZE, on_flush=stats.record_stored)
+    try:
+        product_list = scrape_products(platform, loader, stats=stats)
+        if product_list and SAVE_CSV:
             save_to_csv(product_list)
-        else:
-            print("No products found")
-    else:
-        print("Failed to retrieve the webpage")
-    driver.quit()
+        elif not product_list:
+            logger.info("No products found")
+    finally:
+        loader.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,26 @@
+INSERT INTO {cleaned_table_name} (id, name, price, originalprice, discountpercentage, detail, platform, productmasterid, category, createdate)
+SELECT DISTINCT ON (productmasterid)
+    CAST(id AS INT) AS id,
+    name,
+    CAST(REPLACE(REPLACE(price, 'Rp ', ''), '.', '') AS float) AS price,
+    CAST(REPLACE(REPLACE(originalprice, 'Rp ', ''), '.', '') AS float) AS originalprice,
+    CAST(REPLACE(discountpercentage, '%', '') AS int) AS discountpercentage,
+    detail,
+    CAST(platform AS VARCHAR(100)) AS platform,
+    CAST(productmasterid AS VARCHAR(100)) as productmasterid,
+    category,
+    createdate
+FROM {table_name}
+WHERE createdate > :since
+ORDER BY productmasterid, createdate
+ON CONFLICT (productmasterid) DO UPDATE SET
+    id = excluded.id,
+    name = excluded.name,
+    price = excluded.price,
+    originalprice = excluded.originalprice,
+    discountpercentage = excluded.discountpercentage,
+    detail = excluded.detail,
+    platform = excluded.platform,
+    category = excluded.category,
+    createdate = excluded.createdate
+WHERE excluded.createdate < {cleaned_table_name}.createdate;
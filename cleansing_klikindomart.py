@@ -1,3 +1,6 @@
+import time
+from datetime import datetime, timedelta
+
 import pandas as pd
 from sqlalchemy import create_engine, text
 
@@ -12,6 +15,12 @@ DB_CONFIG = {
 
 TABLE_NAME = 'klikindomaret_ref'
 CLEANED_TABLE_NAME = 'product'
+CSV_FILE = 'cleaned_data.csv'
+SERVER_SIDE = True  # Build the cleaned table inside PostgreSQL instead of round-tripping it through pandas
+INCREMENTAL = True  # With SERVER_SIDE, merge only ref rows newer than the last run into the cleaned table
+WATERMARK_TABLE_NAME = 'etl_watermark'
+JOB_NAME = f'{TABLE_NAME}_to_{CLEANED_TABLE_NAME}'
+WATERMARK_LOOKBACK = timedelta(minutes=15)  # Re-scan this far behind the watermark for rows committed late
 
 def get_db_connection(config):
     """Create and return a database connection."""
@@ -27,11 +36,19 @@ def load_data(engine, table_name):
         print(f"Error loading data: {e}")
         return None
 
-def read_sql_file(file_path, table_name):
-    """Read the SQL query from a file and format it with the table name."""
+def load_sample(engine, table_name, rows=5):
+    """Load the first rows of the specified table for a quick look."""
+    try:
+        return pd.read_sql(f"SELECT * FROM {table_name} LIMIT {int(rows)}", engine)
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return None
+
+def read_sql_file(file_path, table_name, cleaned_table_name=CLEANED_TABLE_NAME):
+    """Read the SQL query from a file and format it with the table names."""
     try:
         with open(file_path, 'r') as file:
-            return file.read().format(table_name=table_name)
+            return file.read().format(table_name=table_name, cleaned_table_name=cleaned_table_name)
     except Exception as e:
         print(f"Error reading SQL file: {e}")
         return None
@@ -55,6 +72,97 @@ def save_cleaned_data(engine, cleaned_data, cleaned_table_name):
     except Exception as e:
         print(f"An error occurred while saving the cleaned data: {e}")
 
+def build_cleaned_table(engine, cleaning_sql, cleaned_table_name):
+    """Run the cleaning query into a shadow table, then swap it in for the cleaned table."""
+    shadow_table_name = f"{cleaned_table_name}_shadow"
+    old_table_name = f"{cleaned_table_name}_old"
+    try:
+        # The slow part runs in its own transaction while readers keep using the current table
+        with engine.begin() as connection:
+            print("Building cleaned data in PostgreSQL...")
+            connection.execute(text(f"DROP TABLE IF EXISTS {shadow_table_name}"))
+            connection.execute(text(f"CREATE TABLE {shadow_table_name} AS {cleaning_sql.strip().rstrip(';')}"))
+            row_count = connection.execute(text(f"SELECT COUNT(*) FROM {shadow_table_name}")).scalar()
+        # The swap only holds the table locks for two renames
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {old_table_name}"))
+            connection.execute(text(f"ALTER TABLE IF EXISTS {cleaned_table_name} RENAME TO {old_table_name}"))
+            connection.execute(text(f"ALTER TABLE {shadow_table_name} RENAME TO {cleaned_table_name}"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {old_table_name}"))
+        print(f"Cleaned data saved to table '{cleaned_table_name}' ({row_count} rows).")
+        return row_count
+    except Exception as e:
+        print(f"An error occurred while building the cleaned table: {e}")
+        return None
+
+def ensure_incremental_schema(engine, table_name, cleaned_table_name):
+    """Create the indexes and watermark table the incremental merge relies on."""
+    with engine.begin() as connection:
+        # Delta selection by createdate, first-seen lookups per product
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {table_name}_createdate ON {table_name} (createdate)"))
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {table_name}_productmasterid_createdate "
+                                f"ON {table_name} (productmasterid, createdate)"))
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE_NAME} (
+                job_name VARCHAR PRIMARY KEY,
+                watermark TIMESTAMP NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )"""))
+        if connection.execute(text("SELECT to_regclass(:name)"), {'name': cleaned_table_name}).scalar():
+            # The merge's conflict target; one row per product, NULL ids included
+            connection.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {cleaned_table_name}_productmasterid "
+                                    f"ON {cleaned_table_name} (productmasterid) NULLS NOT DISTINCT"))
+
+def merge_new_products(engine, table_name, cleaned_table_name, job_name=JOB_NAME):
+    """Merge first-seen products from ref rows newer than the watermark; rebuild when there is no watermark yet."""
+    advance_watermark = f"""
+    INSERT INTO {WATERMARK_TABLE_NAME} (job_name, watermark, updated_at)
+    SELECT :job, MAX(createdate), now() FROM {table_name} HAVING MAX(createdate) IS NOT NULL
+    ON CONFLICT (job_name) DO UPDATE SET
+        watermark = GREATEST({WATERMARK_TABLE_NAME}.watermark, excluded.watermark),
+        updated_at = excluded.updated_at
+    """
+    start = time.perf_counter()
+    ensure_incremental_schema(engine, table_name, cleaned_table_name)
+    try:
+        with engine.begin() as connection:
+            watermark = connection.execute(
+                text(f"SELECT watermark FROM {WATERMARK_TABLE_NAME} WHERE job_name = :job FOR UPDATE"),
+                {'job': job_name}).scalar()
+            exists = connection.execute(text("SELECT to_regclass(:name)"), {'name': cleaned_table_name}).scalar()
+            if watermark is not None and exists:
+                merge_sql = read_sql_file('cleaning_query_incremental.sql', table_name, cleaned_table_name)
+                since = watermark - WATERMARK_LOOKBACK
+                merged = connection.execute(text(merge_sql), {'since': since}).rowcount
+                connection.execute(text(advance_watermark), {'job': job_name})
+        if watermark is None or not exists:
+            print("No previous run found, building the cleaned table from the whole ref table...")
+            merged = build_cleaned_table(engine, read_sql_file('cleaning_query.sql', table_name), cleaned_table_name)
+            if merged is None:
+                return None
+            ensure_incremental_schema(engine, table_name, cleaned_table_name)
+            with engine.begin() as connection:
+                connection.execute(text(advance_watermark), {'job': job_name})
+            since = datetime.min
+        print(f"Merged {merged} products from rows newer than {since} into '{cleaned_table_name}' "
+              f"in {time.perf_counter() - start:.2f}s.")
+        return merged
+    except Exception as e:
+        print(f"An error occurred while merging new products: {e}")
+        return None
+
+def export_table_to_csv(engine, table_name, file_name):
+    """Stream a table into a CSV file with COPY TO, without loading it into memory."""
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor, open(file_name, 'w', newline='', encoding='utf-8') as file:
+            cursor.copy_expert(f"COPY {table_name} TO STDOUT WITH (FORMAT csv, HEADER)", file)
+        print(f"Cleaned data saved to '{file_name}'.")
+    except Exception as e:
+        print(f"An error occurred while exporting the data to CSV: {e}")
+    finally:
+        connection.close()
+
 def save_data_to_csv(data, file_name):
     """Save the DataFrame to a CSV file."""
     try:
@@ -63,9 +171,36 @@ def save_data_to_csv(data, file_name):
     except Exception as e:
         print(f"An error occurred while saving the data to CSV: {e}")
 
+def main_server_side(engine):
+    """Clean the data inside PostgreSQL and export it, keeping client memory flat."""
+    sample = load_sample(engine, TABLE_NAME)
+    if sample is None:
+        print("Failed to load data.")
+        return
+    print("Data loaded successfully. Sample data:")
+    print(sample)
+
+    cleaning_sql = read_sql_file('cleaning_query.sql', TABLE_NAME)
+    if cleaning_sql is None:
+        print("Failed to read cleaning SQL query.")
+        return
+
+    if INCREMENTAL:
+        result = merge_new_products(engine, TABLE_NAME, CLEANED_TABLE_NAME)
+    else:
+        result = build_cleaned_table(engine, cleaning_sql, CLEANED_TABLE_NAME)
+    if result is not None:
+        export_table_to_csv(engine, CLEANED_TABLE_NAME, CSV_FILE)
+        print("Data cleaning complete.")
+    else:
+        print("Data cleaning failed.")
+
 def main():
     """Main function to load, clean, and save data."""
     engine = get_db_connection(DB_CONFIG)
+    if SERVER_SIDE:
+        main_server_side(engine)
+        return
     
     raw_data = load_data(engine, TABLE_NAME)
     if raw_data is not None:
@@ -83,7 +218,7 @@ def main():
     cleaned_data = clean_data(engine, cleaning_sql)
     if cleaned_data is not None:
         save_cleaned_data(engine, cleaned_data, CLEANED_TABLE_NAME)
-        save_data_to_csv(cleaned_data, 'cleaned_data.csv')
+        save_data_to_csv(cleaned_data, CSV_FILE)
         print("Data cleaning complete.")
     else:
         print("Data cleaning failed.")
@@ -0,0 +1,18 @@
+"""Database settings shared by model.py, api_2.py and sandbox/api.py.
+
+model.py writes the price recommendations and the APIs serve them, so all of
+them read the database and table from here.
+"""
+from pg_loader import postgres_url
+
+DB_CONFIG = {
+    'user': 'admin',
+    'password': 'admin',
+    'host': 'localhost',
+    'port': '5400',
+    'database': 'e2e_ml'
+}
+RECOMMENDATION_TABLE_NAME = 'pricerecommendation'
+
+DATABASE_URL = postgres_url(DB_CONFIG['user'], DB_CONFIG['password'], DB_CONFIG['host'], DB_CONFIG['port'],
+                            DB_CONFIG['database'])
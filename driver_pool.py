@@ -0,0 +1,360 @@
+"""Pool of browser sessions shared by the scraping threads.
+
+Threads lease a driver for one page at a time, so the listing loop and the
+detail workers can share a fixed number of browsers. The pool keeps them
+cheap to start and bounded in size:
+
+* the chromedriver binary resolved by webdriver-manager is remembered in
+  DRIVER_PATH_FILE, so later runs start browsers without a network lookup;
+* prewarm() starts the browsers in parallel before scraping begins;
+* a browser is recycled (quit and replaced) after `max_pages` pages, once
+  its processes use more than `max_rss_mb` of memory, or when it no longer
+  answers a trivial script on release (crashed browser or chromedriver);
+* lighten_options()/block_resources() stop images, fonts and stylesheets from
+  loading, since the scrapers only read the DOM;
+* PoolStats counts leases, waits, utilization, startups and recycles.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+
+try:
+    import psutil
+except ImportError:  # Memory-based recycling is skipped without it
+    psutil = None
+
+DRIVER_PATH_FILE = os.path.join('data', 'chromedriver-path')  # chromedriver resolved on an earlier run
+RECYCLE_AFTER_PAGES = 200  # Pages a browser serves before it is replaced (0 = never)
+MAX_BROWSER_RSS_MB = 1024  # Replace a browser whose processes grow past this (0 = never)
+ACQUIRE_POLL = 1.0  # Seconds between checks for a free slot while every browser is busy
+BLOCKED_URL_PATTERNS = ['*.css', '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot', '*.png', '*.jpg', '*.jpeg',
+                        '*.gif', '*.webp', '*.svg', '*.ico']
+CONTENT_SETTINGS_BLOCKED = 2  # Chrome's "block" value for profile content settings
+
+logger = logging.getLogger(__name__)
+_driver_paths = {}
+_driver_path_lock = threading.Lock()
+
+
+def cached_driver_path(path_file=DRIVER_PATH_FILE, refresh=False):
+    """Return the chromedriver path from an earlier run, asking webdriver-manager only when it is missing or stale."""
+    with _driver_path_lock:
+        path = None if refresh else _driver_paths.get(path_file)
+        if path is None and not refresh and os.path.exists(path_file):
+            with open(path_file) as file:
+                path = file.read().strip()
+        if not path or not os.path.exists(path):
+            from webdriver_manager.chrome import ChromeDriverManager
+            path = ChromeDriverManager().install()
+            os.makedirs(os.path.dirname(path_file) or '.', exist_ok=True)
+            with open(path_file, 'w') as file:
+                file.write(path)
+            logger.info(f"Resolved chromedriver at {path}")
+        _driver_paths[path_file] = path
+        return path
+
+
+def start_driver(launch, block=True):
+    """Start a browser with `launch(driver_path)` using the cached chromedriver.
+
+    When Chrome was updated past the cached driver the session cannot start;
+    the driver is then resolved again once. `launch` must build new Chrome
+    options on every call: undetected-chromedriver refuses to reuse them.
+    """
+    try:
+        driver = launch(cached_driver_path())
+    except SessionNotCreatedException as e:
+        logger.warning(f"Cached chromedriver does not match the installed Chrome, resolving it again: {e}")
+        driver = launch(cached_driver_path(refresh=True))
+    if block:
+        block_resources(driver)
+    return driver
+
+
+def lighten_options(options):
+    """Turn off images, fonts and stylesheets in Chrome options (selenium or undetected-chromedriver)."""
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': CONTENT_SETTINGS_BLOCKED,
+        'profile.managed_default_content_settings.stylesheets': CONTENT_SETTINGS_BLOCKED,
+        'profile.managed_default_content_settings.fonts': CONTENT_SETTINGS_BLOCKED,
+    })
+    return options
+
+
+def block_resources(driver):
+    # Content settings do not cover every font or stylesheet, so the requests
+    # themselves are blocked through the DevTools protocol as well
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        logger.warning(f"Could not block page resources: {e}")
+
+
+def browser_rss_mb(driver):
+    """Resident memory of the driver's chromedriver and browser processes in MB, None when unknown."""
+    if psutil is None:
+        return None
+    pids = {getattr(getattr(getattr(driver, 'service', None), 'process', None), 'pid', None),
+            getattr(driver, 'browser_pid', None)}
+    processes = {}
+    for pid in pids - {None}:
+        try:
+            process = psutil.Process(pid)
+            for p in [process, *process.children(recursive=True)]:
+                processes[p.pid] = p
+        except psutil.Error:
+            continue
+    if not processes:
+        return None
+    rss = 0
+    for process in processes.values():
+        try:
+            rss += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return rss / 2 ** 20
+
+
+class PoolStats:
+    """Thread-safe counters for one pool: leases, waits, busy time, startups and recycles."""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.stopped_at = None
+        self.leases = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.wait_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.started = 0
+        self.startup_seconds = 0.0
+        self.recycled = {'pages': 0, 'rss': 0, 'dead': 0}
+
+    def leased(self, waited):
+        with self._lock:
+            self.leases += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.wait_seconds += waited
+
+    def returned(self, busy):
+        with self._lock:
+            self.in_use -= 1
+            self.busy_seconds += busy
+
+    def driver_started(self, seconds):
+        with self._lock:
+            self.started += 1
+            self.startup_seconds += seconds
+
+    def driver_recycled(self, reason):
+        with self._lock:
+            self.recycled[reason] += 1
+
+    def stop(self):
+        self.stopped_at = time.perf_counter()
+
+    def summary(self):
+        with self._lock:
+            elapsed = (self.stopped_at or time.perf_counter()) - self.started_at
+            # A lazily grown pool may never start all `size` browsers
+            browsers = min(self.started, self.size)
+            return {
+                'size': self.size,
+                'leases': self.leases,
+                'peak_in_use': self.peak_in_use,
+                'utilization': self.busy_seconds / (browsers * elapsed) if browsers and elapsed else 0.0,
+                'wait_seconds': self.wait_seconds,
+                'started': self.started,
+                'startup_seconds': self.startup_seconds,
+                'recycled_pages': self.recycled['pages'],
+                'recycled_rss': self.recycled['rss'],
+                'recycled_dead': self.recycled['dead'],
+            }
+
+    def log_summary(self, label='driver pool'):
+        s = self.summary()
+        if not s['leases']:
+            return
+        logger.info(f"{label}: {s['leases']} leases on {s['size']} browsers, {s['utilization']:.0%} utilization "
+                    f"(peak {s['peak_in_use']} in use, {s['wait_seconds']:.2f}s waiting), {s['started']} started in "
+                    f"{s['startup_seconds']:.2f}s, {s['recycled_pages']} recycled at the page limit, "
+                    f"{s['recycled_rss']} at the memory limit and {s['recycled_dead']} found dead")
+
+
+class DriverPool:
+    """Up to `size` drivers created with `factory()`, started on first use or by prewarm().
+
+    A driver is recycled after `max_pages` leases or once its processes use more
+    than `max_rss_mb`; 0 turns either limit off. A driver that fails a health
+    check on release is replaced as well, so the next lease gets a live one.
+    """
+
+    def __init__(self, factory, size=1, max_pages=RECYCLE_AFTER_PAGES, max_rss_mb=MAX_BROWSER_RSS_MB):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb if psutil is not None else 0
+        if max_rss_mb and psutil is None:
+            logger.warning("psutil is not installed, browsers will not be recycled on memory use")
+        self.stats = PoolStats(self.size)
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._starting = 0
+        self._pages = {}  # id(driver) -> pages served
+        self._leased_at = {}  # id(driver) -> lease start
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        with self._lock:
+            if len(self._drivers) + self._starting < self.size:
+                self._starting += 1
+                return True
+            return False
+
+    def _start(self):
+        # Called with a slot reserved by _reserve()
+        start = time.perf_counter()
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._lock:
+                self._starting -= 1
+            raise
+        with self._lock:
+            self._starting -= 1
+            self._drivers.append(driver)
+            self._pages[id(driver)] = 0
+        self.stats.driver_started(time.perf_counter() - start)
+        return driver
+
+    def prewarm(self, count=None):
+        """Start up to `count` (default: all) browsers in parallel so the first pages do not wait for them."""
+        slots = 0
+        while slots < (count or self.size) and self._reserve():
+            slots += 1
+        if not slots:
+            return
+        with ThreadPoolExecutor(max_workers=slots) as executor:
+            futures = [executor.submit(self._start) for _ in range(slots)]
+        for future in futures:
+            try:
+                self._idle.put(future.result())
+            except Exception as e:
+                logger.error(f"Error starting browser: {e}")
+
+    def acquire(self):
+        """Return an idle driver, starting a new one while below `size`; blocks when all are busy."""
+        start = time.perf_counter()
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            if self._reserve():
+                driver = self._start()
+                break
+            try:
+                driver = self._idle.get(timeout=ACQUIRE_POLL)
+                break
+            except queue.Empty:
+                # A recycled browser may have freed a slot
+                continue
+        now = time.perf_counter()
+        with self._lock:
+            self._leased_at[id(driver)] = now
+        self.stats.leased(now - start)
+        return driver
+
+    def release(self, driver):
+        with self._lock:
+            self._pages[id(driver)] = pages = self._pages.get(id(driver), 0) + 1
+            leased_at = self._leased_at.pop(id(driver), None)
+        if leased_at is not None:
+            self.stats.returned(time.perf_counter() - leased_at)
+        reason = self._recycle_reason(driver, pages)
+        if reason is None:
+            self._idle.put(driver)
+            return
+        self._recycle(driver, reason, pages)
+
+    @staticmethod
+    def _alive(driver):
+        # A crashed browser or chromedriver fails this at once instead of on the next page
+        if getattr(driver, 'session_id', None) is None:
+            return False
+        try:
+            driver.execute_script("return 1")
+            return True
+        except (WebDriverException, OSError):
+            # OSError: the connection to a chromedriver that has exited is refused
+            return False
+
+    def _recycle_reason(self, driver, pages):
+        if not self._alive(driver):
+            return 'dead'
+        if self.max_pages and pages >= self.max_pages:
+            return 'pages'
+        if self.max_rss_mb:
+            rss = browser_rss_mb(driver)
+            if rss is not None and rss > self.max_rss_mb:
+                return 'rss'
+        return None
+
+    def _recycle(self, driver, reason, pages):
+        if reason == 'dead':
+            logger.warning(f"Browser stopped responding after {pages} pages, replacing it")
+        else:
+            logger.info(f"Recycling browser after {pages} pages ({reason})")
+        self.stats.driver_recycled(reason)
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+            self._pages.pop(id(driver), None)
+        self._quit(driver)
+        # Start the replacement now so the pool stays warm; if it fails the
+        # free slot is filled on the next acquire()
+        if self._reserve():
+            try:
+                self._idle.put(self._start())
+            except Exception as e:
+                logger.error(f"Error starting replacement browser: {e}")
+
+    @contextmanager
+    def lease(self):
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.error(f"Error closing driver: {e}")
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            self._quit(driver)
+        self.stats.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,115 @@
+"""Append-only file sinks for scraped batches.
+
+Each batch is written once: CSV rows are appended to an open file and Parquet
+batches become files of a dataset directory, so the cost of a batch does not
+depend on how much has already been written.
+"""
+import csv
+import logging
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PART_NAME = re.compile(r'part-(\d+)\.parquet$')
+
+logger = logging.getLogger(__name__)
+
+
+def _as_text(value):
+    return None if value is None else str(value)
+
+
+class CsvSink:
+    """Stream rows to a CSV file without ever re-reading it."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.rows_written = 0
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+        if new_file:
+            self._writer.writeheader()
+
+    def write_batch(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            logger.info(f"Wrote {self.rows_written} rows to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetSink:
+    """Write batches as files of a Parquet dataset directory (all columns as strings).
+
+    Each file is complete when it is renamed into place, so a crash loses at
+    most the rows still buffered; `pd.read_parquet(path)` reads the whole
+    directory. Small scraper batches are buffered up to `rows_per_file` rows
+    so the dataset does not end up with thousands of tiny files. Reopening an
+    existing dataset appends to it, like CsvSink: numbering continues after
+    its highest part.
+    """
+
+    def __init__(self, path, columns, rows_per_file=500):
+        self.path = path
+        self.columns = columns
+        self.rows_per_file = rows_per_file
+        self.rows_written = 0
+        self.files_written = 0
+        self.schema = pa.schema([(column, pa.string()) for column in columns])
+        self._buffer = []
+        self._closed = False
+        os.makedirs(path, exist_ok=True)
+        parts = [int(match.group(1)) for match in map(PART_NAME.match, os.listdir(path)) if match]
+        self._next_part = max(parts) + 1 if parts else 0
+
+    def write_batch(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.rows_per_file:
+            self._write_file()
+
+    def _write_file(self):
+        table = pa.Table.from_pydict(
+            {column: [_as_text(row.get(column)) for row in self._buffer] for column in self.columns},
+            schema=self.schema)
+        path = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        # Written under a name readers skip, then renamed, so no reader sees a file without its footer
+        tmp_path = os.path.join(self.path, f".part-{self._next_part:05d}.parquet.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        self._next_part += 1
+        self.files_written += 1
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        if not self._closed:
+            if self._buffer:
+                self._write_file()
+            self._closed = True
+            logger.info(f"Wrote {self.rows_written} rows to {self.path} ({self.files_written} files)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_sink(path, columns):
+    """Pick the sink from the file extension (.parquet: a dataset directory, or .csv)."""
+    if path.endswith('.parquet'):
+        return ParquetSink(path, columns)
+    return CsvSink(path, columns)
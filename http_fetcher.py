@@ -0,0 +1,120 @@
+"""Plain-HTTP page fetcher for static pages.
+
+Keeps one pooled, keep-alive aiohttp session on a background event loop so the
+(synchronous) scrapers can fetch many pages concurrently, with a cap on
+concurrent connections and a per-host request rate limit.
+"""
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+DEFAULT_CONCURRENCY = 8  # Max simultaneous connections
+DEFAULT_RATE_PER_HOST = 5  # Max requests per second to one host (0 = unlimited)
+DEFAULT_TIMEOUT = 15  # Seconds per request
+DEFAULT_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/126.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml',
+    'Accept-Language': 'id-ID,id;q=0.9,en;q=0.8',
+}
+
+logger = logging.getLogger(__name__)
+
+
+class HostRateLimiter:
+    """Space requests to the same host at least 1/rate seconds apart."""
+
+    def __init__(self, rate_per_host):
+        self.interval = 1.0 / rate_per_host if rate_per_host else 0.0
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+class HttpFetcher:
+    """Concurrent HTTP fetcher usable from synchronous code.
+
+        with HttpFetcher() as fetcher:
+            pages = fetcher.fetch_many(urls)  # {url: html or None}
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, rate_per_host=DEFAULT_RATE_PER_HOST,
+                 timeout=DEFAULT_TIMEOUT, headers=None):
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self.pages_fetched = 0
+        self.failures = 0
+        self.elapsed = 0.0
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._limiter = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+        return self
+
+    def close(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def _open(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                              timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self._limiter = HostRateLimiter(self.rate_per_host)
+
+    async def _fetch(self, url):
+        await self._limiter.wait(urlsplit(url).netloc)
+        try:
+            async with self._session.get(url) as response:
+                if response.status != 200:
+                    logger.warning(f"HTTP {response.status} for {url}")
+                    return None
+                return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Error fetching {url}: {e!r}")
+            return None
+
+    async def _fetch_many(self, urls):
+        pages = await asyncio.gather(*(self._fetch(url) for url in urls))
+        return dict(zip(urls, pages))
+
+    def fetch_many(self, urls):
+        """Fetch all urls concurrently and return {url: html}; failed fetches map to None."""
+        if self._loop is None:
+            raise RuntimeError("HttpFetcher is not started")
+        start = time.perf_counter()
+        pages = asyncio.run_coroutine_threadsafe(self._fetch_many(list(urls)), self._loop).result()
+        self.elapsed += time.perf_counter() - start
+        self.pages_fetched += sum(html is not None for html in pages.values())
+        self.failures += sum(html is None for html in pages.values())
+        return pages
@@ -1,8 +1,8 @@
-import os
+import argparse
 import logging
-from datetime import datetime
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, DateTime, text
-import pandas as pd
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, exc, inspect, MetaData, Table, Column, String, Integer, DateTime, text
 
 # PostgreSQL configuration
 POSTGRES_HOST = 'localhost'
@@ -11,7 +11,29 @@ POSTGRES_DB = 'e2e_ml'
 POSTGRES_USER = 'admin'
 POSTGRES_PASSWORD = 'admin'
 STG_TABLE_NAME = 'klikindomaret_stg'
+BLIBLI_STG_TABLE_NAME = 'blibli_stg'
 REF_TABLE_NAME = 'klikindomaret_ref'
+WATERMARK_TABLE_NAME = 'etl_watermark'
+INCREMENTAL = True  # Move only staging rows newer than the stored watermark (False = every staging row)
+WATERMARK_LOOKBACK = timedelta(minutes=15)  # Re-scan this far behind the watermark for rows committed late
+
+# Ref columns selected from each platform's staging table; prices end up as "Rp 28.400" on every platform
+STG_SELECTS = {
+    STG_TABLE_NAME: """
+        SELECT name, discounted_price as price, 
+               CASE WHEN original_price = '' THEN discounted_price ELSE original_price END AS originalprice,
+               CASE WHEN discount = '' THEN '0%' ELSE discount END AS discountpercentage,
+               description as detail, 'klikindomaret' as platform, plu as productmasterid, category, createdate
+        FROM {stg_table_name}
+        WHERE createdate > :since""",
+    BLIBLI_STG_TABLE_NAME: """
+        SELECT name, 'Rp ' || btrim(REPLACE(price_after, 'Rp', '')) as price,
+               'Rp ' || btrim(REPLACE(COALESCE(NULLIF(price_before, ''), price_after), 'Rp', '')) AS originalprice,
+               COALESCE(NULLIF(ltrim(discount, '-'), ''), '0%') AS discountpercentage,
+               NULL as detail, 'blibli' as platform, sku as productmasterid, NULL as category, createdate
+        FROM {stg_table_name}
+        WHERE createdate > :since AND price_after <> '' AND sku <> ''""",
+}
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -33,29 +55,129 @@ def create_ref_table(engine):
     metadata.create_all(engine)
     logger.info(f"Table {REF_TABLE_NAME} created in PostgreSQL")
 
-def run_query_and_store(engine):
+def create_watermark_table(engine):
+    metadata = MetaData()
+    table = Table(WATERMARK_TABLE_NAME, metadata,
+                  Column('job_name', String, primary_key=True),
+                  Column('watermark', DateTime, nullable=False),
+                  Column('updated_at', DateTime, nullable=False))
+    metadata.create_all(engine)
+
+def ensure_upsert_key(engine):
+    # A staging row is identified by product, scrape time and platform; the
+    # unique index lets the upsert skip rows that are already in the ref table
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(f"""CREATE UNIQUE INDEX IF NOT EXISTS {REF_TABLE_NAME}_upsert_key
+                                        ON {REF_TABLE_NAME} (productmasterid, createdate, platform)"""))
+    except exc.IntegrityError:
+        logger.error(f"{REF_TABLE_NAME} holds duplicate rows; run once with --dedupe to remove them")
+        raise
+
+def dedupe_ref_table(engine):
+    # One-off migration for ref tables filled by earlier full re-copies: keeps
+    # the first row of each (productmasterid, createdate, platform), creates
+    # the upsert key and moves the id sequence past ids copied in explicitly
+    with engine.begin() as connection:
+        removed = connection.execute(text(f"""
+            DELETE FROM {REF_TABLE_NAME} r USING {REF_TABLE_NAME} d
+            WHERE r.productmasterid = d.productmasterid AND r.createdate = d.createdate
+              AND r.platform = d.platform AND r.id > d.id""")).rowcount
+        connection.execute(text(f"""CREATE UNIQUE INDEX IF NOT EXISTS {REF_TABLE_NAME}_upsert_key
+                                    ON {REF_TABLE_NAME} (productmasterid, createdate, platform)"""))
+        connection.execute(text(f"""SELECT setval(pg_get_serial_sequence('{REF_TABLE_NAME}', 'id'),
+                                                  COALESCE((SELECT MAX(id) FROM {REF_TABLE_NAME}), 0) + 1, false)"""))
+    logger.info(f"Removed {removed} duplicate rows from {REF_TABLE_NAME}")
+    return removed
+
+def ensure_stg_index(engine, stg_table_name):
+    with engine.begin() as connection:
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {stg_table_name}_createdate ON {stg_table_name} (createdate)"))
+
+def get_job_name(stg_table_name):
+    return f'{stg_table_name}_to_{REF_TABLE_NAME}'
+
+def get_watermark(connection, job_name):
+    return connection.execute(text(f"SELECT watermark FROM {WATERMARK_TABLE_NAME} WHERE job_name = :job FOR UPDATE"),
+                              {'job': job_name}).scalar()
+
+def run_query_and_store(engine, incremental=INCREMENTAL, stg_table_name=STG_TABLE_NAME, resync_since=None):
+    # Everything runs in one server-side transaction: the watermark row is
+    # locked, new staging rows are upserted and the watermark is advanced.
+    # With resync_since the watermark is ignored and every staging row from
+    # that time on overwrites its ref row, e.g. after page_archive.py replay.
+    job_name = get_job_name(stg_table_name)
+    select = STG_SELECTS[stg_table_name].format(stg_table_name=stg_table_name)
+    if resync_since is None:
+        conflict = "DO NOTHING"
+    else:
+        # DO UPDATE may touch each ref row once, so one staging row per key
+        select = f"SELECT DISTINCT ON (productmasterid, createdate, platform) * FROM ({select}) stg"
+        conflict = """DO UPDATE SET name = excluded.name, price = excluded.price, originalprice = excluded.originalprice,
+                                      discountpercentage = excluded.discountpercentage, detail = excluded.detail,
+                                      category = excluded.category"""
     query = f"""
-    SELECT id, name, discounted_price as price, 
-           CASE WHEN original_price = '' THEN discounted_price ELSE original_price END AS originalprice,
-           CASE WHEN discount = '' THEN '0%' ELSE discount END AS discountpercentage,
-           description as detail, 'klikindomaret' as platform, plu as productmasterid, category, createdate
-    FROM {STG_TABLE_NAME}
+    WITH moved AS (
+        INSERT INTO {REF_TABLE_NAME} (name, price, originalprice, discountpercentage, detail, platform,
+                                      productmasterid, category, createdate)
+        {select}
+        ON CONFLICT (productmasterid, createdate, platform) {conflict}
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM moved
+    """
+    advance_watermark = f"""
+    INSERT INTO {WATERMARK_TABLE_NAME} (job_name, watermark, updated_at)
+    SELECT :job, MAX(createdate), now() FROM {stg_table_name} HAVING MAX(createdate) IS NOT NULL
+    ON CONFLICT (job_name) DO UPDATE SET
+        watermark = GREATEST({WATERMARK_TABLE_NAME}.watermark, excluded.watermark),
+        updated_at = excluded.updated_at
     """
-    
+
+    start = time.perf_counter()
     try:
-        with engine.connect() as connection:
-            result = connection.execute(text(query))
-            data = result.fetchall()
-            df = pd.DataFrame(data, columns=result.keys())
-            df.to_sql(REF_TABLE_NAME, engine, if_exists='append', index=False)
-            logger.info(f"Data from {STG_TABLE_NAME} successfully stored in {REF_TABLE_NAME}")
+        with engine.begin() as connection:
+            watermark = get_watermark(connection, job_name) if incremental else None
+            if resync_since is not None:
+                # Strictly newer than :since in STG_SELECTS, so step back to include rows at resync_since
+                since = resync_since - timedelta(microseconds=1)
+            elif watermark is not None:
+                since = watermark - WATERMARK_LOOKBACK
+            else:
+                since = datetime.min
+            moved = connection.execute(text(query), {'since': since}).scalar()
+            connection.execute(text(advance_watermark), {'job': job_name})
+        elapsed = time.perf_counter() - start
+        if resync_since is not None:
+            scope = f"re-sync since {resync_since}"
+        else:
+            scope = 'since ' + str(since) if watermark is not None else 'full scan'
+        logger.info(f"Moved {moved} rows from {stg_table_name} to {REF_TABLE_NAME} in {elapsed:.2f}s ({scope})")
+        return moved, elapsed
     except Exception as e:
         logger.error(f"Error running query and storing data: {e}")
+        return 0, time.perf_counter() - start
 
 def main():
+    parser = argparse.ArgumentParser(description=f"Move new staging rows into {REF_TABLE_NAME}.")
+    parser.add_argument('--resync-since', type=datetime.fromisoformat, default=None,
+                        help="ignore the watermark and overwrite ref rows from staging rows created at or after "
+                             "this ISO timestamp (after page_archive.py replay)")
+    parser.add_argument('--dedupe', action='store_true',
+                        help=f"one-off migration: remove duplicate rows from {REF_TABLE_NAME} and exit")
+    args = parser.parse_args()
     engine = create_engine(f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}')
     create_ref_table(engine)
-    run_query_and_store(engine)
+    create_watermark_table(engine)
+    if args.dedupe:
+        dedupe_ref_table(engine)
+        return
+    ensure_upsert_key(engine)
+    # Platforms that have not been scraped yet have no staging table
+    for stg_table_name in STG_SELECTS:
+        if inspect(engine).has_table(stg_table_name):
+            ensure_stg_index(engine, stg_table_name)
+            run_query_and_store(engine, stg_table_name=stg_table_name, resync_since=args.resync_since)
 
 if __name__ == "__main__":
     main()
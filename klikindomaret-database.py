@@ -1,23 +1,35 @@
 import os
 import logging
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-import time
-import pandas as pd
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, DateTime, Float
-from webdriver_manager.chrome import ChromeDriverManager
-import psycopg2
+from background_writer import BackgroundWriter
+from page_archive import PageArchive
+from pg_loader import CopyLoader, get_engine, postgres_url
+from scrape_state import ScrapeState
+from scraper_engine import ScrapeEngine, ScrapeStats
+from scraper_platforms import KlikindomaretPlatform
 
 # Configuration variables
-BASE_URL = "https://www.klikindomaret.com/page/unilever-officialstore?categoryID=&productbrandid=&sortcol=&pagesize=50&startprice=&endprice=&attributes=&ShowItem="
+SITE_URL = "https://www.klikindomaret.com"
+BASE_URL = f"{SITE_URL}/page/unilever-officialstore?categoryID=&productbrandid=&sortcol=&pagesize=50&startprice=&endprice=&attributes=&ShowItem="
 MAX_PAGES = 2  # Set the number of pages to scrape
-WAIT_TIME = 5  # Time to wait for pages to load
+WAIT_TIME = 5  # Max seconds to wait for a page's content to appear
 DATA_DIR = 'data'
 TIMESTAMP = datetime.now().strftime("%Y%m%d%H%M%S")
 BATCH_SIZE = 5  # Number of products to process before uploading
+LOAD_BATCH_SIZE = 500  # Rows per COPY into the staging table
+LOAD_FLUSH_INTERVAL = 10  # Max seconds scraped rows wait before being loaded
+WRITE_QUEUE_SIZE = 100  # Batches queued for the background writer before scraping blocks
+DETAIL_ENGINE = 'http'  # 'http' fetches product pages without a browser (falling back to it), 'browser' uses Chrome only
+DETAIL_WORKERS = 4  # Browsers shared by the listing loop and the product page workers (browser fallbacks in 'http' mode)
+HTTP_CONCURRENCY = 8  # Simultaneous HTTP connections for product pages
+HTTP_RATE_PER_HOST = 5  # Max product page requests per second to the site
+RECYCLE_AFTER_PAGES = 200  # Pages a browser serves before it is restarted (0 = never)
+MAX_BROWSER_RSS_MB = 1024  # Restart a browser whose memory grows past this (0 = never)
+PARSE_WORKERS = 2  # Processes parsing product pages (0 = one background thread)
+INCREMENTAL = True  # Skip unchanged products using the local scrape state
+STATE_FILE = os.path.join(DATA_DIR, 'klikindomaret-scrape-state.sqlite')
+ARCHIVE_PAGES = True  # Keep every fetched page in the local archive (replay with page_archive.py)
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'page-archive')
 
 # PostgreSQL configuration
 POSTGRES_HOST = 'localhost'
@@ -26,182 +38,48 @@ POSTGRES_DB = 'e2e_ml'
 POSTGRES_USER = 'admin'
 POSTGRES_PASSWORD = 'admin'
 TABLE_NAME = 'klikindomaret_stg'
+STG_COLUMNS = ['name', 'link', 'plu', 'discount', 'original_price', 'discounted_price',
+               'description', 'store_info', 'category', 'createdate']
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-def setup_driver():
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    service = ChromeService(executable_path=ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=chrome_options)
-
-def get_page_source(url, driver, wait_time):
-    try:
-        driver.get(url)
-        time.sleep(wait_time)
-        return driver.page_source
-    except Exception as e:
-        logger.error(f"Error getting page source for URL {url}: {e}")
-        return ""
-
-def parse_product_details(soup):
-    products = soup.find_all('div', class_='each-item')
-    product_details = []
-
-    for product in products:
-        try:
-            product_name = get_text(product, 'div', 'title')
-            product_link = get_link(product, 'a')
-            plu = get_attribute(product, 'div', 'wrp-media', 'data-plu')
-            
-            product_details.append({
-                'name': product_name,
-                'link': product_link,
-                'plu': plu,
-                'createdate': datetime.now()
-            })
-        except Exception as e:
-            logger.error(f"Error parsing product details: {e}")
-    
-    return product_details
-
-def get_text(product, tag, class_name, last_word=False):
-    try:
-        tag = product.find(tag, class_=class_name)
-        if tag:
-            text = tag.text.strip()
-            return text.split()[-1] if last_word else text
-    except Exception as e:
-        logger.error(f"Error getting text for tag {tag} with class {class_name}: {e}")
-    return ''
-
-def get_price_text(product, tag, class_name):
-    try:
-        tag = product.find(tag, class_=class_name)
-        if tag:
-            text = tag.text.strip()
-            price = text.split('Rp')[-1].strip()  # Extract the part after 'Rp'
-            return f'Rp {price}'
-    except Exception as e:
-        logger.error(f"Error getting price text for tag {tag} with class {class_name}: {e}")
-    return ''
-
-def get_link(product, tag):
-    try:
-        link_tag = product.find_parent(tag, href=True)
-        return f"https://www.klikindomaret.com{link_tag['href']}" if link_tag else ''
-    except Exception as e:
-        logger.error(f"Error getting link for tag {tag}: {e}")
-    return ''
-
-def get_attribute(product, tag, class_name, attribute):
-    try:
-        attr_tag = product.find(tag, class_=class_name)
-        return attr_tag[attribute] if attr_tag and attribute in attr_tag.attrs else ''
-    except Exception as e:
-        logger.error(f"Error getting attribute {attribute} for tag {tag} with class {class_name}: {e}")
-    return ''
-
-def scrape_additional_data(product_link, driver):
-    try:
-        driver.get(product_link)
-        time.sleep(WAIT_TIME)  # Adjust the sleep time as necessary
-        page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
-        
-        # Extracting additional data from the product page
-        discount = get_text(soup, 'span', 'discount')
-        original_price = get_price_text(soup, 'span', 'strikeout disc-price')
-        discounted_price = get_text(soup, 'span', 'normal price-final')
-        description = soup.find('span', id='desc-product').text.strip() if soup.find('span', id='desc-product') else ''
-        store_info = get_text(soup, 'span', 'typesend-title')
-        
-        # Extracting the last breadcrumb as category
-        breadcrumbs = soup.find('div', class_='breadcrumb')
-        category = breadcrumbs.find_all('a')[-1].text.strip() if breadcrumbs else ''
-        
-        return {
-            'discount': discount,
-            'original_price': original_price,
-            'discounted_price': discounted_price,
-            'description': description,
-            'store_info': store_info,
-            'category': category
-        }
-    except Exception as e:
-        logger.error(f"Error scraping additional data for product link {product_link}: {e}")
-        return {}
-
-def create_table(engine):
-    metadata = MetaData()
-    table = Table(TABLE_NAME, metadata,
-                  Column('name', String, nullable=False),
-                  Column('link', String, nullable=False),
-                  Column('plu', String, nullable=True),
-                  Column('discount', String, nullable=True),
-                  Column('original_price', String, nullable=True),
-                  Column('discounted_price', String, nullable=True),
-                  Column('description', String, nullable=True),
-                  Column('store_info', String, nullable=True),
-                  Column('category', String, nullable=True),
-                  Column('createdate', DateTime, nullable=False))
-    metadata.create_all(engine)
-    logger.info(f"Table {TABLE_NAME} created in PostgreSQL")
-
-def upload_batch_to_postgres(data, engine):
-    try:
-        df = pd.DataFrame(data)
-        df.to_sql(TABLE_NAME, engine, if_exists='append', index=False)
-        logger.info(f"Uploaded batch of {len(data)} products to PostgreSQL table {TABLE_NAME}")
-    except Exception as e:
-        logger.error(f"Error uploading batch to PostgreSQL: {e}")
-
-def scrape_products(base_url, max_pages, driver, wait_time, engine):
-    all_product_details = []
-    batch = []
-    
-    for page in range(1, max_pages + 1):
-        url = f"{base_url}&page={page}"
-        logger.info(f"Scraping page {page}: {url}")
-        page_source = get_page_source(url, driver, wait_time)
-        if not page_source:
-            continue
-        soup = BeautifulSoup(page_source, 'html.parser')
-        product_details = parse_product_details(soup)
-        
-        for product in product_details:
-            additional_data = scrape_additional_data(product['link'], driver)
-            if additional_data:
-                product.update(additional_data)
-                batch.append(product)
-                logger.info(f"Scraped product: {product}")
-                if len(batch) >= BATCH_SIZE:
-                    upload_batch_to_postgres(batch, engine)
-                    batch.clear()
-        
-        all_product_details.extend(product_details)
-    
-    # Upload any remaining products in the batch
-    if batch:
-        upload_batch_to_postgres(batch, engine)
-    
-    return all_product_details
+def scrape_products(platform, writer, state=None, archive=None, workers=DETAIL_WORKERS, detail_engine=DETAIL_ENGINE,
+                    stats=None):
+    scraper = ScrapeEngine(platform, writer, workers=workers, detail_engine=detail_engine, max_pages=MAX_PAGES,
+                           wait_time=WAIT_TIME, batch_size=BATCH_SIZE, parse_workers=PARSE_WORKERS,
+                           http_concurrency=HTTP_CONCURRENCY, http_rate=HTTP_RATE_PER_HOST, state=state, archive=archive,
+                           recycle_after=RECYCLE_AFTER_PAGES, max_rss_mb=MAX_BROWSER_RSS_MB, stats=stats)
+    return scraper.run()
 
 def main():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
-    driver = setup_driver()
-    engine = create_engine(f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}')
-    create_table(engine)
-    
+    platform = KlikindomaretPlatform(BASE_URL, TABLE_NAME, STG_COLUMNS, site_url=SITE_URL)
+    engine = get_engine(postgres_url(POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB))
+    platform.create_table(engine)
+
+    state = ScrapeState(STATE_FILE) if INCREMENTAL else None
+    archive = PageArchive(ARCHIVE_DIR) if ARCHIVE_PAGES else None
+    stats = ScrapeStats()
+    # Rows count as scraped, and are recorded in the state, once the loader has stored them
+    loader = CopyLoader(engine, TABLE_NAME, STG_COLUMNS, LOAD_BATCH_SIZE, LOAD_FLUSH_INTERVAL,
+                        on_flush=[stats.record_stored] + ([state.record] if state is not None else []))
+    writer = BackgroundWriter(loader.add, WRITE_QUEUE_SIZE, tick=loader.flush_if_due, name=f"{TABLE_NAME} writer")
     try:
-        all_product_details = scrape_products(BASE_URL, MAX_PAGES, driver, WAIT_TIME, engine)
+        scrape_products(platform, writer, state, archive, stats=stats)
     finally:
-        driver.quit()
+        # Drain queued batches and flush the loader even when scraping failed
+        writer.close()
+        loader.close()
+        if state is not None:
+            state.log_summary()
+            state.close()
+        if archive is not None:
+            archive.log_summary()
+            archive.close()
 
 if __name__ == "__main__":
     main()
@@ -1,38 +1,75 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, Table, MetaData, Column, Float, String, Date
+from pandas.api.types import union_categoricals
+import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy import create_engine, Table, MetaData, Column, Float, String, Date, text
 from sqlalchemy.exc import SQLAlchemyError
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error
 from datetime import datetime
+from db_config import DB_CONFIG, RECOMMENDATION_TABLE_NAME
+from model_store import DEFAULT_STORE_DIR, ModelStore, fingerprint
+import regression_stats
+from recommendation_cache import bump_run_version
 
-# Configuration
-DB_CONFIG = {
-    'user': 'admin',
-    'password': 'admin',
-    'host': 'localhost',
-    'port': '5400',
-    'database': 'e2e_ml'
-}
-
+# Configuration (the database and recommendation table are shared with api_2.py in db_config.py)
 CLEANED_TABLE_NAME = 'product'
-RECOMMENDATION_TABLE_NAME = 'pricerecommendation'
+TRAINING_COLUMNS = ['productmasterid', 'category', 'originalprice', 'price']
+TRAIN_CATEGORIES = None  # Only load, train and score these categories (None = all)
+LOAD_CHUNK_SIZE = 100_000  # Rows fetched per round trip from the server-side cursor
+PRICE_DTYPE = 'float32'  # Exact for whole prices below 16.7M; fits are still computed in float64
+TRAIN_WORKERS = os.cpu_count() or 1  # Processes fitting category models in parallel (1 = fit serially)
+MODEL_CACHE = True  # Reuse fitted models of categories whose training rows did not change
+MODEL_STORE_DIR = DEFAULT_STORE_DIR  # data/model-store next to the scripts, not under the working directory
+MODEL_STORE_MAX_MB = 256  # Least recently used models are evicted beyond this
+INCREMENTAL_TRAINING = False  # Solve models from per-category sums kept in PostgreSQL and score products there, loading nothing
+RECOMMENDATION_COLUMNS = ['productmasterid', 'category', 'price', 'date']
+KEEP_HISTORY = False  # Also keep every day's recommendations, keyed on (productmasterid, date)
+RECOMMENDATION_HISTORY_TABLE_NAME = 'pricerecommendation_history'
 
 def get_db_connection(config):
     """Create and return a database connection."""
     db_connection_str = f"postgresql+psycopg2://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
     return create_engine(db_connection_str)
 
-def load_cleaned_data(engine, table_name):
-    """Load cleaned data from the specified table in the database."""
-    query = f"SELECT * FROM {table_name}"
-    return pd.read_sql(query, engine)
+def compact_chunk(chunk):
+    """Shrink one fetched chunk: categorical category, PRICE_DTYPE prices, Arrow-backed ids."""
+    return chunk.astype({'productmasterid': 'string[pyarrow]', 'category': 'category',
+                         'originalprice': PRICE_DTYPE, 'price': PRICE_DTYPE})
+
+def load_training_data(engine, table_name, categories=None, chunksize=LOAD_CHUNK_SIZE):
+    """Load only the columns training and scoring need, streamed in chunks through a server-side cursor.
+
+    Rows without a category are skipped in SQL, as are categories outside `categories` when it is given.
+    """
+    query = f"SELECT {', '.join(TRAINING_COLUMNS)} FROM {table_name} WHERE category IS NOT NULL"
+    params = {}
+    if categories is not None:
+        query += " AND category = ANY(:categories)"
+        params['categories'] = list(categories)
+    chunks = []
+    with engine.connect().execution_options(stream_results=True) as connection:
+        for chunk in pd.read_sql(text(query), connection, params=params, chunksize=chunksize):
+            chunks.append(compact_chunk(chunk))
+    if not chunks:
+        return compact_chunk(pd.DataFrame(columns=TRAINING_COLUMNS))
+    # Chunks carry different category sets; union them so the concatenated column stays categorical
+    category = union_categoricals([chunk['category'] for chunk in chunks])
+    data = pd.concat([chunk.drop(columns='category') for chunk in chunks], ignore_index=True)
+    data.insert(1, 'category', category)
+    return data
 
 def prepare_data_by_category(data):
     """Prepare data for regression model by category."""
-    categories = data['category'].unique()
-    data_by_category = {category: data[data['category'] == category] for category in categories}
-    return data_by_category
+    # One groupby pass instead of a boolean mask over the whole frame per category
+    return dict(tuple(data.groupby('category', sort=False, observed=True)))
 
 def train_model(X_train, y_train):
     """Train a linear regression model."""
@@ -45,78 +82,234 @@ def evaluate_model(model, X_test, y_test):
     y_pred = model.predict(X_test)
     return mean_squared_error(y_test, y_pred)
 
-def recommend_price(originalprice, model):
-    """Recommend a price based on the original price using the trained model."""
-    return model.predict(pd.DataFrame([[originalprice]], columns=['originalprice']))[0]
+def fit_category(data):
+    """Fit and evaluate one category's model; returns (model, mse), or None when there is too little data."""
+    if len(data) <= 1:
+        return None
+    # Upcast compact prices so the fit is the same as on float64 data
+    X = data[['originalprice']].astype(np.float64)
+    y = data['price'].astype(np.float64)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    model = train_model(X_train, y_train)
+    return model, evaluate_model(model, X_test, y_test)
+
+def timed_fit(data):
+    """fit_category plus the seconds it took, so the model store can report the time it saves."""
+    start = time.perf_counter()
+    fit = fit_category(data)
+    return fit, time.perf_counter() - start
+
+def train_models(data_by_category, workers=TRAIN_WORKERS, store=None):
+    """Train and evaluate one model per category with enough data; return {category: model}.
+
+    With a model store, categories whose training rows match a stored fingerprint reuse the stored model.
+    """
+    categories = list(data_by_category)
+    frames = {category: data_by_category[category][['originalprice', 'price']] for category in categories}
+    fits = {}
+    fingerprints = {}
+    if store is not None:
+        for category, frame in frames.items():
+            if len(frame) > 1:
+                fingerprints[category] = fingerprint(frame)
+                fits[category] = store.get(category, fingerprints[category])
+    to_fit = [category for category in categories if fits.get(category) is None]
+
+    if workers > 1 and len(to_fit) > 1:
+        # Fits are deterministic, so the pool returns exactly the serial results, in order
+        chunksize = max(1, len(to_fit) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            fitted = list(executor.map(timed_fit, [frames[category] for category in to_fit], chunksize=chunksize))
+    else:
+        fitted = [timed_fit(frames[category]) for category in to_fit]
+    for category, (fit, seconds) in zip(to_fit, fitted):
+        fits[category] = fit
+        if fit is not None and store is not None:
+            store.put(category, fingerprints[category], fit[0], fit[1], seconds)
+
+    models = {}
+    for category in categories:
+        fit = fits.get(category)
+        if fit is None:
+            print(f"Category: {category} does not have enough data for train-test split.")
+            continue
+        model, mse = fit
+        print(f"Category: {category}, Mean Squared Error: {mse}")
+        models[category] = model
+    if store is not None:
+        store.evict()
+        s = store.stats()
+        print(f"Model cache: {s['hits']}/{s['hits'] + s['misses']} categories reused ({s['hit_rate']:.0%}), "
+              f"~{s['saved_seconds']:.2f}s of training saved, {s['fit_seconds']:.2f}s spent fitting, {s['evicted']} evicted.")
+    return models
+
+def coefficient_table(models):
+    """Stack the fitted models into one table of (category, coef, intercept)."""
+    return pd.DataFrame({
+        'category': list(models),
+        'coef': [float(model.coef_[0]) for model in models.values()],
+        'intercept': [float(model.intercept_) for model in models.values()],
+    })
+
+def incremental_coefficients(engine, table_name):
+    """Fold new product rows into the regression sums and solve every category's model from them.
+
+    The holdout is a fixed 20% of products (regression_stats.is_holdout) rather than a random split,
+    so the reported MSE is what evaluate_model gives for a model fitted on the same rows.
+    """
+    applied, elapsed = regression_stats.update_stats(engine, table_name)
+    print(f"Regression statistics: {applied} new, changed or removed rows applied in {elapsed:.2f}s.")
+    solved = regression_stats.coefficients(engine)
+    for category, _, _, _, mse in solved:
+        if mse is None:
+            print(f"Category: {category}, no holdout rows to evaluate.")
+        else:
+            print(f"Category: {category}, Mean Squared Error: {mse}")
+    return pd.DataFrame([row[:3] for row in solved], columns=['category', 'coef', 'intercept'])
+
+def build_recommendations(data, models, date=None):
+    """Recommend prices for all products at once through the stacked coefficient table.
 
-def save_recommendations_to_db(engine, recommendations, table_name):
-    """Save recommendations to the specified table in the database."""
+    `models` is {category: model} or an already stacked coefficient table.
+    Products in categories without a model get no recommendation, as before.
+    """
+    coefficients = models if isinstance(models, pd.DataFrame) else coefficient_table(models)
+    scored = data[['productmasterid', 'category', 'originalprice']].merge(coefficients, on='category', how='inner')
+    originalprice = scored['originalprice'].to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'productmasterid': scored['productmasterid'].to_numpy(),
+        'category': scored['category'].to_numpy(),
+        'price': scored['intercept'].to_numpy() + scored['coef'].to_numpy() * originalprice,
+        'date': date or datetime.now().date(),
+    })
+
+def save_recommendations_to_db(engine, recommendations, table_name, key=('productmasterid',)):
+    """Upsert recommendations into the table: COPY into a temp table, then one INSERT ... ON CONFLICT on `key`."""
+    recommendations = pd.DataFrame(recommendations, columns=RECOMMENDATION_COLUMNS)
+    # A key that appears twice would fail the whole upsert; the last one wins
+    recommendations = recommendations.drop_duplicates(subset=list(key), keep='last')
+    columns = ', '.join(RECOMMENDATION_COLUMNS)
+
+    def load(cursor):
+        # pyarrow writes the COPY payload far faster than DataFrame.to_csv; nulls become unquoted empty fields
+        buffer = io.BytesIO()
+        pa_csv.write_csv(pa.Table.from_pandas(recommendations, preserve_index=False), buffer,
+                         pa_csv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY recommendation_load ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    return upsert_recommendations(engine, load, table_name, key)
+
+def save_scored_recommendations(engine, coefficients, source_table, table_name, key=('productmasterid',),
+                                categories=None, date=None):
+    """Score the products of `source_table` with a coefficient table inside PostgreSQL and upsert the results.
+
+    Same recommendations as build_recommendations + save_recommendations_to_db, without loading the products.
+    """
+    coefficients = coefficients[['category', 'coef', 'intercept']]
+    where = "WHERE p.category = ANY(%(categories)s)" if categories is not None else ""
+
+    def load(cursor):
+        cursor.execute("CREATE TEMP TABLE recommendation_coefficients "
+                       "(category VARCHAR, coef FLOAT8, intercept FLOAT8) ON COMMIT DROP")
+        buffer = io.StringIO()
+        coefficients.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert("COPY recommendation_coefficients FROM STDIN WITH (FORMAT csv)", buffer)
+        # One row per product, like drop_duplicates on the DataFrame path
+        cursor.execute(f"""
+            INSERT INTO recommendation_load ({', '.join(RECOMMENDATION_COLUMNS)})
+            SELECT DISTINCT ON (p.productmasterid) p.productmasterid, p.category,
+                   c.intercept + c.coef * p.originalprice, %(date)s
+            FROM {source_table} p JOIN recommendation_coefficients c ON c.category = p.category
+            {where}
+            ORDER BY p.productmasterid
+            """, {'date': date or datetime.now().date(),
+                  'categories': list(categories) if categories is not None else None})
+
+    return upsert_recommendations(engine, load, table_name, key)
+
+def upsert_recommendations(engine, load, table_name, key=('productmasterid',)):
+    """Create the table if needed, fill the recommendation_load temp table with `load(cursor)` and merge it on `key`."""
     metadata = MetaData()
-    recommendations_table = Table(table_name, metadata,
-                                  Column('productmasterid', String, primary_key=True),
-                                  Column('category', String),
-                                  Column('price', Float),
-                                  Column('date', Date))
+    Table(table_name, metadata,
+          Column('productmasterid', String, primary_key='productmasterid' in key),
+          Column('category', String),
+          Column('price', Float),
+          Column('date', Date, primary_key='date' in key))
     metadata.create_all(engine)  # Create table if it doesn't exist
 
+    columns = ', '.join(RECOMMENDATION_COLUMNS)
+    key_columns = ', '.join(key)
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in RECOMMENDATION_COLUMNS if column not in key)
+    merge_sql = (f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM recommendation_load "
+                 f"ON CONFLICT ({key_columns}) DO UPDATE SET {updates}")
+
+    start = time.perf_counter()
+    connection = engine.raw_connection()
     try:
-        with engine.begin() as connection:  # Using `begin` ensures a commit at the end of the block
-            for recommendation in recommendations:
-                ins = recommendations_table.insert().values(
-                    productmasterid=recommendation['productmasterid'], 
-                    category=recommendation['category'],
-                    price=float(recommendation['price']),
-                    date=recommendation['date']
-                )
-                print(f"Inserting: {recommendation}")  # Debugging line
-                connection.execute(ins)
-        print(f"Recommendations saved to table '{table_name}'.")
-    except SQLAlchemyError as e:
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE recommendation_load (LIKE {table_name}) ON COMMIT DROP")
+            load(cursor)
+            cursor.execute(merge_sql)
+            upserted = cursor.rowcount
+            if table_name == RECOMMENDATION_TABLE_NAME:
+                # Only the table the API serves is cached. Same transaction as the
+                # upsert: API caches see the new version only with the new rows
+                bump_run_version(cursor, table_name, upserted)
+        connection.commit()
+        elapsed = time.perf_counter() - start
+        print(f"Upserted {upserted} recommendations into table '{table_name}' in {elapsed:.2f}s "
+              f"({upserted / elapsed if elapsed else 0:,.0f} rows/s).")
+        return upserted
+    except (SQLAlchemyError, psycopg2.Error) as e:
+        connection.rollback()
         print(f"Error saving recommendations to the database: {e}")
+        return 0
+    finally:
+        connection.close()
 
 def main():
     try:
         engine = get_db_connection(DB_CONFIG)
-        cleaned_data = load_cleaned_data(engine, CLEANED_TABLE_NAME)
-        print("Cleaned data loaded successfully.")
+        if INCREMENTAL_TRAINING:
+            # The sums live in PostgreSQL and products are scored there, so no rows are loaded
+            models = incremental_coefficients(engine, CLEANED_TABLE_NAME)
+            save_scored_recommendations(engine, models, CLEANED_TABLE_NAME, RECOMMENDATION_TABLE_NAME,
+                                        categories=TRAIN_CATEGORIES)
+            if KEEP_HISTORY:
+                save_scored_recommendations(engine, models, CLEANED_TABLE_NAME, RECOMMENDATION_HISTORY_TABLE_NAME,
+                                            key=('productmasterid', 'date'), categories=TRAIN_CATEGORIES)
+            return
+
+        start = time.perf_counter()
+        cleaned_data = load_training_data(engine, CLEANED_TABLE_NAME, TRAIN_CATEGORIES)
+        print(f"Cleaned data loaded successfully: {len(cleaned_data)} rows, "
+              f"{cleaned_data.memory_usage(deep=True).sum() / 2 ** 20:.1f} MiB in {time.perf_counter() - start:.2f}s.")
         print(cleaned_data.head())
         
         data_by_category = prepare_data_by_category(cleaned_data)
-        
-        models = {}
-        recommendations = []
-        for category, data in data_by_category.items():
-            if len(data) > 1:
-                X = data[['originalprice']]
-                y = data['price']
-                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-                
-                model = train_model(X_train, y_train)
-                mse = evaluate_model(model, X_test, y_test)
-                print(f"Category: {category}, Mean Squared Error: {mse}")
-                
-                models[category] = model
-                
-                # Recommend price for each product in the category
-                for index, row in data.iterrows():
-                    recommended_price = recommend_price(row['originalprice'], model)
-                    recommendations.append({
-                        'productmasterid': row['productmasterid'],
-                        'category': category,
-                        'price': recommended_price,
-                        'date': datetime.now().date()
-                    })
-                    print(f"ProductMasterID: {row['productmasterid']}, Category: {category}, Recommended Price: {recommended_price}, Date: {datetime.now().date()}")
-            else:
-                print(f"Category: {category} does not have enough data for train-test split.")
+        store = ModelStore(MODEL_STORE_DIR, MODEL_STORE_MAX_MB * 2 ** 20) if MODEL_CACHE else None
+        try:
+            models = train_models(data_by_category, TRAIN_WORKERS, store)
+        finally:
+            if store is not None:
+                store.close()
+
+        # Score every category in one vectorized pass instead of one predict per product
+        recommendations = build_recommendations(cleaned_data, models)
         
         # Check if recommendations list is populated
-        if not recommendations:
+        if recommendations.empty:
             print("No recommendations to save.")
         else:
             print(f"Total recommendations: {len(recommendations)}")
-            # Save recommendations to PostgreSQL
+            print(recommendations.head())
+            # Save recommendations to PostgreSQL; a rerun on the same day updates them in place
             save_recommendations_to_db(engine, recommendations, RECOMMENDATION_TABLE_NAME)
+            if KEEP_HISTORY:
+                save_recommendations_to_db(engine, recommendations, RECOMMENDATION_HISTORY_TABLE_NAME,
+                                           key=('productmasterid', 'date'))
     except SQLAlchemyError as e:
         print(f"Error in database operations: {e}")
 
@@ -0,0 +1,169 @@
+"""Local store of fitted category models, keyed by a fingerprint of their training rows.
+
+model.py looks each category up by its fingerprint (row count plus a SHA-256
+of the `originalprice`/`price` values, in row order, and TRAINING_VERSION), so
+a re-run only refits categories whose data changed. Models are pickled under
+`models/<sha256(category)>.pkl`; a SQLite index records fingerprint, size,
+MSE, fit time and last use. When the store grows past `max_bytes` the least
+recently used models are evicted. The default store is data/model-store next
+to this module, whatever the working directory.
+
+    python model_store.py stats
+    python model_store.py clear --store data/model-store
+"""
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+
+TRAINING_VERSION = 'linear-regression/test_size=0.2/random_state=42'  # Change when the training procedure changes
+MAX_STORE_BYTES = 256 * 2 ** 20  # Evict least recently used models beyond this
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'model-store')
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(data, columns=('originalprice', 'price')):
+    """Row count plus a content hash of the training columns; any change to the rows or their order changes it."""
+    digest = hashlib.sha256(TRAINING_VERSION.encode('utf-8'))
+    for column in columns:
+        digest.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)).tobytes())
+    return f"{len(data)}:{digest.hexdigest()}"
+
+
+class ModelStore:
+    """Fitted models by category; `get()` returns a cached fit only when the fingerprint matches."""
+
+    def __init__(self, root, max_bytes=MAX_STORE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, 'models'), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, 'index.sqlite'))
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS models (
+                category TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                path TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                mse REAL,
+                fit_seconds REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.saved_seconds = 0.0
+        self.fit_seconds = 0.0
+
+    def get(self, category, fingerprint):
+        """Return (model, mse) stored for `category` with this fingerprint, or None."""
+        row = self._conn.execute("SELECT path, mse, fit_seconds FROM models WHERE category = ? AND fingerprint = ?",
+                                 (str(category), fingerprint)).fetchone()
+        if row is not None:
+            try:
+                with open(os.path.join(self.root, row[0]), 'rb') as file:
+                    model = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logger.warning(f"Discarding unreadable model for category {category}: {e}")
+                self._delete(str(category))
+                row = None
+        if row is None:
+            self.misses += 1
+            return None
+        # Index updates are committed together by evict() or close()
+        self._conn.execute("UPDATE models SET last_used = ? WHERE category = ?", (time.time(), str(category)))
+        self.hits += 1
+        self.saved_seconds += row[2]
+        return model, row[1]
+
+    def put(self, category, fingerprint, model, mse, fit_seconds):
+        """Store a freshly fitted model, replacing the category's previous one."""
+        data = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        relative = os.path.join('models', hashlib.sha256(str(category).encode('utf-8')).hexdigest() + '.pkl')
+        path = os.path.join(self.root, relative)
+        # Write then rename, so a crash never leaves a truncated model behind
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO models (category, fingerprint, path, bytes, mse, fit_seconds, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(category), fingerprint, relative, len(data), mse, fit_seconds, time.time()))
+        self.fit_seconds += fit_seconds
+
+    def _delete(self, category):
+        row = self._conn.execute("SELECT path FROM models WHERE category = ?", (category,)).fetchone()
+        if row is not None:
+            try:
+                os.remove(os.path.join(self.root, row[0]))
+            except FileNotFoundError:
+                pass
+        self._conn.execute("DELETE FROM models WHERE category = ?", (category,))
+
+    def evict(self):
+        """Delete least recently used models until the store fits in `max_bytes`; returns how many were removed."""
+        total = self.stored_bytes()
+        removed = 0
+        if total <= self.max_bytes:
+            self._conn.commit()
+            return removed
+        for category, size in self._conn.execute("SELECT category, bytes FROM models ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._delete(category)
+            total -= size
+            removed += 1
+        self._conn.commit()
+        self.evicted += removed
+        return removed
+
+    def stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM models").fetchone()[0]
+
+    def clear(self):
+        for (category,) in self._conn.execute("SELECT category FROM models").fetchall():
+            self._delete(category)
+        self._conn.commit()
+
+    def stats(self):
+        models, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM models").fetchone()
+        lookups = self.hits + self.misses
+        return {'models': models, 'bytes': size, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0, 'evicted': self.evicted,
+                'saved_seconds': self.saved_seconds, 'fit_seconds': self.fit_seconds}
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Inspect or empty the model store.")
+    parser.add_argument('command', choices=['stats', 'clear'])
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR)
+    args = parser.parse_args()
+
+    with ModelStore(args.store) as store:
+        if args.command == 'clear':
+            store.clear()
+        s = store.stats()
+        logger.info(f"{s['models']} models, {s['bytes'] / 1e6:.2f} MB on disk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""Compressed, content-addressed archive of every fetched page.
+
+Each page body is stored once under `objects/<sha256[:2]>/<sha256>` and
+compressed with zstd (gzip when `zstandard` is not installed), so refetching
+an unchanged page only adds a row to the index. The SQLite index records
+url, plu, page kind ('listing' or 'detail'), platform, fetch time and content
+hash. One archive can hold several platforms (scrape.py --archive); replay
+only reads REPLAY_PLATFORM's pages. Pages archived before the platform was
+recorded are matched by the replay site URL instead.
+
+`klikindomaret_stg` can be rebuilt from the archive without touching the
+site, e.g. after fixing a selector:
+
+    python page_archive.py replay --archive data/page-archive --truncate
+    python page_archive.py replay --archive data/page-archive --since 2024-06-01T00:00:00
+    python page_archive.py stats --archive data/page-archive
+
+Scraped rows carry the fetch time of their listing page as createdate, so a
+replayed row has the same (plu, createdate) as the row the scraper wrote and
+replaces it. `--truncate` empties the table first and is only allowed for a
+full replay. Replayed rows are older than the ref job's watermark; replay logs
+the `klikindomaret-database-ref.py --resync-since` command that rewrites them
+in klikindomaret_ref.
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from pg_loader import COPY_NULL, get_engine, postgres_url
+from product_parser import SITE_URL, parse_detail, parse_listing
+
+try:
+    import zstandard
+except ImportError:  # gzip is always available
+    zstandard = None
+
+ZSTD_LEVEL = 10  # Pages are written once and read rarely, so favour ratio over speed
+GZIP_LEVEL = 6
+REPLAY_TABLE = 'klikindomaret_stg'
+REPLAY_PLATFORM = 'klikindomaret'  # Platform whose pages rebuild REPLAY_TABLE
+REPLAY_COLUMNS = ['name', 'link', 'plu', 'discount', 'original_price', 'discounted_price',
+                  'description', 'store_info', 'category', 'createdate']
+EARLIER_LISTING_BATCH = 64  # Listing pages before --since parsed at a time while looking for missing cards
+
+logger = logging.getLogger(__name__)
+
+
+def _compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), '.zst'
+    return gzip.compress(data, compresslevel=GZIP_LEVEL), '.gz'
+
+
+def _decompress(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageArchive:
+    """Thread-safe page store; `put()` is called from every fetching thread."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                hash TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                raw_bytes INTEGER NOT NULL,
+                stored_bytes INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                plu TEXT,
+                kind TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                hash TEXT NOT NULL REFERENCES objects (hash),
+                platform TEXT
+            );
+            CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+            """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(pages)")]
+        if 'platform' not in columns:
+            # Archive from before platforms were recorded; its pages keep a NULL platform
+            self._conn.execute("ALTER TABLE pages ADD COLUMN platform TEXT")
+        self._conn.commit()
+        self.pages_archived = 0
+        self.pages_deduplicated = 0
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+
+    def put(self, url, html, kind, plu=None, fetched_at=None, platform=None):
+        """Archive one fetched page of `platform` and return its content hash."""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        fetched_at = (fetched_at or datetime.now()).isoformat()
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if not known:
+            self._write_object(digest, data)
+        with self._lock:
+            self._conn.execute("INSERT INTO pages (url, plu, kind, fetched_at, hash, platform) "
+                               "VALUES (?, ?, ?, ?, ?, ?)", (url, plu, kind, fetched_at, digest, platform))
+            self._conn.commit()
+            self.pages_archived += 1
+            self.bytes_raw += len(data)
+            if known:
+                self.pages_deduplicated += 1
+        return digest
+
+    def _write_object(self, digest, data):
+        compressed, suffix = _compress(data)
+        relative = os.path.join('objects', digest[:2], digest + suffix)
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated object behind
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(compressed)
+        os.replace(tmp_path, path)
+        with self._lock:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO objects (hash, path, raw_bytes, stored_bytes) VALUES (?, ?, ?, ?)",
+                (digest, relative, len(data), len(compressed))).rowcount
+            self._conn.commit()
+            if inserted:
+                self.bytes_stored += len(compressed)
+
+    def object_path(self, digest):
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return os.path.join(self.root, row[0])
+
+    def get(self, digest):
+        """Return the page body stored under `digest`."""
+        return _decompress(self.object_path(digest)).decode('utf-8')
+
+    def pages(self, since=None, before=None, kind=None, newest_first=False, platform=None, site_url=None):
+        """Index entries (id, url, plu, kind, fetched_at, path) in fetch order, or newest first.
+
+        With `platform`, only that platform's pages; pages archived without a
+        platform are included when their url starts with `site_url`.
+        """
+        query = ("SELECT p.id, p.url, p.plu, p.kind, p.fetched_at, o.path FROM pages p "
+                 "JOIN objects o ON o.hash = p.hash")
+        conditions = []
+        params = []
+        if since:
+            conditions.append("p.fetched_at >= ?")
+            params.append(since)
+        if before:
+            conditions.append("p.fetched_at < ?")
+            params.append(before)
+        if kind:
+            conditions.append("p.kind = ?")
+            params.append(kind)
+        if platform:
+            conditions.append("(p.platform = ? OR (p.platform IS NULL AND substr(p.url, 1, length(?)) = ?))")
+            params.extend([platform, site_url or '', site_url or ''])
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        order = "DESC" if newest_first else "ASC"
+        with self._lock:
+            rows = self._conn.execute(query + f" ORDER BY p.fetched_at {order}, p.id {order}", params).fetchall()
+        return [(id_, url, plu, kind, fetched_at, os.path.join(self.root, path))
+                for id_, url, plu, kind, fetched_at, path in rows]
+
+    def stats(self):
+        with self._lock:
+            pages, = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+            objects, raw, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM objects").fetchone()
+            fetched_raw, = self._conn.execute(
+                "SELECT COALESCE(SUM(o.raw_bytes), 0) FROM pages p JOIN objects o ON o.hash = p.hash").fetchone()
+        return {'pages': pages, 'objects': objects, 'fetched_bytes': fetched_raw,
+                'unique_bytes': raw, 'stored_bytes': stored}
+
+    def log_summary(self):
+        logger.info(f"Page archive: {self.pages_archived} pages archived, {self.pages_deduplicated} deduplicated, "
+                    f"{self.bytes_raw / 1e6:.1f} MB fetched, {self.bytes_stored / 1e6:.2f} MB written")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _parse_object(task):
+    kind, path, site_url = task
+    html = _decompress(path).decode('utf-8')
+    return parse_listing(html, site_url) if kind == 'listing' else parse_detail(html)
+
+
+def _earlier_cards(archive, links, before, executor, site_url, platform):
+    """Cards for `links` from the most recent listing pages of `platform` fetched before `before`."""
+    found = {}
+    listings = archive.pages(before=before, kind='listing', newest_first=True, platform=platform, site_url=site_url)
+    for start in range(0, len(listings), EARLIER_LISTING_BATCH):
+        if len(found) == len(links):
+            break
+        batch = listings[start:start + EARLIER_LISTING_BATCH]
+        tasks = [(kind, path, site_url) for _, _, _, kind, _, path in batch]
+        for (id_, _, _, _, fetched_at, _), result in zip(batch, executor.map(_parse_object, tasks)):
+            for card in result:
+                if card['link'] in links and card['link'] not in found:
+                    found[card['link']] = (id_, dict(card, createdate=datetime.fromisoformat(fetched_at)))
+    return found
+
+
+def replay_rows(archive, since=None, workers=None, site_url=SITE_URL, platform=REPLAY_PLATFORM):
+    """Rebuild staging rows from the archived pages of `platform`.
+
+    Every archived product page becomes one row, joined with its card from the
+    most recent listing page fetched before it; a page that was refetched for
+    the same listing (e.g. the browser fallback) replaces the earlier fetch.
+    With `since`, a product page whose listing page was fetched before `since`
+    is joined with that earlier listing. Each distinct page body is
+    decompressed and parsed only once.
+    """
+    entries = archive.pages(since, platform=platform, site_url=site_url)
+    unique = {}
+    for _, _, _, kind, _, path in entries:
+        unique.setdefault((kind, path), None)
+    tasks = [(kind, path, site_url) for kind, path in unique]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parsed = dict(zip(unique, executor.map(_parse_object, tasks, chunksize=16)))
+        cards = {}
+        if since:
+            # Product pages fetched before any listing page in the window that lists them
+            listed = set()
+            missing = set()
+            for _, url, _, kind, _, path in entries:
+                if kind == 'listing':
+                    listed.update(card['link'] for card in parsed[(kind, path)])
+                elif kind == 'detail' and url not in listed:
+                    missing.add(url)
+            if missing:
+                cards = _earlier_cards(archive, missing, since, executor, site_url, platform)
+                logger.info(f"Found listings before {since} for {len(cards)} of {len(missing)} product pages")
+
+    rows = {}
+    for id_, url, _, kind, fetched_at, path in entries:
+        result = parsed[(kind, path)]
+        if kind == 'listing':
+            createdate = datetime.fromisoformat(fetched_at)
+            for card in result:
+                cards[card['link']] = (id_, dict(card, createdate=createdate))
+        elif kind == 'detail' and url in cards and result:
+            listing_id, card = cards[url]
+            rows[(listing_id, url)] = dict(card, **result)
+    return list(rows.values())
+
+
+def _copy_rows(cursor, table_name, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([COPY_NULL if row.get(column) is None else row.get(column) for column in REPLAY_COLUMNS])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table_name} ({', '.join(REPLAY_COLUMNS)}) FROM STDIN "
+                       f"WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer)
+
+
+def load_replayed_rows(engine, rows, truncate=False):
+    """Write replayed rows in one transaction, replacing staging rows with the same (plu, createdate).
+
+    With `truncate` every staging row is deleted first. Returns the number of
+    staging rows deleted.
+    """
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            if truncate:
+                cursor.execute(f"DELETE FROM {REPLAY_TABLE}")
+                deleted = cursor.rowcount
+                _copy_rows(cursor, REPLAY_TABLE, rows)
+            else:
+                cursor.execute(f"CREATE TEMP TABLE replayed (LIKE {REPLAY_TABLE}) ON COMMIT DROP")
+                _copy_rows(cursor, 'replayed', rows)
+                cursor.execute(f"""DELETE FROM {REPLAY_TABLE} s USING replayed r
+                                   WHERE s.plu = r.plu AND s.createdate = r.createdate""")
+                deleted = cursor.rowcount
+                columns = ', '.join(REPLAY_COLUMNS)
+                cursor.execute(f"INSERT INTO {REPLAY_TABLE} ({columns}) SELECT {columns} FROM replayed")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return deleted
+
+
+def replay(archive, engine, truncate=False, since=None, workers=None, site_url=SITE_URL):
+    """Load the rows rebuilt from `archive` into the staging table; returns the row count."""
+    if truncate and since:
+        # Rows outside the window would be deleted and never rebuilt
+        raise ValueError("truncate empties the whole staging table; it cannot be combined with since")
+    start = time.perf_counter()
+    rows = replay_rows(archive, since, workers, site_url)
+    parsed_at = time.perf_counter()
+    deleted = load_replayed_rows(engine, rows, truncate)
+    logger.info(f"Replayed {len(rows)} rows into {REPLAY_TABLE}, replacing {deleted}: "
+                f"parse {parsed_at - start:.2f}s, load {time.perf_counter() - parsed_at:.2f}s")
+    if rows:
+        oldest = min(row['createdate'] for row in rows)
+        logger.info(f"To rewrite them in the ref table: python klikindomaret-database-ref.py "
+                    f"--resync-since {oldest.isoformat()}")
+    return len(rows)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Inspect the page archive or rebuild the staging table from it.")
+    parser.add_argument('command', choices=['replay', 'stats'])
+    parser.add_argument('--archive', default=os.path.join('data', 'page-archive'))
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'),
+                        help="SQLAlchemy URL of the database holding the staging table")
+    parser.add_argument('--since', default=None, help="only replay pages fetched at or after this ISO timestamp")
+    parser.add_argument('--truncate', action='store_true',
+                        help=f"empty {REPLAY_TABLE} before loading (full replays only)")
+    parser.add_argument('--workers', type=int, default=None, help="parsing processes (default: all cores)")
+    parser.add_argument('--site-url', default=SITE_URL)
+    args = parser.parse_args()
+    if args.truncate and args.since:
+        parser.error("--truncate empties the whole staging table; it cannot be combined with --since")
+
+    archive = PageArchive(args.archive)
+    try:
+        if args.command == 'stats':
+            s = archive.stats()
+            ratio = s['fetched_bytes'] / s['stored_bytes'] if s['stored_bytes'] else 0
+            logger.info(f"{s['pages']} pages, {s['objects']} unique, {s['fetched_bytes'] / 1e6:.1f} MB fetched, "
+                        f"{s['stored_bytes'] / 1e6:.2f} MB on disk ({ratio:.0f}x)")
+        else:
+            replay(archive, get_engine(args.url), args.truncate, args.since, args.workers, args.site_url)
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Readiness-based page loading shared by the scrapers.
+
+Instead of sleeping a fixed number of seconds after `driver.get`, wait until the
+element the parser needs is present, with a per-page timeout, and record how
+long every page actually took.
+"""
+import logging
+import statistics
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Selectors the parsers depend on
+KLIKINDOMARET_LISTING_SELECTOR = 'div.each-item'
+KLIKINDOMARET_DETAIL_SELECTOR = 'span#desc-product'
+BLIBLI_LISTING_SELECTOR = '.product__card'
+
+DEFAULT_TIMEOUT = 10  # Max seconds to wait for a page's content to appear
+POLL_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class PageLoadStats:
+    """Thread-safe record of page load times."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = []
+        self.timeouts = 0
+
+    def record(self, url, elapsed, ready):
+        with self._lock:
+            self.timings.append((url, elapsed))
+            if not ready:
+                self.timeouts += 1
+
+    def summary(self):
+        """Return page count, timeouts and latency percentiles in seconds."""
+        with self._lock:
+            elapsed = sorted(t for _, t in self.timings)
+            timeouts = self.timeouts
+        if not elapsed:
+            return {'pages': 0, 'timeouts': timeouts}
+        return {
+            'pages': len(elapsed),
+            'timeouts': timeouts,
+            'total': sum(elapsed),
+            'mean': statistics.fmean(elapsed),
+            'p50': elapsed[len(elapsed) // 2],
+            'p95': elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))],
+            'max': elapsed[-1],
+        }
+
+    def log_summary(self, label='Page loads'):
+        s = self.summary()
+        if not s['pages']:
+            logger.info(f"{label}: no pages loaded")
+            return
+        logger.info(f"{label}: {s['pages']} pages, {s['timeouts']} timeouts, "
+                    f"mean {s['mean']:.2f}s, p50 {s['p50']:.2f}s, p95 {s['p95']:.2f}s, max {s['max']:.2f}s")
+
+
+def wait_for(driver, selector, timeout=DEFAULT_TIMEOUT):
+    """Wait until `selector` is present in the current page. Returns False on timeout."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        return True
+    except TimeoutException:
+        return False
+
+
+def load_page(driver, url, selector, timeout=DEFAULT_TIMEOUT, stats=None):
+    """Open `url` and return its source as soon as `selector` is present.
+
+    On timeout the source is returned anyway so callers behave as they did with
+    a fixed sleep; the miss is logged and counted in `stats`.
+    """
+    start = time.perf_counter()
+    driver.get(url)
+    ready = wait_for(driver, selector, timeout)
+    page_source = driver.page_source
+    elapsed = time.perf_counter() - start
+    if not ready:
+        logger.warning(f"Timed out after {timeout}s waiting for '{selector}' on {url}")
+    if stats is not None:
+        stats.record(url, elapsed, ready)
+    return page_source
@@ -0,0 +1,187 @@
+"""Multi-process parsing stage, decoupled from page fetching.
+
+Fetchers `put()` raw HTML on a bounded queue and go straight back to fetching;
+a feeder thread hands the pages to a ProcessPoolExecutor, so parsing scales
+across cores independently of how many browsers or HTTP connections fetch.
+Each parsed page is delivered to `on_result(context, result)`. A page kind is
+one of the names `parse_page` knows or any picklable function of the HTML.
+
+Saved pages can be re-parsed with no network at all:
+
+    python parse_stage.py --kind detail --output data/reparsed.csv benchmarks/fixtures/klikindomaret/product/*.html
+"""
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from file_sink import open_sink
+from product_parser import SITE_URL, parse_detail, parse_detail_if_complete, parse_listing
+
+DEFAULT_WORKERS = os.cpu_count() or 2
+DEFAULT_MAX_PENDING = 200  # Raw pages waiting for a parser before fetchers block
+LISTING_COLUMNS = ['name', 'link', 'plu', 'card_price', 'createdate']
+DETAIL_COLUMNS = ['discount', 'original_price', 'discounted_price', 'description', 'store_info', 'category']
+
+logger = logging.getLogger(__name__)
+_STOP = object()
+
+
+def parse_page(kind, html, site_url=SITE_URL):
+    """Parse one page. kind: 'listing', 'detail' or 'detail_checked' (None if incomplete)."""
+    if kind == 'listing':
+        return parse_listing(html, site_url)
+    if kind == 'detail':
+        return parse_detail(html)
+    if kind == 'detail_checked':
+        return parse_detail_if_complete(html)
+    raise ValueError(f"Unknown page kind: {kind}")
+
+
+def parse_file(kind, path, site_url=SITE_URL):
+    with open(path, encoding='utf-8') as file:
+        return path, parse_page(kind, file.read(), site_url)
+
+
+class ParseStage:
+    """Queue of raw pages parsed by a process pool.
+
+    With workers=0 pages are parsed on the feeder thread instead, which still
+    keeps parsing off the fetching threads.
+    """
+
+    def __init__(self, on_result, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, site_url=SITE_URL):
+        self.on_result = on_result
+        self.site_url = site_url
+        self.pages_parsed = 0
+        self.parse_errors = 0
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+        self._queue = queue.Queue(maxsize=max_pending)
+        # Bound the pages handed to the pool so the pending queue applies back-pressure
+        self._in_flight = threading.BoundedSemaphore(max(1, workers) * 4)
+        self._started = time.perf_counter()
+        self._feeder = threading.Thread(target=self._feed, name='parse-feeder', daemon=True)
+        self._feeder.start()
+
+    def put(self, kind, html, context=None):
+        """Queue a raw page for parsing; blocks while the queue is full."""
+        with self._idle:
+            self._pending += 1
+        self._queue.put((kind, html, context))
+
+    def join(self):
+        """Wait until every page queued so far has been parsed and delivered."""
+        with self._idle:
+            self._idle.wait_for(lambda: self._pending == 0)
+
+    def _call(self, kind, html):
+        if callable(kind):
+            return kind, (html,)
+        return parse_page, (kind, html, self.site_url)
+
+    def _feed(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            kind, html, context = item
+            parse, args = self._call(kind, html)
+            if self._executor is None:
+                try:
+                    result = parse(*args)
+                except Exception as e:
+                    result = self._failed(context, e)
+                self._deliver(context, result)
+                continue
+            self._in_flight.acquire()
+            future = self._executor.submit(parse, *args)
+            future.add_done_callback(partial(self._done, context))
+
+    def _done(self, context, future):
+        self._in_flight.release()
+        try:
+            result = future.result()
+        except Exception as e:
+            result = self._failed(context, e)
+        self._deliver(context, result)
+
+    def _failed(self, context, error):
+        self.parse_errors += 1
+        logger.error(f"Error parsing page {context}: {error}")
+        return None
+
+    def _deliver(self, context, result):
+        self.pages_parsed += 1
+        try:
+            self.on_result(context, result)
+        except Exception as e:
+            logger.error(f"Error handling parsed page {context}: {e}")
+        finally:
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    def close(self):
+        """Parse everything queued, deliver the results, then stop the workers."""
+        if self._feeder.is_alive():
+            self._queue.put(_STOP)
+            self._feeder.join()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            elapsed = time.perf_counter() - self._started
+            logger.info(f"Parse stage: {self.pages_parsed} pages parsed ({self.parse_errors} errors) in {elapsed:.2f}s")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def reparse_files(paths, kind, workers=DEFAULT_WORKERS, site_url=SITE_URL):
+    """Yield (path, rows) for saved pages, parsed in a process pool. rows is a list of dicts."""
+    with ProcessPoolExecutor(max_workers=workers or 1) as executor:
+        for path, result in executor.map(partial(parse_file, kind, site_url=site_url), paths, chunksize=16):
+            if result is None:
+                yield path, []
+            else:
+                yield path, result if isinstance(result, list) else [result]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Re-parse saved pages without any network access.")
+    parser.add_argument('paths', nargs='+', help="saved .html pages")
+    parser.add_argument('--kind', choices=['listing', 'detail'], default='detail')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--site-url', default=SITE_URL)
+    parser.add_argument('--output', default=None, help=".csv or .parquet file for the parsed rows")
+    args = parser.parse_args()
+
+    columns = ['source'] + (LISTING_COLUMNS if args.kind == 'listing' else DETAIL_COLUMNS)
+    sink = open_sink(args.output, columns) if args.output else None
+    start = time.perf_counter()
+    pages = rows = 0
+    try:
+        for path, parsed in reparse_files(args.paths, args.kind, args.workers, args.site_url):
+            pages += 1
+            rows += len(parsed)
+            for row in parsed:
+                row['source'] = path
+            if sink is not None:
+                sink.write_batch(parsed)
+    finally:
+        if sink is not None:
+            sink.close()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Re-parsed {pages} pages into {rows} rows in {elapsed:.2f}s ({pages / elapsed:.1f} pages/s)")
+
+
+if __name__ == "__main__":
+    main()
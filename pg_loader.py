@@ -0,0 +1,139 @@
+"""Bulk loader for the staging tables.
+
+One pooled SQLAlchemy engine per database URL, and a `CopyLoader` that buffers
+scraped rows and streams them into PostgreSQL with `COPY ... FROM STDIN`
+(psycopg2 `copy_expert`) once `batch_size` rows are waiting or `flush_interval`
+seconds have passed since the last flush.
+"""
+import csv
+import io
+import logging
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+DEFAULT_BATCH_SIZE = 500  # Rows per COPY
+DEFAULT_FLUSH_INTERVAL = 10  # Max seconds rows wait in the buffer
+POOL_SIZE = 5
+MAX_OVERFLOW = 5
+COPY_NULL = r'\N'
+
+logger = logging.getLogger(__name__)
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def postgres_url(user, password, host, port, database):
+    return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}"
+
+
+def get_engine(url):
+    """Return the process-wide pooled engine for `url`, creating it on first use."""
+    with _engines_lock:
+        if url not in _engines:
+            _engines[url] = create_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_pre_ping=True)
+        return _engines[url]
+
+
+def _copy_value(value):
+    return COPY_NULL if value is None else value
+
+
+class CopyLoader:
+    """Buffer rows (dicts) and COPY them into `table_name` in batches.
+
+    `on_flush(rows)` is called after each successful flush, e.g. to record
+    what has been stored; pass a list to call several. Engines for other databases (SQLite in the offline
+    benchmarks) fall back to a plain pandas insert.
+    """
+
+    def __init__(self, engine, table_name, columns, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, on_flush=None):
+        self.engine = engine
+        self.table_name = table_name
+        self.columns = columns
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if on_flush is None:
+            on_flush = []
+        self.on_flush = list(on_flush) if isinstance(on_flush, (list, tuple)) else [on_flush]
+        self.rows_loaded = 0
+        self.flushes = 0
+        self.failed_rows = 0
+        self.load_time = 0.0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._copy_sql = (f"COPY {table_name} ({', '.join(columns)}) FROM STDIN "
+                          f"WITH (FORMAT csv, NULL '{COPY_NULL}')")
+
+    def add(self, rows):
+        """Queue rows; flushes when the batch is full or the flush interval has passed."""
+        with self._lock:
+            self._buffer.extend(rows)
+            due = (len(self._buffer) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush_if_due(self):
+        """Flush buffered rows that have waited longer than the flush interval."""
+        with self._lock:
+            due = self._buffer and time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not rows:
+            return True
+        start = time.perf_counter()
+        try:
+            if self.engine.dialect.name == 'postgresql':
+                self._copy(rows)
+            else:
+                pd.DataFrame(rows, columns=self.columns).to_sql(self.table_name, self.engine,
+                                                                if_exists='append', index=False)
+        except Exception as e:
+            self.failed_rows += len(rows)
+            logger.error(f"Error loading {len(rows)} rows into {self.table_name}: {e}")
+            return False
+        self.load_time += time.perf_counter() - start
+        self.rows_loaded += len(rows)
+        self.flushes += 1
+        logger.info(f"Loaded batch of {len(rows)} rows into {self.table_name}")
+        for callback in self.on_flush:
+            callback(rows)
+        return True
+
+    def _copy(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(row.get(column)) for column in self.columns])
+        buffer.seek(0)
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(self._copy_sql, buffer)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    def close(self):
+        self.flush()
+        logger.info(f"{self.table_name}: loaded {self.rows_loaded} rows in {self.flushes} batches "
+                    f"({self.load_time:.2f}s), {self.failed_rows} rows failed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,109 @@
+"""Vectorized parsing of scraped price, percent and count strings.
+
+Turns whole columns of strings such as "Rp28.400", "Rp 31.200", "4%", "4,8",
+"2,8 rb" or "1,2 jt" into floats with pyarrow.compute kernels, so no Python
+code runs per value. Scraped columns repeat a small set of strings, so only
+the distinct values are parsed and the results are broadcast back:
+
+* "Rp" / "Rp." prefixes, "%" and "Terjual" are dropped; "4%" becomes 4.0.
+* A leading "-" is dropped, like ltrim(discount, '-') in
+  klikindomaret-database-ref.py: sites show discounts as "-4%" and the
+  pipeline stores them as positive percentages. Scraped values are never
+  negative.
+* A trailing "+" ("10rb+", "250+") is dropped; the value is the lower bound.
+* "." followed by three digits is a thousands separator, "," a decimal comma.
+* "rb"/"ribu"/"k" multiply by 1 000, "jt"/"juta" by 1 000 000.
+
+Numbers already in a column (ints or floats among the strings of an object
+column) are kept as they are. Anything else (empty strings, None,
+unparseable text) becomes NaN/null.
+
+It is used where scraped strings are turned into numbers in pandas, i.e.
+blibli.py's CSV export. The klikindomaret scrapers (klikindomaret-database.py,
+scrape.py, tokopedia.py) never do that: their staging tables and raw files
+keep the scraped strings, and cleansing_klikindomart.py casts the
+"Rp 28.400" / "4%" forms the ref step writes inside PostgreSQL, so pulling
+them through pandas would only undo the server-side cleansing.
+"""
+import numbers
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+SUFFIX_MULTIPLIERS = {'rb': 1e3, 'ribu': 1e3, 'k': 1e3, 'jt': 1e6, 'juta': 1e6}
+NOISE = ['terjual', '%', ' ', '\xa0', '\t', '\n']  # Removed before the number is parsed
+SIGNS = '-+'  # Stripped from the start ("-4%") and the end ("10rb+") of a value
+CURRENCY_PATTERN = r'^rp\.?'  # "Rp28.400", "Rp. 5.000"; the dot after "Rp" is not part of the number
+THOUSANDS_PATTERN = r'^[0-9]{1,3}(\.[0-9]{3})+$'
+NUMBER_PATTERN = r'^(?P<number>[0-9][0-9.,]*)(?P<suffix>' + '|'.join(SUFFIX_MULTIPLIERS) + r')?$'
+
+
+def _to_arrow(values):
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if isinstance(values, pa.Array):
+        return values if pa.types.is_string(values.type) else values.cast(pa.string())
+    return pa.array(values, type=pa.string(), from_pandas=True)
+
+
+def _parse_strings(strings):
+    text = pc.utf8_lower(strings)
+    for noise in NOISE:
+        text = pc.replace_substring(text, noise, '')
+    # A sign may come before the currency ("-Rp4") or after it ("Rp-4")
+    text = pc.utf8_trim(text, SIGNS)
+    text = pc.utf8_trim(pc.replace_substring_regex(text, CURRENCY_PATTERN, ''), SIGNS)
+    parts = pc.extract_regex(text, NUMBER_PATTERN)
+    number = pc.struct_field(parts, 'number')
+    suffix = pc.struct_field(parts, 'suffix')
+
+    # Dots are thousands separators when there is a decimal comma ("1.234,5") or
+    # they group digits in threes ("28.400"); otherwise a dot is a decimal point ("4.8")
+    thousands = pc.or_(pc.match_substring(number, ','), pc.match_substring_regex(number, THOUSANDS_PATTERN))
+    number = pc.if_else(thousands, pc.replace_substring(number, '.', ''), number)
+    number = pc.replace_substring(number, ',', '.')
+    valid = pc.match_substring_regex(number, r'^[0-9]+(\.[0-9]+)?$')
+    number = pc.cast(pc.if_else(valid, number, pa.scalar(None, pa.string())), pa.float64())
+
+    multiplier = pa.array(np.ones(len(suffix)), pa.float64())
+    for name, factor in SUFFIX_MULTIPLIERS.items():
+        multiplier = pc.if_else(pc.equal(suffix, name), factor, multiplier)
+    return pc.multiply(number, multiplier)
+
+
+def parse_numbers(values):
+    """Parse a pyarrow array or list of strings into a float64 pyarrow array (null when unparseable)."""
+    encoded = pc.dictionary_encode(_to_arrow(values))
+    return pc.take(_parse_strings(encoded.dictionary), encoded.indices)
+
+
+def to_number(values):
+    """Parse a column of strings into floats: a float64 Series (NaN when unparseable) for pandas input."""
+    if not isinstance(values, pd.Series):
+        return parse_numbers(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    codes, uniques = pd.factorize(values)
+    try:
+        strings = _to_arrow(uniques)
+        numeric = None
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed column: strings are parsed, numbers taken as they are, anything else is unparseable
+        strings = _to_arrow([u if isinstance(u, str) else None for u in uniques])
+        numeric = [i for i, u in enumerate(uniques) if isinstance(u, numbers.Real) and not isinstance(u, bool)]
+    # One extra NaN slot for missing values (code -1)
+    lookup = np.append(_parse_strings(strings).to_numpy(zero_copy_only=False), np.nan)
+    if numeric:
+        lookup[numeric] = [float(uniques[i]) for i in numeric]
+    return pd.Series(lookup[codes], index=values.index, name=values.name)
+
+
+def normalize_columns(df, columns):
+    """Return a copy of df with the given string columns parsed into floats."""
+    df = df.copy()
+    for column in columns:
+        if column in df:
+            df[column] = to_number(df[column])
+    return df
@@ -0,0 +1,191 @@
+"""Fast klikindomaret and blibli page parsing.
+
+Pages are parsed with the lxml backend and a SoupStrainer, so only the nodes
+the scrapers read are turned into a tree (product cards and their links on
+listing pages; price spans, breadcrumb and description on product pages).
+All fields of a card or product page are then collected in a single walk over
+that small tree. Results are identical to the scrapers' previous `html.parser`
+based helpers, which benchmarks/bench_parser.py keeps as its reference.
+Blibli search pages are read the same way from one page source, instead of
+WebDriver calls per card field.
+"""
+import logging
+import re
+from datetime import datetime
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+SITE_URL = "https://www.klikindomaret.com"
+BLIBLI_SITE_URL = "https://www.blibli.com"
+PARSER = 'lxml'
+DETAIL_SPAN_CLASSES = {'discount', 'disc-price', 'price-final', 'typesend-title'}
+BLIBLI_FIELD_CLASSES = {
+    'blu-product__name': 'name',
+    'blu-product__price-after': 'price_after',
+    'blu-product__price-before': 'price_before',
+    'blu-product__price-discount': 'discount',
+    'blu-product__rating-wrapper': 'rating',
+    'blu-product__sold': 'sold_count',
+    'blu-product__location-text': 'store_location',
+}
+BLIBLI_SKU_PATTERN = re.compile(r'/is--([^/?#]+)')  # /p/<slug>/is--<sku>?...
+
+logger = logging.getLogger(__name__)
+
+
+def _classes(attrs):
+    value = attrs.get('class') or []
+    return value.split() if isinstance(value, str) else value
+
+
+def _is_listing_node(name, attrs):
+    # Product cards and the links that wrap them
+    return (name == 'a' and attrs.get('href') is not None) or 'each-item' in _classes(attrs)
+
+
+def _is_detail_node(name, attrs):
+    if name == 'span':
+        return attrs.get('id') == 'desc-product' or bool(DETAIL_SPAN_CLASSES.intersection(_classes(attrs)))
+    return name == 'div' and 'breadcrumb' in _classes(attrs)
+
+
+def _is_blibli_card(name, attrs):
+    return 'product__card' in _classes(attrs)
+
+
+def _is_blibli_card_tag(tag):
+    return _is_blibli_card(tag.name, tag.attrs)
+
+
+LISTING_STRAINER = SoupStrainer(_is_listing_node)
+DETAIL_STRAINER = SoupStrainer(_is_detail_node)
+BLIBLI_LISTING_STRAINER = SoupStrainer(_is_blibli_card)
+
+
+def _has_class(tag, class_name):
+    # Same rule as BeautifulSoup's class_ filter: one of the classes, or the full class string
+    classes = tag.get('class') or []
+    return class_name in classes or ' '.join(classes) == class_name
+
+
+def _price_text(tag):
+    return f"Rp {tag.text.strip().split('Rp')[-1].strip()}"
+
+
+def parse_listing(html, site_url=SITE_URL):
+    """Return the product cards of a listing page as dicts (name, link, plu, card_price, createdate)."""
+    soup = BeautifulSoup(html, PARSER, parse_only=LISTING_STRAINER)
+    product_details = []
+
+    for product in soup.find_all('div', class_='each-item'):
+        try:
+            name = plu = card_price = None
+            for tag in product.find_all(True):
+                if name is None and tag.name == 'div' and _has_class(tag, 'title'):
+                    name = tag.text.strip()
+                if plu is None and tag.name == 'div' and _has_class(tag, 'wrp-media'):
+                    plu = tag.get('data-plu', '')
+                if card_price is None and tag.name == 'span' and _has_class(tag, 'price-value'):
+                    card_price = _price_text(tag)
+            link_tag = product.find_parent('a', href=True)
+
+            product_details.append({
+                'name': name or '',
+                'link': f"{site_url}{link_tag['href']}" if link_tag else '',
+                'plu': plu or '',
+                'card_price': card_price or '',
+                'createdate': datetime.now()
+            })
+        except Exception as e:
+            logger.error(f"Error parsing product details: {e}")
+
+    return product_details
+
+
+def _extract_detail(html):
+    soup = BeautifulSoup(html, PARSER, parse_only=DETAIL_STRAINER)
+    found = {}
+    for tag in soup.find_all(['span', 'div']):
+        if tag.name == 'div':
+            if 'breadcrumb' not in found and _has_class(tag, 'breadcrumb'):
+                found['breadcrumb'] = tag
+            continue
+        if 'discount' not in found and _has_class(tag, 'discount'):
+            found['discount'] = tag
+        if 'original_price' not in found and _has_class(tag, 'strikeout disc-price'):
+            found['original_price'] = tag
+        if 'discounted_price' not in found and _has_class(tag, 'normal price-final'):
+            found['discounted_price'] = tag
+        if 'description' not in found and tag.get('id') == 'desc-product':
+            found['description'] = tag
+        if 'store_info' not in found and _has_class(tag, 'typesend-title'):
+            found['store_info'] = tag
+        if 'price_final' not in found and _has_class(tag, 'price-final'):
+            found['price_final'] = tag
+
+    fields = {
+        'discount': found['discount'].text.strip() if 'discount' in found else '',
+        'original_price': _price_text(found['original_price']) if 'original_price' in found else '',
+        'discounted_price': found['discounted_price'].text.strip() if 'discounted_price' in found else '',
+        'description': found['description'].text.strip() if 'description' in found else '',
+        'store_info': found['store_info'].text.strip() if 'store_info' in found else '',
+        'category': found['breadcrumb'].find_all('a')[-1].text.strip() if 'breadcrumb' in found else ''
+    }
+    complete = {'price_final', 'description', 'breadcrumb'} <= found.keys()
+    return fields, complete
+
+
+def parse_detail(html):
+    """Return the fields read from a product page (discount, prices, description, store_info, category)."""
+    return _extract_detail(html)[0]
+
+
+def parse_detail_if_complete(html):
+    """Like parse_detail, but None when the price, description or breadcrumb is missing."""
+    fields, complete = _extract_detail(html)
+    return fields if complete else None
+
+
+def _nth_span_text(tag, index):
+    spans = tag.find_all('span')
+    return spans[index].text.strip() if len(spans) > index else ''
+
+
+def parse_blibli_listing(html, site_url=BLIBLI_SITE_URL):
+    """Return the product cards of a blibli search page as dicts (name, link, sku, prices, discount,
+    rating, sold_count, store_location, createdate). Prices and counts are kept as shown, e.g. "Rp28.400"."""
+    soup = BeautifulSoup(html, PARSER, parse_only=BLIBLI_LISTING_STRAINER)
+    createdate = datetime.now()
+    product_details = []
+
+    for card in soup.find_all(_is_blibli_card_tag):
+        try:
+            found = {}
+            link = None
+            for tag in card.find_all(True):
+                if link is None and tag.name == 'a' and tag.get('href'):
+                    link = tag['href']
+                for class_name in tag.get('class') or []:
+                    field = BLIBLI_FIELD_CLASSES.get(class_name)
+                    if field and field not in found:
+                        found[field] = tag
+            if link and link.startswith('/'):
+                link = f"{site_url}{link}"
+            sku = BLIBLI_SKU_PATTERN.search(link or '')
+
+            product_details.append({
+                'name': found['name'].text.strip() if 'name' in found else '',
+                'link': link or '',
+                'sku': sku.group(1) if sku else '',
+                'price_after': found['price_after'].text.strip() if 'price_after' in found else '',
+                'price_before': found['price_before'].text.strip() if 'price_before' in found else None,
+                'discount': found['discount'].text.strip() if 'discount' in found else None,
+                'rating': _nth_span_text(found['rating'], 0) if 'rating' in found else '',
+                'sold_count': found['sold_count'].text.replace('Terjual', '').strip() if 'sold_count' in found else '',
+                'store_location': _nth_span_text(found['store_location'], 1) if 'store_location' in found else '',
+                'createdate': createdate
+            })
+        except Exception as e:
+            logger.error(f"Error parsing product details: {e}")
+
+    return product_details
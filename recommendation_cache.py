@@ -0,0 +1,183 @@
+"""In-process copy of the price recommendations for the API, refreshed when model.py publishes a new run.
+
+model.save_recommendations_to_db bumps a per-table version in RUN_TABLE_NAME
+in the same transaction as its upsert. RecommendationCache loads the whole
+table once into a compact snapshot: rows in productmasterid order,
+categorical category and date columns, a hash index on productmasterid and
+row positions per category. After that it only polls the version (every
+CHECK_INTERVAL seconds, from api_2.py's background task) and reloads when it
+changes, or when the snapshot is older than an optional TTL. Version and rows
+are read from one REPEATABLE READ snapshot, so a run is never half-loaded.
+
+A table larger than `max_bytes` is not cached: lookups report a miss and the
+API queries PostgreSQL as before.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+RUN_TABLE_NAME = 'recommendation_run'
+CHECK_INTERVAL = 5  # Seconds between version checks
+DEFAULT_TTL = None  # Seconds after which a snapshot is reloaded even if the version did not change (None = never)
+MAX_CACHE_BYTES = 512 * 2 ** 20  # Larger recommendation sets are served from PostgreSQL
+LOAD_CHUNK_SIZE = 50_000  # Rows per fetch while loading, so an oversized table is abandoned early
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_run_table(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RUN_TABLE_NAME} (
+            table_name VARCHAR PRIMARY KEY,
+            version BIGINT NOT NULL,
+            rows BIGINT,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        )""")
+
+
+def bump_run_version(cursor, table_name, rows):
+    """Record a new run of `table_name`; call inside the transaction that wrote it."""
+    ensure_run_table(cursor)
+    cursor.execute(f"""
+        INSERT INTO {RUN_TABLE_NAME} (table_name, version, rows, updated_at) VALUES (%s, 1, %s, now())
+        ON CONFLICT (table_name) DO UPDATE SET
+            version = {RUN_TABLE_NAME}.version + 1, rows = excluded.rows, updated_at = excluded.updated_at
+        """, (table_name, rows))
+
+
+class Snapshot:
+    """One loaded recommendation set; never modified after construction, so readers need no lock."""
+
+    def __init__(self, version, frame):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.frame = frame
+        self.index = pd.Index(frame['productmasterid'])
+        codes = frame['category'].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(frame['category'].cat.categories) + 1))
+        self.by_category = {category: order[bounds[i]:bounds[i + 1]]
+                            for i, category in enumerate(frame['category'].cat.categories)}
+        self.nbytes = int(frame.memory_usage(deep=True).sum() + self.index.memory_usage(deep=True)
+                          + sum(positions.nbytes for positions in self.by_category.values()))
+
+    def records(self, positions):
+        return self.frame.iloc[positions].to_dict('records')
+
+    def page(self, skip, limit):
+        return self.records(slice(skip, skip + limit))
+
+    def category_page(self, category, skip, limit):
+        positions = self.by_category.get(category)
+        return [] if positions is None else self.records(positions[skip:skip + limit])
+
+    def product(self, productmasterid):
+        """The product's recommendation as a one-record list, like the database path; [] when unknown."""
+        try:
+            position = self.index.get_loc(productmasterid)
+        except KeyError:
+            return []
+        return self.records([position])
+
+
+class RecommendationCache:
+    """Recommendations of one table served from memory; a lookup returns None on a miss (not cached)."""
+
+    def __init__(self, engine, table_name, ttl=DEFAULT_TTL, max_bytes=MAX_CACHE_BYTES):
+        self.engine = engine
+        self.table_name = table_name
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.snapshot = None
+        self._version = None  # Last version seen, also when its rows did not fit
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.oversized = 0
+
+    def _current_version(self, connection):
+        exists = connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': RUN_TABLE_NAME}).scalar()
+        if not exists:
+            return 0
+        version = connection.execute(text(f"SELECT version FROM {RUN_TABLE_NAME} WHERE table_name = :table"),
+                                     {'table': self.table_name}).scalar()
+        return version or 0
+
+    def _stale(self, version):
+        if version != self._version:
+            return True
+        snapshot = self.snapshot
+        return (snapshot is not None and self.ttl is not None
+                and time.monotonic() - snapshot.loaded_at > self.ttl)
+
+    def _load(self, connection, version):
+        chunks = []
+        size = 0
+        query = (f"SELECT productmasterid, category, price, date FROM {self.table_name} "
+                 f"ORDER BY productmasterid")
+        for chunk in pd.read_sql(text(query), connection, chunksize=LOAD_CHUNK_SIZE):
+            chunk = chunk.astype({'category': 'category', 'date': 'category'})
+            size += int(chunk.memory_usage(deep=True).sum())
+            if size > self.max_bytes:
+                return None
+            chunks.append(chunk)
+        if not chunks:
+            frame = pd.DataFrame({'productmasterid': pd.Series(dtype=object), 'category': pd.Categorical([]),
+                                  'price': pd.Series(dtype='float64'), 'date': pd.Categorical([])})
+        else:
+            frame = pd.concat([chunk.drop(columns=['category', 'date']) for chunk in chunks], ignore_index=True)
+            frame['category'] = pd.api.types.union_categoricals([chunk['category'] for chunk in chunks])
+            frame['date'] = pd.api.types.union_categoricals([chunk['date'] for chunk in chunks])
+            frame = frame[chunks[0].columns]
+        snapshot = Snapshot(version, frame)
+        return snapshot if snapshot.nbytes <= self.max_bytes else None
+
+    def refresh(self, force=False):
+        """Reload when the run version changed or the TTL expired; returns True when a new snapshot was loaded."""
+        with self._refresh_lock:
+            with self.engine.connect().execution_options(isolation_level='REPEATABLE READ',
+                                                         stream_results=True) as connection:
+                with connection.begin():
+                    version = self._current_version(connection)
+                    if not force and not self._stale(version):
+                        return False
+                    start = time.perf_counter()
+                    snapshot = self._load(connection, version)
+            self._version = version
+            self.snapshot = snapshot
+            with self._stats_lock:
+                self.refreshes += 1
+                self.oversized += snapshot is None
+            if snapshot is None:
+                logger.warning(f"{self.table_name} version {version} exceeds {self.max_bytes / 2 ** 20:.0f} MiB; "
+                               f"serving it from the database")
+            else:
+                logger.info(f"Cached {len(snapshot.frame)} recommendations of {self.table_name} version {version} "
+                            f"({snapshot.nbytes / 2 ** 20:.1f} MiB) in {time.perf_counter() - start:.2f}s")
+            return snapshot is not None
+
+    def lookup(self, method, *args):
+        """Call `method` on the current snapshot, counting a hit; None (a miss) when nothing is cached."""
+        snapshot = self.snapshot
+        with self._stats_lock:
+            if snapshot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return getattr(snapshot, method)(*args)
+
+    def stats(self):
+        snapshot = self.snapshot
+        lookups = self.hits + self.misses
+        return {'version': self._version, 'cached': snapshot is not None,
+                'rows': 0 if snapshot is None else len(snapshot.frame),
+                'bytes': 0 if snapshot is None else snapshot.nbytes,
+                'age_seconds': None if snapshot is None else time.monotonic() - snapshot.loaded_at,
+                'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'refreshes': self.refreshes, 'oversized': self.oversized}
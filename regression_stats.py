@@ -0,0 +1,270 @@
+"""Per-category linear regression from sufficient statistics kept in PostgreSQL.
+
+model.py's models have one feature, so each category's fit is fully described
+by n, Σx, Σy, Σxy and Σx² of its training rows (x = originalprice, y = price);
+Σy² on the holdout rows adds the holdout MSE. The sums live in STATS_TABLE as
+exact NUMERICs, one row per (category, holdout):
+
+* Statement-level triggers on the product table append the productmasterid of
+  every inserted, updated or deleted row to CHANGES_TABLE. They see every
+  write, whatever it does to createdate, which the incremental cleansing merge
+  can move backwards.
+* update_stats() takes those ids, compares the product rows with a ledger of
+  the values already counted (ROWS_TABLE) and applies only the differences:
+  new products are added, changed ones are swapped for their new values, and
+  products that were deleted or lost their category, price or original price
+  are subtracted. The whole table is only diffed with verify=True, after a
+  TRUNCATE, or when the triggers are missing because the table was replaced
+  (cleansing's full rebuild swaps in a new one).
+* coefficients() solves every category with at least two training rows and
+  varying x in one O(categories) query:
+  coef = (nΣxy − ΣxΣy) / (nΣx² − (Σx)²), intercept = (Σy − coef·Σx) / n, and
+  the holdout MSE = Σ(y − intercept − coef·x)² / n expanded over the sums.
+
+Rows are split deterministically: a product is in the holdout (20%, like
+evaluate_model's test_size) when the first 28 bits of md5(productmasterid) are
+divisible by 5. Products without a category, price or original price are left
+out, as the pandas path cannot fit them either. The statistics follow one
+product table.
+"""
+import hashlib
+import logging
+import time
+
+from sqlalchemy import text
+
+STATS_TABLE = 'category_regression_stats'
+ROWS_TABLE = 'category_regression_rows'
+CHANGES_TABLE = 'category_regression_changes'
+TRACK_FUNCTION = 'category_regression_track'
+# Transition tables the triggers read; each event needs its own trigger to declare them
+TRACKED_EVENTS = {'INSERT': 'REFERENCING NEW TABLE AS new_rows',
+                  'UPDATE': 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+                  'DELETE': 'REFERENCING OLD TABLE AS old_rows',
+                  'TRUNCATE': ''}
+HOLDOUT_MODULUS = 5  # 1 in 5 products is held out
+HOLDOUT_SQL = f"(('x' || left(md5(productmasterid), 7))::bit(28)::int % {HOLDOUT_MODULUS} = 0)"
+
+logger = logging.getLogger(__name__)
+
+
+def is_holdout(productmasterid):
+    """Python twin of HOLDOUT_SQL."""
+    return int(hashlib.md5(str(productmasterid).encode('utf-8')).hexdigest()[:7], 16) % HOLDOUT_MODULUS == 0
+
+
+def ensure_schema(connection):
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            category TEXT NOT NULL,
+            holdout BOOLEAN NOT NULL,
+            n BIGINT NOT NULL,
+            sum_x NUMERIC NOT NULL,
+            sum_y NUMERIC NOT NULL,
+            sum_xy NUMERIC NOT NULL,
+            sum_xx NUMERIC NOT NULL,
+            sum_yy NUMERIC NOT NULL,
+            PRIMARY KEY (category, holdout)
+        )"""))
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ROWS_TABLE} (
+            productmasterid VARCHAR PRIMARY KEY,
+            category TEXT NOT NULL,
+            x DOUBLE PRECISION NOT NULL,
+            y DOUBLE PRECISION NOT NULL
+        )"""))
+    # Append-only, no index, so the triggers add little to each write; NULL stands for a TRUNCATE
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (productmasterid VARCHAR)"))
+
+
+def _tracked(connection, table_name):
+    installed = connection.execute(text(
+        "SELECT COUNT(*) FROM pg_trigger WHERE tgrelid = CAST(:table AS regclass) AND tgname = ANY(:names)"),
+        {'table': table_name, 'names': [_trigger_name(table_name, event) for event in TRACKED_EVENTS]}).scalar()
+    return installed == len(TRACKED_EVENTS)
+
+
+def _trigger_name(table_name, event):
+    return f"{table_name}_regression_{event.lower()}"
+
+
+def install_tracking(connection, table_name):
+    """Create the change-tracking triggers on `table_name`, replacing any from an earlier version."""
+    connection.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {TRACK_FUNCTION}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                INSERT INTO {CHANGES_TABLE} VALUES (NULL);
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO {CHANGES_TABLE} SELECT productmasterid FROM old_rows;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {CHANGES_TABLE} SELECT productmasterid FROM new_rows;
+            END IF;
+            RETURN NULL;
+        END $$"""))
+    for event, transition in TRACKED_EVENTS.items():
+        trigger = _trigger_name(table_name, event)
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table_name}"))
+        connection.execute(text(f"CREATE TRIGGER {trigger} AFTER {event} ON {table_name} {transition} "
+                                f"FOR EACH STATEMENT EXECUTE FUNCTION {TRACK_FUNCTION}()"))
+
+
+def _source_rows(table_name, changed=None):
+    # One row per product, as in the ledger; `changed` restricts it to the ids in that table
+    restrict = f"AND productmasterid IN (SELECT productmasterid FROM {changed}) " if changed else ""
+    return (f"SELECT DISTINCT ON (productmasterid) productmasterid, category, originalprice AS x, price AS y "
+            f"FROM {table_name} "
+            f"WHERE category IS NOT NULL AND originalprice IS NOT NULL AND price IS NOT NULL "
+            f"AND productmasterid IS NOT NULL {restrict}ORDER BY productmasterid")
+
+
+def _sums(sign='1'):
+    return (f"SUM({sign}), SUM({sign} * x::numeric), SUM({sign} * y::numeric), SUM({sign} * x::numeric * y::numeric), "
+            f"SUM({sign} * x::numeric * x::numeric), SUM({sign} * y::numeric * y::numeric)")
+
+
+def rebuild_stats(connection, table_name):
+    """Recompute the ledger and the sums from the whole table; returns the rows counted."""
+    connection.execute(text(f"TRUNCATE {STATS_TABLE}, {ROWS_TABLE}"))
+    counted = connection.execute(text(f"""
+        INSERT INTO {ROWS_TABLE} (productmasterid, category, x, y) {_source_rows(table_name)}
+        """)).rowcount
+    connection.execute(text(f"""
+        INSERT INTO {STATS_TABLE} (category, holdout, n, sum_x, sum_y, sum_xy, sum_xx, sum_yy)
+        SELECT category, {HOLDOUT_SQL}, {_sums()} FROM {ROWS_TABLE} GROUP BY 1, 2
+        """))
+    return counted
+
+
+def _apply_differences(connection, table_name, changed=None):
+    """Apply the products whose (category, x, y) differ between the ledger and the table; returns their count.
+
+    `changed` names a table of productmasterids to compare; without it every product is.
+    """
+    counted_rows = (f"(SELECT * FROM {ROWS_TABLE} WHERE productmasterid IN (SELECT productmasterid FROM {changed}))"
+                    if changed else ROWS_TABLE)
+    # A side is NULL when the product is new to the ledger or gone from the table
+    connection.execute(text(f"""
+        CREATE TEMP TABLE regression_delta ON COMMIT DROP AS
+        SELECT COALESCE(source.productmasterid, counted.productmasterid) AS productmasterid,
+               source.category, source.x, source.y,
+               counted.category AS old_category, counted.x AS old_x, counted.y AS old_y
+        FROM ({_source_rows(table_name, changed)}) source
+        FULL JOIN {counted_rows} counted ON counted.productmasterid = source.productmasterid
+        WHERE (counted.category, counted.x, counted.y) IS DISTINCT FROM (source.category, source.x, source.y)
+        """))
+    applied = connection.execute(text("SELECT COUNT(*) FROM regression_delta")).scalar()
+    if not applied:
+        return 0
+    connection.execute(text(f"""
+        INSERT INTO {STATS_TABLE} (category, holdout, n, sum_x, sum_y, sum_xy, sum_xx, sum_yy)
+        SELECT category, {HOLDOUT_SQL}, {_sums('sign')}
+        FROM (SELECT productmasterid, category, x, y, 1 AS sign FROM regression_delta
+              WHERE category IS NOT NULL
+              UNION ALL
+              SELECT productmasterid, old_category, old_x, old_y, -1 FROM regression_delta
+              WHERE old_category IS NOT NULL) deltas
+        GROUP BY 1, 2
+        ON CONFLICT (category, holdout) DO UPDATE SET
+            n = {STATS_TABLE}.n + excluded.n,
+            sum_x = {STATS_TABLE}.sum_x + excluded.sum_x,
+            sum_y = {STATS_TABLE}.sum_y + excluded.sum_y,
+            sum_xy = {STATS_TABLE}.sum_xy + excluded.sum_xy,
+            sum_xx = {STATS_TABLE}.sum_xx + excluded.sum_xx,
+            sum_yy = {STATS_TABLE}.sum_yy + excluded.sum_yy
+        """))
+    # Categories whose last row was removed
+    connection.execute(text(f"DELETE FROM {STATS_TABLE} WHERE n = 0"))
+    connection.execute(text(f"""
+        DELETE FROM {ROWS_TABLE} counted USING regression_delta delta
+        WHERE counted.productmasterid = delta.productmasterid AND delta.category IS NULL
+        """))
+    connection.execute(text(f"""
+        INSERT INTO {ROWS_TABLE} (productmasterid, category, x, y)
+        SELECT productmasterid, category, x, y FROM regression_delta WHERE category IS NOT NULL
+        ON CONFLICT (productmasterid) DO UPDATE SET category = excluded.category, x = excluded.x, y = excluded.y
+        """))
+    return applied
+
+
+def update_stats(engine, table_name, incremental=True, verify=False):
+    """Apply the product rows added, changed or removed since the last run to the sums.
+
+    Only the products logged by the triggers are compared with the ledger.
+    verify=True compares the whole table instead, which also repairs sums
+    that drifted through writes made while the triggers were dropped. The
+    first run (empty ledger) or incremental=False rebuilds. Returns
+    (rows applied, elapsed seconds).
+    """
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        ensure_schema(connection)
+        # One update at a time; a concurrent run would apply the same differences twice
+        connection.execute(text(f"LOCK TABLE {ROWS_TABLE} IN EXCLUSIVE MODE"))
+        tracked = _tracked(connection, table_name)
+        if not tracked:
+            # Writes wait for this transaction from here on, so none go unlogged
+            install_tracking(connection, table_name)
+        counted = connection.execute(text(f"SELECT EXISTS (SELECT 1 FROM {ROWS_TABLE})")).scalar()
+        if not counted or not incremental:
+            connection.execute(text(f"LOCK TABLE {table_name} IN SHARE MODE"))
+            connection.execute(text(f"DELETE FROM {CHANGES_TABLE}"))
+            applied = rebuild_stats(connection, table_name)
+            logger.info(f"Rebuilt regression statistics from {applied} rows of {table_name}")
+            return applied, time.perf_counter() - start
+
+        # Take the logged ids; ids logged by writes still in flight stay for the next run
+        connection.execute(text("CREATE TEMP TABLE regression_changed (productmasterid VARCHAR) ON COMMIT DROP"))
+        connection.execute(text(f"""
+            WITH consumed AS (DELETE FROM {CHANGES_TABLE} RETURNING productmasterid)
+            INSERT INTO regression_changed SELECT DISTINCT productmasterid FROM consumed
+            """))
+        truncated = connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM regression_changed WHERE productmasterid IS NULL)")).scalar()
+        if verify or not tracked or truncated:
+            # No writes while the whole table is compared, so the log can be emptied with it
+            connection.execute(text(f"LOCK TABLE {table_name} IN SHARE MODE"))
+            connection.execute(text(f"DELETE FROM {CHANGES_TABLE}"))
+            applied = _apply_differences(connection, table_name)
+            scope = 'all'
+        else:
+            connection.execute(text("ANALYZE regression_changed"))
+            applied = _apply_differences(connection, table_name, 'regression_changed')
+            scope = 'logged'
+    elapsed = time.perf_counter() - start
+    logger.info(f"Applied {applied} added, changed or removed rows of {table_name} "
+                f"(compared {scope} products) in {elapsed:.2f}s")
+    return applied, elapsed
+
+
+def coefficients(engine):
+    """Return [(category, coef, intercept, train_n, holdout_mse)] solved from the sums, one row per trainable category.
+
+    Like fit_category, which skips categories with one row or less, a category
+    needs at least two training rows; their x must also vary, since a slope
+    cannot be solved otherwise. holdout_mse is None when the category has no
+    holdout rows.
+    """
+    query = f"""
+        WITH train AS (
+            SELECT category, n, sum_x, sum_y,
+                   n * sum_xy - sum_x * sum_y AS sxy,
+                   n * sum_xx - sum_x * sum_x AS sxx
+            FROM {STATS_TABLE} WHERE NOT holdout AND n > 1
+        ), fit AS (
+            SELECT category, n, sxy / sxx AS coef, sum_x, sum_y FROM train WHERE sxx <> 0
+        ), solved AS (
+            SELECT category, n, coef, (sum_y - coef * sum_x) / n AS intercept FROM fit
+        )
+        SELECT solved.category, solved.coef::float8, solved.intercept::float8, solved.n,
+               ((h.sum_yy - 2 * solved.intercept * h.sum_y - 2 * solved.coef * h.sum_xy
+                 + h.n * solved.intercept * solved.intercept + 2 * solved.intercept * solved.coef * h.sum_x
+                 + solved.coef * solved.coef * h.sum_xx) / NULLIF(h.n, 0))::float8 AS holdout_mse
+        FROM solved
+        LEFT JOIN {STATS_TABLE} h ON h.category = solved.category AND h.holdout
+        ORDER BY solved.category
+    """
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(text(query))]
@@ -1,51 +1,53 @@
-from fastapi import FastAPI, HTTPException
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from sqlalchemy import create_engine, Table, MetaData, select
-from sqlalchemy.orm import sessionmaker
 
-# Configuration
-DB_CONFIG = {
-    'user': 'admin',
-    'password': 'admin',
-    'host': 'localhost',
-    'port': '5400',
-    'database': 'bfi_test',
-    'recommendation_table': 'pricerecommendation'
-}
+# db_config.py sits in the repo root, one level up
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
 
-# Initialize FastAPI app
-app = FastAPI()
+from db_config import DATABASE_URL, RECOMMENDATION_TABLE_NAME  # Same database and table model.py writes to
+
+# Configuration
+POOL_SIZE = 10  # Connections kept open between requests
+MAX_OVERFLOW = 10  # Extra connections opened under bursts
+POOL_RECYCLE = 1800  # Replace connections older than this
 
 # Database connection
 def get_db_connection():
-    """Create and return a database connection."""
-    db_connection_str = f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-    engine = create_engine(db_connection_str)
-    return engine
+    """Create and return a pooled database engine."""
+    return create_engine(DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                         pool_recycle=POOL_RECYCLE, pool_pre_ping=True)
+
+@asynccontextmanager
+async def lifespan(app):
+    """Create the engine and reflect the price recommendations table once, at startup."""
+    engine = get_db_connection()
+    app.state.engine = engine
+    app.state.price_recommendations = Table(RECOMMENDATION_TABLE_NAME, MetaData(), autoload_with=engine)
+    yield
+    engine.dispose()
 
-# Database engine and session
-engine = get_db_connection()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Metadata object
-metadata = MetaData()
-
-# Define the price recommendations table
-price_recommendations = Table(
-    DB_CONFIG['recommendation_table'], metadata, autoload_with=engine
-)
+# Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/recommendations/{category}")
-async def get_recommendation(category: str):
+def get_recommendation(category: str, request: Request):
     """Get the price recommendation for a given category."""
-    session = SessionLocal()
-    stmt = select(price_recommendations).where(price_recommendations.c.category == category)
-    result = session.execute(stmt).fetchone()
-    session.close()
-    
+    price_recommendations = request.app.state.price_recommendations
+    stmt = select(price_recommendations).where(price_recommendations.c.category == category).limit(1)
+    # The connection goes back to the pool when the block exits, even if the query fails
+    with request.app.state.engine.connect() as connection:
+        result = connection.execute(stmt).fetchone()
+
     if result:
         recommendation = {
             "category": result.category,
-            "recommended_price": result.recommended_price
+            "recommended_price": result.price
         }
         return recommendation
     else:
@@ -53,4 +55,4 @@ async def get_recommendation(category: str):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000, reload=True)
+    uvicorn.run("api:app", host="127.0.0.1", port=8000, reload=True)
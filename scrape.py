@@ -0,0 +1,113 @@
+"""Scrape one or more platforms with the shared scraper engine.
+
+Each platform runs in its own thread with its own browser pool, staging table
+loader and background writer, so a slow site does not hold up the others:
+
+    python scrape.py --platforms klikindomaret blibli --workers 4
+    python scrape.py --platforms klikindomaret --detail-engine browser --max-pages 5
+"""
+import argparse
+import logging
+import os
+import threading
+
+from background_writer import BackgroundWriter
+from driver_pool import MAX_BROWSER_RSS_MB, RECYCLE_AFTER_PAGES
+from page_archive import PageArchive
+from pg_loader import CopyLoader, get_engine, postgres_url
+from scrape_state import ScrapeState
+from scraper_engine import DETAIL_ENGINES, ScrapeEngine, ScrapeStats
+from scraper_platforms import PLATFORMS
+
+DATA_DIR = 'data'
+LOAD_BATCH_SIZE = 500  # Rows per COPY into a staging table
+LOAD_FLUSH_INTERVAL = 10  # Max seconds scraped rows wait before being loaded
+WRITE_QUEUE_SIZE = 100  # Batches queued for each background writer before scraping blocks
+
+logger = logging.getLogger(__name__)
+
+
+def scrape_platform(platform, db_engine, args, archive=None):
+    """Scrape one platform into its staging table and return the engine's metrics."""
+    platform.create_table(db_engine)
+    state = None
+    if args.incremental and platform.incremental:
+        state = ScrapeState(os.path.join(DATA_DIR, f"{platform.name}-scrape-state.sqlite"))
+    stats = ScrapeStats()
+    loader = CopyLoader(db_engine, platform.table_name, platform.columns, LOAD_BATCH_SIZE, LOAD_FLUSH_INTERVAL,
+                        on_flush=[stats.record_stored] + ([state.record] if state is not None else []))
+    writer = BackgroundWriter(loader.add, WRITE_QUEUE_SIZE, tick=loader.flush_if_due,
+                              name=f"{platform.table_name} writer")
+    scraper = ScrapeEngine(platform, writer, workers=args.workers, detail_engine=args.detail_engine,
+                           max_pages=args.max_pages, wait_time=args.wait, parse_workers=args.parse_workers,
+                           http_concurrency=args.http_concurrency, http_rate=args.http_rate, retries=args.retries,
+                           state=state, archive=archive, recycle_after=args.recycle_after, max_rss_mb=args.max_rss_mb,
+                           stats=stats)
+    try:
+        scraper.run()
+    finally:
+        writer.close()
+        loader.close()
+        if state is not None:
+            state.log_summary()
+            state.close()
+    return dict(scraper.stats.summary(), **scraper.pool_stats)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Scrape one or more platforms into their staging tables.")
+    parser.add_argument('--platforms', nargs='+', choices=sorted(PLATFORMS), default=sorted(PLATFORMS))
+    parser.add_argument('--workers', type=int, default=4, help="browsers per platform")
+    parser.add_argument('--detail-engine', choices=DETAIL_ENGINES, default='http')
+    parser.add_argument('--max-pages', type=int, default=2, help="listing pages per platform")
+    parser.add_argument('--wait', type=float, default=10, help="max seconds to wait for a page's content")
+    parser.add_argument('--parse-workers', type=int, default=2, help="parsing processes per platform (0 = a thread)")
+    parser.add_argument('--http-concurrency', type=int, default=8)
+    parser.add_argument('--http-rate', type=float, default=5, help="max product page requests/s per host")
+    parser.add_argument('--recycle-after', type=int, default=RECYCLE_AFTER_PAGES,
+                        help="pages a browser serves before it is restarted (0 = never)")
+    parser.add_argument('--max-rss-mb', type=int, default=MAX_BROWSER_RSS_MB,
+                        help="restart a browser whose memory grows past this (0 = never)")
+    parser.add_argument('--retries', type=int, default=2, help="extra attempts for a failed page load")
+    parser.add_argument('--incremental', action='store_true', help="skip unchanged products using the scrape state")
+    parser.add_argument('--archive', default=None, help="keep every fetched page in this page archive directory")
+    parser.add_argument('--url', default=postgres_url('admin', 'admin', 'localhost', '5400', 'e2e_ml'),
+                        help="SQLAlchemy URL of the database holding the staging tables")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+    db_engine = get_engine(args.url)
+    archive = PageArchive(args.archive) if args.archive else None
+    results = {}
+
+    def run(name):
+        try:
+            results[name] = scrape_platform(PLATFORMS[name](), db_engine, args, archive)
+        except Exception as e:
+            logger.error(f"Error scraping {name}: {e}")
+
+    threads = [threading.Thread(target=run, args=(name,), name=name) for name in args.platforms]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if archive is not None:
+            archive.log_summary()
+            archive.close()
+
+    for name in args.platforms:
+        s = results.get(name)
+        if s is None:
+            logger.info(f"{name}: failed")
+            continue
+        logger.info(f"{name}: {s['cards']} cards, {s['rows']} rows in {s['elapsed']:.2f}s "
+                    f"({s['cards_per_second']:.1f} cards/s), browsers {s['utilization']:.0%} utilized, "
+                    f"{s['recycled_pages'] + s['recycled_rss'] + s['recycled_dead']} recycled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Local scrape-state store keyed by PLU for incremental scraping.
+
+For every product it remembers a fingerprint of what the listing card showed
+(name and price) and a hash of the parsed detail page. A run then only fetches
+detail pages for products whose card changed (or that were not checked for a
+while) and only inserts rows whose detail content actually changed.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+RECHECK_AFTER_DAYS = 7  # Re-fetch unchanged products after this many days anyway
+DETAIL_FIELDS = ['discount', 'original_price', 'discounted_price', 'description', 'store_info', 'category']
+
+logger = logging.getLogger(__name__)
+
+
+def listing_fingerprint(name, card_price):
+    return hashlib.sha1(f"{name}\x1f{card_price}".encode('utf-8')).hexdigest()
+
+
+def content_hash(product):
+    values = [product.get('name', '')] + [product.get(field, '') for field in DETAIL_FIELDS]
+    return hashlib.sha1('\x1f'.join(str(v) for v in values).encode('utf-8')).hexdigest()
+
+
+class ScrapeState:
+    """SQLite-backed state shared by the listing loop and the writer thread."""
+
+    def __init__(self, path, recheck_after_days=RECHECK_AFTER_DAYS):
+        self.path = path
+        self.recheck_after = timedelta(days=recheck_after_days)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS product_state (
+                plu TEXT PRIMARY KEY,
+                listing_fingerprint TEXT NOT NULL,
+                content_hash TEXT,
+                last_fetched TEXT NOT NULL,
+                last_changed TEXT NOT NULL
+            )""")
+        self._conn.commit()
+        self.fetches_avoided = 0
+        self.inserts_avoided = 0
+        self.new_products = 0
+        self.changed_products = 0
+
+    def _lookup(self, plu):
+        return self._conn.execute(
+            "SELECT listing_fingerprint, content_hash, last_fetched FROM product_state WHERE plu = ?",
+            (plu,)).fetchone()
+
+    def select_for_fetch(self, products):
+        """Return the products whose detail page needs fetching; the rest are skipped."""
+        selected = []
+        now = datetime.now()
+        with self._lock:
+            for product in products:
+                fingerprint = listing_fingerprint(product.get('name', ''), product.get('card_price', ''))
+                product['listing_fingerprint'] = fingerprint
+                previous = self._lookup(product.get('plu')) if product.get('plu') else None
+                if (previous and previous[0] == fingerprint
+                        and now - datetime.fromisoformat(previous[2]) < self.recheck_after):
+                    self.fetches_avoided += 1
+                    self.inserts_avoided += 1
+                    continue
+                selected.append(product)
+        return selected
+
+    def select_changed(self, rows):
+        """Return the scraped rows that are new or whose detail content changed."""
+        changed = []
+        with self._lock:
+            for row in rows:
+                row['content_hash'] = content_hash(row)
+                previous = self._lookup(row.get('plu')) if row.get('plu') else None
+                if previous is None:
+                    self.new_products += 1
+                elif previous[1] != row['content_hash']:
+                    self.changed_products += 1
+                else:
+                    self.inserts_avoided += 1
+                    continue
+                changed.append(row)
+        return changed
+
+    def record(self, rows):
+        """Remember fingerprints and content hashes of rows that were scraped (and stored)."""
+        now = datetime.now().isoformat()
+        params = [(row['plu'], row.get('listing_fingerprint', ''), row.get('content_hash'), now, now)
+                  for row in rows if row.get('plu')]
+        with self._lock:
+            self._conn.executemany("""
+                INSERT INTO product_state (plu, listing_fingerprint, content_hash, last_fetched, last_changed)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(plu) DO UPDATE SET
+                    listing_fingerprint = excluded.listing_fingerprint,
+                    last_fetched = excluded.last_fetched,
+                    last_changed = CASE WHEN product_state.content_hash IS excluded.content_hash
+                                        THEN product_state.last_changed ELSE excluded.last_changed END,
+                    content_hash = excluded.content_hash
+                """, params)
+            self._conn.commit()
+
+    def log_summary(self):
+        logger.info(f"Incremental scrape: {self.new_products} new, {self.changed_products} changed, "
+                    f"{self.fetches_avoided} detail fetches avoided, {self.inserts_avoided} inserts avoided")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
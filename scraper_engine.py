@@ -0,0 +1,357 @@
+"""Scraping engine shared by every platform.
+
+A platform plugin (see scraper_platforms.py) knows how to build listing URLs,
+extract product cards and product pages, and which staging columns to fill.
+The engine supplies everything else, the same way for every site:
+
+* browsers leased from one DriverPool by the listing loop and `workers` detail
+  threads (started up front and recycled as they age), or product pages
+  fetched over plain HTTP with a browser fallback (detail_engine='http');
+* product page parsing in a ParseStage process pool;
+* retries with backoff for page loads that fail;
+* batching of finished rows to a writer (a BackgroundWriter or CopyLoader),
+  with the incremental ScrapeState filter and the raw-page archive when given;
+* metrics: pages, cards, rows stored, retries, failures, fallbacks and cards/s.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service as ChromeService
+from sqlalchemy import MetaData, Table, Column, String, DateTime
+
+from driver_pool import MAX_BROWSER_RSS_MB, RECYCLE_AFTER_PAGES, DriverPool, lighten_options, start_driver
+from http_fetcher import HttpFetcher
+from page_loader import DEFAULT_TIMEOUT, PageLoadStats, load_page
+from parse_stage import ParseStage
+
+DEFAULT_BATCH_SIZE = 5  # Rows handed to the writer at a time
+DEFAULT_RETRIES = 2  # Extra attempts for a page load that raised
+RETRY_BACKOFF = 1.0  # Seconds before the first retry, doubled for each further one
+DETAIL_ENGINES = ('browser', 'http')
+
+logger = logging.getLogger(__name__)
+
+
+class Platform:
+    """Plugin interface for one site.
+
+    Subclasses set the class attributes and implement `extract_cards`; sites
+    whose product pages are scraped also set `detail_selector` and the
+    `extract_detail*` functions, which must be plain module-level functions so
+    they can run in the parse processes.
+    """
+    name = None
+    site_url = None
+    base_url = None  # Listing URL without the page number
+    listing_selector = None  # Present once a listing page has loaded
+    detail_selector = None  # Present once a product page has loaded; None when the cards hold every field
+    table_name = None
+    columns = []  # Staging table columns, strings except createdate
+    column_map = {}  # Staging column -> scraped field, where the names differ
+    extract_detail = None  # function(html) -> dict of product page fields
+    extract_detail_checked = None  # Like extract_detail, but None when fields are missing (retried in a browser)
+    incremental = False  # Rows carry the 'plu' ScrapeState tracks
+    stop_when_exhausted = False  # Stop at the first listing page without new cards instead of walking max_pages
+    block_resources = True  # Keep images, fonts and stylesheets from loading
+
+    def __init__(self, base_url=None, table_name=None, columns=None, site_url=None):
+        self.site_url = site_url or self.site_url
+        self.base_url = base_url or self.base_url
+        self.table_name = table_name or self.table_name
+        self.columns = list(columns or self.columns)
+
+    def listing_url(self, page):
+        return f"{self.base_url}&page={page}"
+
+    def extract_cards(self, html):
+        """Return the product cards of a listing page as dicts with at least a 'link'."""
+        raise NotImplementedError
+
+    def map_row(self, product):
+        # Rows stay the scraped dicts, since the incremental state reads fields
+        # that are not staged; the loader picks the staging columns
+        for column, field in self.column_map.items():
+            product[column] = product.get(field)
+        return product
+
+    def setup_driver(self):
+        def make_options():
+            # New options per attempt, as start_driver may launch twice
+            chrome_options = Options()
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--disable-dev-shm-usage")
+            if self.block_resources:
+                lighten_options(chrome_options)
+            return chrome_options
+
+        return start_driver(lambda path: webdriver.Chrome(service=ChromeService(executable_path=path),
+                                                          options=make_options()),
+                            self.block_resources)
+
+    def create_table(self, engine):
+        metadata = MetaData()
+        Table(self.table_name, metadata,
+              *(Column(column, DateTime, nullable=False) if column == 'createdate' else Column(column, String)
+                for column in self.columns))
+        metadata.create_all(engine)
+        logger.info(f"Table {self.table_name} created in PostgreSQL")
+
+
+class ScrapeStats:
+    """Thread-safe counters for one engine run.
+
+    'rows' counts rows the loader has stored: pass `record_stored` as (one of)
+    the CopyLoader's on_flush callbacks, so rows of a failed COPY are not counted.
+    """
+
+    FIELDS = ('listing_pages', 'cards', 'detail_pages', 'fallbacks', 'rows', 'retries', 'failures')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, field, count=1):
+        with self._lock:
+            self.counts[field] += count
+
+    def record_stored(self, rows):
+        self.add('rows', len(rows))
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self):
+        with self._lock:
+            summary = dict(self.counts)
+        summary['elapsed'] = self.elapsed
+        summary['cards_per_second'] = summary['cards'] / self.elapsed if self.elapsed else 0.0
+        return summary
+
+    def log_summary(self, label):
+        s = self.summary()
+        logger.info(f"{label}: {s['listing_pages']} listing pages, {s['cards']} cards, {s['detail_pages']} product pages "
+                    f"({s['fallbacks']} browser fallbacks), {s['rows']} rows stored, {s['retries']} retries, "
+                    f"{s['failures']} failed pages in {s['elapsed']:.2f}s ({s['cards_per_second']:.1f} cards/s)")
+
+
+class ScrapeEngine:
+    """Run one platform's scrape: listing pages, product pages, parsing and batched writes."""
+
+    def __init__(self, platform, writer, workers=1, detail_engine='browser', max_pages=2,
+                 wait_time=DEFAULT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE, parse_workers=2, http_concurrency=8,
+                 http_rate=5, retries=DEFAULT_RETRIES, state=None, archive=None, driver_pool=None,
+                 recycle_after=RECYCLE_AFTER_PAGES, max_rss_mb=MAX_BROWSER_RSS_MB, stats=None):
+        if detail_engine not in DETAIL_ENGINES:
+            raise ValueError(f"Unknown detail engine: {detail_engine}")
+        self.platform = platform
+        self.writer = writer
+        self.workers = max(1, workers)
+        self.detail_engine = detail_engine
+        self.max_pages = max_pages
+        self.wait_time = wait_time
+        self.batch_size = batch_size
+        self.parse_workers = parse_workers
+        self.http_concurrency = http_concurrency
+        self.http_rate = http_rate
+        self.retries = retries
+        self.state = state if platform.incremental else None
+        self.archive = archive
+        self.driver_pool = driver_pool
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.pool_stats = None
+        self.page_stats = PageLoadStats()
+        self.stats = stats if stats is not None else ScrapeStats()
+
+    def run(self):
+        """Scrape up to max_pages listing pages and return every card listed."""
+        pool = self.driver_pool
+        if pool is None:
+            pool = DriverPool(self.platform.setup_driver, self.workers, self.recycle_after, self.max_rss_mb)
+            # Browser detail workers each keep a browser busy, so start them all in
+            # parallel up front. Otherwise browsers only load listing pages and
+            # http fallbacks: start one, and acquire() starts more (up to workers)
+            # only while every started browser is busy
+            browser_details = self.platform.detail_selector is not None and self.detail_engine == 'browser'
+            pool.prewarm(self.workers if browser_details else 1)
+        try:
+            return self._run(pool)
+        finally:
+            if self.driver_pool is None:
+                pool.close()
+                pool.stats.log_summary(f"{self.platform.name} browsers")
+            self.pool_stats = pool.stats.summary()
+            self.stats.stop()
+            self.stats.log_summary(self.platform.name)
+            self.page_stats.log_summary(f"{self.platform.name} page loads")
+
+    def _run(self, pool):
+        has_details = self.platform.detail_selector is not None
+        link_queue = queue.Queue()
+        row_queue = queue.Queue()
+
+        def on_detail_parsed(context, additional_data):
+            product, checked = context
+            if additional_data is None and checked:
+                # The HTTP page lacked fields a browser would render
+                self.stats.add('fallbacks')
+                link_queue.put(product)
+            elif additional_data:
+                product.update(additional_data)
+                row_queue.put(self.platform.map_row(product))
+
+        writer = threading.Thread(target=self._write_rows, args=(row_queue,), daemon=True)
+        writer.start()
+        # Card-only platforms never parse product pages, so they need no parse processes
+        stage = ParseStage(on_detail_parsed, self.parse_workers if has_details else 0, site_url=self.platform.site_url)
+        workers = [threading.Thread(target=self._detail_worker, args=(pool, link_queue, stage), daemon=True)
+                   for _ in range(self.workers if has_details else 0)]
+        for thread in workers:
+            thread.start()
+        fetcher = HttpFetcher(self.http_concurrency, self.http_rate) if has_details and self.detail_engine == 'http' else None
+        if fetcher is not None:
+            fetcher.start()
+
+        all_cards = []
+        seen = set()
+        try:
+            # Listing pages keep loading while product pages are fetched and parsed
+            for page in range(1, self.max_pages + 1):
+                url = self.platform.listing_url(page)
+                logger.info(f"Scraping {self.platform.name} page {page}: {url}")
+                fetched_at = datetime.now()
+                html = self._load(pool, url, self.platform.listing_selector, 'listing', fetched_at=fetched_at)
+                if not html:
+                    continue
+                self.stats.add('listing_pages')
+                cards = [card for card in self.platform.extract_cards(html) if card['link'] not in seen]
+                # Rows carry the fetch time the archive records for their listing page,
+                # so page_archive.py replay rebuilds them under the same (plu, createdate)
+                for card in cards:
+                    card['createdate'] = fetched_at
+                if not cards:
+                    # Past the last page some sites show no cards, or repeat the last page
+                    if self.platform.stop_when_exhausted:
+                        logger.info(f"No new products on {self.platform.name} page {page}, stopping")
+                        break
+                    logger.info(f"No new products on {self.platform.name} page {page}")
+                    continue
+                seen.update(card['link'] for card in cards)
+                self.stats.add('cards', len(cards))
+                all_cards.extend(cards)
+                if not has_details:
+                    for card in cards:
+                        row_queue.put(self.platform.map_row(card))
+                    continue
+                to_fetch = cards if self.state is None else self.state.select_for_fetch(cards)
+                if fetcher is not None:
+                    self._fetch_over_http(fetcher, to_fetch, stage, link_queue)
+                else:
+                    for product in to_fetch:
+                        link_queue.put(product)
+        finally:
+            # HTTP results may still send pages to the browser workers; wait for
+            # both before closing the parse stage and the writer
+            stage.join()
+            link_queue.join()
+            stage.close()
+            for _ in workers:
+                link_queue.put(None)
+            for thread in workers:
+                thread.join()
+            row_queue.put(None)
+            writer.join()
+            if fetcher is not None:
+                fetcher.close()
+
+        return all_cards
+
+    def _fetch_over_http(self, fetcher, products, stage, link_queue):
+        pages = fetcher.fetch_many(product['link'] for product in products)
+        for product in products:
+            html = pages.get(product['link'])
+            self._archive(product['link'], html, 'detail', product.get('plu'))
+            if html:
+                self.stats.add('detail_pages')
+                stage.put(self.platform.extract_detail_checked, html, (product, True))
+            else:
+                self.stats.add('fallbacks')
+                link_queue.put(product)
+
+    def _detail_worker(self, pool, link_queue, stage):
+        # Take products off the shared queue until the stop marker arrives and
+        # hand the raw pages to the parse stage
+        while True:
+            product = link_queue.get()
+            try:
+                if product is None:
+                    return
+                html = self._load(pool, product['link'], self.platform.detail_selector, 'detail', product.get('plu'))
+                if html:
+                    self.stats.add('detail_pages')
+                    stage.put(self.platform.extract_detail, html, (product, False))
+            finally:
+                link_queue.task_done()
+
+    def _load(self, pool, url, selector, kind, plu=None, fetched_at=None):
+        for attempt in range(self.retries + 1):
+            try:
+                with pool.lease() as driver:
+                    html = load_page(driver, url, selector, self.wait_time, self.page_stats)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    self.stats.add('failures')
+                    logger.error(f"Error getting page source for URL {url}: {e}")
+                    return ""
+                self.stats.add('retries')
+                logger.warning(f"Error getting page source for URL {url}, retrying: {e}")
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        self._archive(url, html, kind, plu, fetched_at)
+        return html
+
+    def _archive(self, url, html, kind, plu=None, fetched_at=None):
+        # Archiving is best effort and never interrupts scraping
+        if self.archive is None or not html:
+            return
+        try:
+            self.archive.put(url, html, kind, plu, fetched_at, self.platform.name)
+        except Exception as e:
+            logger.error(f"Error archiving page {url}: {e}")
+
+    def _write_rows(self, row_queue):
+        # Single consumer that batches finished rows from every thread
+        batch = []
+        while True:
+            row = row_queue.get()
+            if row is None:
+                break
+            batch.append(row)
+            logger.info(f"Scraped product: {row}")
+            if len(batch) >= self.batch_size:
+                self._upload(batch)
+                batch = []
+        if batch:
+            self._upload(batch)
+
+    def _upload(self, batch):
+        # Only new or changed rows are written; their state is recorded by the
+        # loader's on_flush callback once they are stored
+        rows = batch
+        if self.state is not None:
+            rows = self.state.select_changed(batch)
+            changed = {id(row) for row in rows}
+            self.state.record([row for row in batch if id(row) not in changed])
+        if not rows:
+            return
+        try:
+            self.writer.add(rows)
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} rows to {self.platform.table_name}: {e}")
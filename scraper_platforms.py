@@ -0,0 +1,62 @@
+"""Platform plugins for scraper_engine.ScrapeEngine.
+
+Adding a site means one Platform subclass here and an entry in PLATFORMS; the
+engine, scrape.py and the per-site scripts pick it up from there.
+"""
+from driver_pool import lighten_options, start_driver
+from page_loader import BLIBLI_LISTING_SELECTOR, KLIKINDOMARET_DETAIL_SELECTOR, KLIKINDOMARET_LISTING_SELECTOR
+from product_parser import (BLIBLI_SITE_URL, SITE_URL, parse_blibli_listing, parse_detail,
+                            parse_detail_if_complete, parse_listing)
+from scraper_engine import Platform
+
+
+class KlikindomaretPlatform(Platform):
+    name = 'klikindomaret'
+    site_url = SITE_URL
+    base_url = f"{SITE_URL}/page/unilever-officialstore?categoryID=&productbrandid=&sortcol=&pagesize=50&startprice=&endprice=&attributes=&ShowItem="
+    listing_selector = KLIKINDOMARET_LISTING_SELECTOR
+    detail_selector = KLIKINDOMARET_DETAIL_SELECTOR
+    table_name = 'klikindomaret_stg'
+    columns = ['name', 'link', 'plu', 'discount', 'original_price', 'discounted_price',
+               'description', 'store_info', 'category', 'createdate']
+    # staticmethod keeps the parsers plain functions the parse processes can unpickle
+    extract_detail = staticmethod(parse_detail)
+    extract_detail_checked = staticmethod(parse_detail_if_complete)
+    incremental = True
+
+    def extract_cards(self, html):
+        return parse_listing(html, self.site_url)
+
+
+class BlibliPlatform(Platform):
+    name = 'blibli'
+    site_url = BLIBLI_SITE_URL
+    base_url = f"{BLIBLI_SITE_URL}/cari/unilever%20indonesia%20official?seller=Official%20Store&category=53400"
+    listing_selector = BLIBLI_LISTING_SELECTOR
+    table_name = 'blibli_stg'
+    columns = ['name', 'link', 'sku', 'price_after', 'price_before', 'discount', 'rating', 'sold_count',
+               'store_location', 'createdate']
+    stop_when_exhausted = True  # The search has no more products once a page brings no new ones
+
+    def extract_cards(self, html):
+        return parse_blibli_listing(html, self.site_url)
+
+    def setup_driver(self):
+        # Blibli serves a Cloudflare check to plain Selenium
+        import undetected_chromedriver as uc
+
+        def make_options():
+            # uc.Chrome marks its options as used, so every attempt needs new ones
+            options = uc.ChromeOptions()
+            # options.add_argument('--headless=new')  # Correct way to set headless mode
+            options.add_argument("--disable-gpu")
+            options.add_argument("--no-sandbox")
+            if self.block_resources:
+                lighten_options(options)
+            return options
+
+        return start_driver(lambda path: uc.Chrome(driver_executable_path=path, options=make_options()),
+                            self.block_resources)
+
+
+PLATFORMS = {platform.name: platform for platform in (KlikindomaretPlatform, BlibliPlatform)}
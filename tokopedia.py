@@ -1,24 +1,27 @@
 import os
 import logging
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-import time
 import pandas as pd
-from sqlalchemy import create_engine
-from webdriver_manager.chrome import ChromeDriverManager
 import psycopg2
+from background_writer import BackgroundWriter
+from file_sink import open_sink
+from pg_loader import CopyLoader, get_engine, postgres_url
+from scraper_engine import ScrapeEngine, ScrapeStats
+from scraper_platforms import KlikindomaretPlatform
 
 # Configuration variables
 BASE_URL = "https://www.klikindomaret.com/page/unilever-officialstore?categoryID=&productbrandid=&sortcol=&pagesize=50&startprice=&endprice=&attributes=&ShowItem="
 MAX_PAGES = 2  # Set the number of pages to scrape
-WAIT_TIME = 2  # Time to wait for pages to load
+WAIT_TIME = 2  # Max seconds to wait for a page's content to appear
 DATA_DIR = 'data'
 TIMESTAMP = datetime.now().strftime("%Y%m%d%H%M%S")
-CSV_FILE = f"{DATA_DIR}/klikindomaret-{TIMESTAMP}.csv"
+OUTPUT_FILE = f"{DATA_DIR}/klikindomaret-{TIMESTAMP}.parquet"  # .parquet (a directory with one file per 500 rows) or .csv, appended to batch by batch
+OUTPUT_COLUMNS = ['name', 'link', 'plu', 'discount', 'original_price', 'discounted_price',
+                  'description', 'store_info', 'category']
 BATCH_SIZE = 5  # Number of products to process before uploading
+LOAD_BATCH_SIZE = 500  # Rows per COPY into the PostgreSQL table
+LOAD_FLUSH_INTERVAL = 10  # Max seconds scraped rows wait before being loaded
+WRITE_QUEUE_SIZE = 100  # Batches queued for the background writer before scraping blocks
 
 # PostgreSQL configuration
 POSTGRES_HOST = 'localhost'
@@ -32,186 +35,63 @@ TABLE_NAME = 'bfi_test'
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-def setup_driver():
-    chrome_options = Options()
-    # chrome_options.add_argument("--headless")  # Ensure the browser runs in headless mode
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    service = ChromeService(executable_path=ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=chrome_options)
-
-def get_page_source(url, driver, wait_time):
-    try:
-        driver.get(url)
-        time.sleep(wait_time)
-        return driver.page_source
-    except Exception as e:
-        logger.error(f"Error getting page source for URL {url}: {e}")
-        return ""
-
-def parse_product_details(soup):
-    products = soup.find_all('div', class_='each-item')
-    product_details = []
-
-    for product in products:
-        try:
-            product_name = get_text(product, 'div', 'title')
-            product_link = get_link(product, 'a')
-            plu = get_attribute(product, 'div', 'wrp-media', 'data-plu')
-            
-            product_details.append({
-                'name': product_name,
-                'link': product_link,
-                'plu': plu
-            })
-        except Exception as e:
-            logger.error(f"Error parsing product details: {e}")
-    
-    return product_details
-
-def get_text(product, tag, class_name, last_word=False):
+def save_to_file(data, sink):
     try:
-        tag = product.find(tag, class_=class_name)
-        if tag:
-            text = tag.text.strip()
-            return text.split()[-1] if last_word else text
+        sink.write_batch(data)
     except Exception as e:
-        logger.error(f"Error getting text for tag {tag} with class {class_name}: {e}")
-    return ''
+        logger.error(f"Error saving data to file {sink.path}: {e}")
 
-def get_price_text(product, tag, class_name):
-    try:
-        tag = product.find(tag, class_=class_name)
-        if tag:
-            text = tag.text.strip()
-            price = text.split('Rp')[-1].strip()  # Extract the part after 'Rp'
-            return f'Rp {price}'
-    except Exception as e:
-        logger.error(f"Error getting price text for tag {tag} with class {class_name}: {e}")
-    return ''
-
-def get_link(product, tag):
-    try:
-        link_tag = product.find_parent(tag, href=True)
-        return f"https://www.klikindomaret.com{link_tag['href']}" if link_tag else ''
-    except Exception as e:
-        logger.error(f"Error getting link for tag {tag}: {e}")
-    return ''
-
-def get_attribute(product, tag, class_name, attribute):
-    try:
-        attr_tag = product.find(tag, class_=class_name)
-        return attr_tag[attribute] if attr_tag and attribute in attr_tag.attrs else ''
-    except Exception as e:
-        logger.error(f"Error getting attribute {attribute} for tag {tag} with class {class_name}: {e}")
-    return ''
-
-def scrape_additional_data(product_link, driver):
-    try:
-        driver.get(product_link)
-        time.sleep(WAIT_TIME)  # Adjust the sleep time as necessary
-        page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
-        
-        # Extracting additional data from the product page
-        discount = get_text(soup, 'span', 'discount')
-        original_price = get_price_text(soup, 'span', 'strikeout disc-price')
-        discounted_price = get_text(soup, 'span', 'normal price-final')
-        description = soup.find('span', id='desc-product').text.strip() if soup.find('span', id='desc-product') else ''
-        store_info = get_text(soup, 'span', 'typesend-title')
-        
-        # Extracting the last breadcrumb as category
-        breadcrumbs = soup.find('div', class_='breadcrumb')
-        category = breadcrumbs.find_all('a')[-1].text.strip() if breadcrumbs else ''
-        
-        return {
-            'discount': discount,
-            'original_price': original_price,
-            'discounted_price': discounted_price,
-            'description': description,
-            'store_info': store_info,
-            'category': category
-        }
-    except Exception as e:
-        logger.error(f"Error scraping additional data for product link {product_link}: {e}")
-        return {}
-
-def save_to_csv(data, csv_file):
-    try:
-        df = pd.DataFrame(data)
-        if not os.path.exists(csv_file):
-            df.to_csv(csv_file, index=False)
-        else:
-            existing_df = pd.read_csv(csv_file)
-            combined_df = pd.concat([existing_df, df], ignore_index=True)
-            combined_df.to_csv(csv_file, index=False)
-    except Exception as e:
-        logger.error(f"Error saving data to CSV file {csv_file}: {e}")
+def get_postgres_engine():
+    return get_engine(postgres_url(POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB))
 
 def upload_csv_to_postgres(csv_file, table_name):
     try:
-        engine = create_engine(f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}')
+        engine = get_postgres_engine()
         df = pd.read_csv(csv_file)
         df.to_sql(table_name, engine, if_exists='replace', index=False)
         logger.info(f"Uploaded {csv_file} to PostgreSQL table {table_name}")
     except Exception as e:
         logger.error(f"Error uploading CSV to PostgreSQL: {e}")
 
-def upload_batch_to_postgres(data, table_name):
-    try:
-        engine = create_engine(f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}')
-        df = pd.DataFrame(data)
-        df.to_sql(table_name, engine, if_exists='append', index=False)
-        logger.info(f"Uploaded batch of {len(data)} products to PostgreSQL table {table_name}")
-    except Exception as e:
-        logger.error(f"Error uploading batch to PostgreSQL: {e}")
+def upload_batch_to_postgres(data, loader):
+    # The loader buffers rows and COPYs them into the table in bulk
+    loader.add(data)
 
-def scrape_products(base_url, max_pages, driver, wait_time):
-    all_product_details = []
-    batch = []
-    
-    for page in range(1, max_pages + 1):
-        url = f"{base_url}&page={page}"
-        logger.info(f"Scraping page {page}: {url}")
-        page_source = get_page_source(url, driver, wait_time)
-        if not page_source:
-            continue
-        soup = BeautifulSoup(page_source, 'html.parser')
-        product_details = parse_product_details(soup)
-        
-        for product in product_details:
-            additional_data = scrape_additional_data(product['link'], driver)
-            if additional_data:
-                product.update(additional_data)
-                batch.append(product)
-                logger.info(f"Scraped product: {product}")
-                if len(batch) >= BATCH_SIZE:
-                    upload_batch_to_postgres(batch, TABLE_NAME)
-                    save_to_csv(batch, CSV_FILE)
-                    batch.clear()
-        
-        all_product_details.extend(product_details)
-    
-    # Upload any remaining products in the batch
-    if batch:
-        upload_batch_to_postgres(batch, TABLE_NAME)
-        save_to_csv(batch, CSV_FILE)
-    
-    return all_product_details
+def write_batch(data, sink, loader):
+    # Runs on the background writer thread, off the scraping thread
+    upload_batch_to_postgres(data, loader)
+    save_to_file(data, sink)
+
+def scrape_products(platform, writer, stats=None):
+    # The browser detail engine keeps the single-browser behaviour of this script
+    scraper = ScrapeEngine(platform, writer, max_pages=MAX_PAGES, wait_time=WAIT_TIME, batch_size=BATCH_SIZE,
+                           stats=stats)
+    return scraper.run()
 
 def main():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
-    driver = setup_driver()
+    platform = KlikindomaretPlatform(BASE_URL, TABLE_NAME, OUTPUT_COLUMNS)
+    engine = get_postgres_engine()
+    platform.create_table(engine)
+    stats = ScrapeStats()
+    loader = CopyLoader(engine, TABLE_NAME, OUTPUT_COLUMNS, LOAD_BATCH_SIZE, LOAD_FLUSH_INTERVAL,
+                        on_flush=stats.record_stored)
+    sink = open_sink(OUTPUT_FILE, OUTPUT_COLUMNS)
+    writer = BackgroundWriter(lambda batch: write_batch(batch, sink, loader), WRITE_QUEUE_SIZE,
+                              tick=loader.flush_if_due, name=f"{TABLE_NAME} writer")
     
     try:
-        all_product_details = scrape_products(BASE_URL, MAX_PAGES, driver, WAIT_TIME)
+        all_product_details = scrape_products(platform, writer, stats)
         # The final DataFrame containing all scraped data can be printed if needed
         # df = pd.DataFrame(all_product_details)
         # logger.info(df)
     finally:
-        driver.quit()
+        # Drain queued batches before closing the file and flushing the loader
+        writer.close()
+        sink.close()
+        loader.close()
 
-if _name_ == "_main_":
+if __name__ == "__main__":
     main()
\ No newline at end of file